@@ -15,14 +15,84 @@ ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "127.0.0.1,localhost").split(",")
 
 # Database and external services
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+# MongoDB connection pool per process (clients are created lazily, one per process after fork)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "0")) or None
+# How long a request waits for a free pooled connection before failing (unset: no limit)
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0")) or None
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "2000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "0")) or None
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "0")) or None
+# Optional time partitioning of audit_logs into per-"day" or per-"month" collections
+LOG_PARTITIONING = os.getenv("LOG_PARTITIONING") or None
+# Optional MongoDB time-series storage for log collections (timeField "timestamp")
+LOG_TIMESERIES = os.getenv("LOG_TIMESERIES", "False").lower() == "true"
+LOG_TIMESERIES_META_FIELD = os.getenv("LOG_TIMESERIES_META_FIELD", "user_id")
+LOG_TIMESERIES_GRANULARITY = os.getenv("LOG_TIMESERIES_GRANULARITY", "seconds")
+LOG_TIMESERIES_EXPIRE_AFTER_SECONDS = int(os.getenv("LOG_TIMESERIES_EXPIRE_AFTER_SECONDS", "0")) or None
 LOG_SIGNING_KEY = os.getenv("LOG_SIGNING_KEY")
 if not LOG_SIGNING_KEY:
     raise ValueError("LOG_SIGNING_KEY must be set in environment variables for security.")
+# Cache of verified log signatures: in-process LRU plus optional shared tier in CACHES["default"]
+LOG_VERIFY_CACHE_TTL = int(os.getenv("LOG_VERIFY_CACHE_TTL", "300"))
+LOG_VERIFY_CACHE_SIZE = int(os.getenv("LOG_VERIFY_CACHE_SIZE", "100000"))
+LOG_VERIFY_CACHE_SHARED = os.getenv("LOG_VERIFY_CACHE_SHARED", "False").lower() == "true"
+# Seconds list responses are cached in CACHES["default"] (0 disables); writes invalidate them immediately
+LOG_QUERY_CACHE_TTL = int(os.getenv("LOG_QUERY_CACHE_TTL", "5"))
+# Query planning: index hints on log reads, and explain() logging for reads slower than LOG_SLOW_QUERY_MS
+LOG_QUERY_HINTS = os.getenv("LOG_QUERY_HINTS", "True").lower() == "true"
+LOG_SLOW_QUERY_MS = int(os.getenv("LOG_SLOW_QUERY_MS", "500"))
+# action__contains is matched against at most this many distinct actions; beyond that it needs a user_id or time filter
+LOG_QUERY_MAX_ACTIONS = int(os.getenv("LOG_QUERY_MAX_ACTIONS", "1000"))
+LOG_QUERY_MAX_PATTERN_LENGTH = int(os.getenv("LOG_QUERY_MAX_PATTERN_LENGTH", "100"))
+# action__in and action__nin may list at most this many actions
+LOG_QUERY_MAX_IN_VALUES = int(os.getenv("LOG_QUERY_MAX_IN_VALUES", "100"))
+# Requests a throttle reserves per Redis call (1 = none) and seconds a reservation stays usable
+LOG_THROTTLE_PREALLOCATE = int(os.getenv("LOG_THROTTLE_PREALLOCATE", "1"))
+LOG_THROTTLE_PREALLOCATE_TTL = float(os.getenv("LOG_THROTTLE_PREALLOCATE_TTL", "1"))
+# Largest page GraphQL logsConnection returns for `first`
+LOG_GRAPHQL_MAX_PAGE_SIZE = int(os.getenv("LOG_GRAPHQL_MAX_PAGE_SIZE", "500"))
+# Export pipeline: batch size and the per-process pool ("thread" or "process") verifying and encoding rows
+LOG_EXPORT_BATCH_SIZE = int(os.getenv("LOG_EXPORT_BATCH_SIZE", "500"))
+LOG_EXPORT_WORKERS = int(os.getenv("LOG_EXPORT_WORKERS", "4"))
+LOG_EXPORT_EXECUTOR = os.getenv("LOG_EXPORT_EXECUTOR", "thread")
+# Size of the (compressed) blocks export responses are streamed in
+LOG_EXPORT_CHUNK_SIZE = int(os.getenv("LOG_EXPORT_CHUNK_SIZE", str(64 * 1024)))
+# Where background export jobs (POST /api/logs/export/jobs/) write their files; use shared storage with several workers
+LOG_EXPORT_JOB_DIR = os.getenv("LOG_EXPORT_JOB_DIR", str(BASE_DIR / "exports"))
+# Finished export jobs and their files are deleted this long after they finish
+LOG_EXPORT_JOB_TTL_HOURS = float(os.getenv("LOG_EXPORT_JOB_TTL_HOURS", "24"))
+# Export jobs still running this long after they started are marked failed (their worker died)
+LOG_EXPORT_JOB_TIMEOUT_SECONDS = int(os.getenv("LOG_EXPORT_JOB_TIMEOUT_SECONDS", "3600"))
+# Parquet output (exports and archives, requires pyarrow): rows per row group
+LOG_PARQUET_ROW_GROUP_SIZE = int(os.getenv("LOG_PARQUET_ROW_GROUP_SIZE", "50000"))
+# Archive target for archive_logs: "mongo" (logs_archive) or "parquet" files under LOG_ARCHIVE_DIR
+LOG_ARCHIVE_FORMAT = os.getenv("LOG_ARCHIVE_FORMAT", "mongo")
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", str(BASE_DIR / "archive"))
+# Record every ingested batch as a hash-chained Merkle root in audit_batches
+LOG_INTEGRITY_BATCHES = os.getenv("LOG_INTEGRITY_BATCHES", "True").lower() == "true"
+# Most logs per Merkle batch record (~110 bytes each); larger ingest batches are split
+LOG_MERKLE_BATCH_MAX = int(os.getenv("LOG_MERKLE_BATCH_MAX", "10000"))
+# Seconds between keepalive comments on idle /api/async/logs/stream/ connections
+LOG_STREAM_HEARTBEAT = int(os.getenv("LOG_STREAM_HEARTBEAT", "15"))
+# Per-minute/hour/day activity counters in audit_rollups, served by /api/logs/stats/
+LOG_ROLLUPS = os.getenv("LOG_ROLLUPS", "True").lower() == "true"
+LOG_STATS_MAX_BUCKETS = int(os.getenv("LOG_STATS_MAX_BUCKETS", "1000"))
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 
+# Shared ingest buffer: a Redis stream every worker appends to and flush_log_buffer drains
+LOG_BUFFER_REDIS_URL = os.getenv("LOG_BUFFER_REDIS_URL", CELERY_BROKER_URL)
+LOG_BUFFER_FLUSH_SIZE = int(os.getenv("LOG_BUFFER_FLUSH_SIZE", "1000"))
+LOG_BUFFER_MAX_AGE_SECONDS = float(os.getenv("LOG_BUFFER_MAX_AGE_SECONDS", "5"))
+LOG_BUFFER_BATCH_SIZE = int(os.getenv("LOG_BUFFER_BATCH_SIZE", "1000"))
+
+# Maximum number of entries accepted by one POST /api/logs/batch/
+LOG_BATCH_MAX_ENTRIES = int(os.getenv("LOG_BATCH_MAX_ENTRIES", "1000"))
+
 # Application definition
 INSTALLED_APPS = [
     "django.contrib.admin",
@@ -48,9 +118,14 @@ REST_FRAMEWORK = {
     "DEFAULT_THROTTLE_CLASSES": [
         "logger.throttles.RedisUserRateThrottle",
     ],
+    # Per-user limits by view scope, enforced in Redis (logger.throttles); "user" applies to views without a scope
     "DEFAULT_THROTTLE_RATES": {
-        "user": "100/hour",
-        "log_create": "100/hour",
+        "user": os.getenv("LOG_THROTTLE_RATE_USER", "100/hour"),
+        "log_create": os.getenv("LOG_THROTTLE_RATE_CREATE", "100/hour"),
+        "log_list": os.getenv("LOG_THROTTLE_RATE_LIST", "100/hour"),
+        "log_export": os.getenv("LOG_THROTTLE_RATE_EXPORT", "20/hour"),
+        "log_export_job": os.getenv("LOG_THROTTLE_RATE_EXPORT_JOB", "100/hour"),
+        "log_admin": os.getenv("LOG_THROTTLE_RATE_ADMIN", "100/hour"),
     },
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
@@ -60,6 +135,8 @@ SPECTACULAR_SETTINGS = {
     "DESCRIPTION": "A secure, scalable audit trail system for logging user actions with cryptographic signatures.",
     "VERSION": "1.0.0",
     "SERVE_INCLUDE_SCHEMA": True,
+    # The views' annotations are recorded by logger.openapi and applied here, on first use
+    "PREPROCESSING_HOOKS": ["logger.openapi.apply_annotations"],
 }
 
 GRAPHENE = {
@@ -91,6 +168,10 @@ CELERY_BEAT_SCHEDULE = {
         "task": "logger.tasks.archive_logs_task",
         "schedule": 86400.0,  # 24 hours
     },
+    "cleanup-export-jobs-every-10-minutes": {
+        "task": "logger.tasks.cleanup_export_jobs",
+        "schedule": 600.0,
+    },
 }
 
 MIDDLEWARE = [
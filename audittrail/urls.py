@@ -1,11 +1,8 @@
-from graphene_django.views import GraphQLView
-from django.views.decorators.csrf import csrf_exempt
 from django.contrib import admin
 from django.urls import path, include
-from logger.schema import schema
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from django.http import HttpResponse
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from logger.lazy import lazy_view
 
 def metrics_view(request):
     return HttpResponse(generate_latest(), content_type=CONTENT_TYPE_LATEST)
@@ -13,8 +10,9 @@ def metrics_view(request):
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('logger.urls')),
-    path('graphql/', csrf_exempt(GraphQLView.as_view(graphiql=True, schema=schema))),
+    # Uses GRAPHENE["SCHEMA"] (logger.schema.schema)
+    path('graphql/', lazy_view("graphene_django.views.GraphQLView", graphiql=True)),
     path('metrics/', metrics_view),
-    path('schema/', SpectacularAPIView.as_view(), name="schema"), 
-    path('docs/', SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"), 
-] 
\ No newline at end of file
+    path('schema/', lazy_view("drf_spectacular.views.SpectacularAPIView"), name="schema"),
+    path('docs/', lazy_view("drf_spectacular.views.SpectacularSwaggerView", url_name="schema"), name="swagger-ui"),
+]
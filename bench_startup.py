@@ -0,0 +1,91 @@
+"""
+Startup benchmark: how long a fresh process takes to become ready, and which
+imports that time goes to (from `python -X importtime`).
+
+    python bench_startup.py                      # every target
+    python bench_startup.py --target urls --top 30
+    python bench_startup.py --budget-ms 800      # exit 1 when a target is slower
+
+Each target runs in a new interpreter, so nothing is shared between runs.
+Bytecode is not written, so run `python -m compileall -q .` first to measure
+what the Docker image (which precompiles) sees.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SETUP = "import django; django.setup()"
+
+# What each kind of process imports before it can do any work
+TARGETS = {
+    # manage.py migrate, collectstatic, ...
+    "setup": SETUP,
+    # Web worker: settings, apps and the whole URLconf with every view
+    "urls": f"{SETUP}; from django.conf import settings; import importlib; importlib.import_module(settings.ROOT_URLCONF)",
+    "asgi": "from audittrail.asgi import application",
+    # Celery worker: the app and every task module
+    "celery": f"{SETUP}; from audittrail.celery import app; app.loader.import_default_modules()",
+}
+
+
+def run_target(code):
+    """Run `code` in a new interpreter. Returns (wall seconds, {module: cumulative us})."""
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "audittrail.settings")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+    return elapsed, modules
+
+
+def report(name, repeat, top):
+    times = []
+    for _ in range(repeat):
+        elapsed, modules = run_target(TARGETS[name])
+        times.append(elapsed)
+    median = statistics.median(times) * 1000
+    print(f"{name}: median {median:.0f} ms, min {min(times) * 1000:.0f} ms over {repeat} runs")
+    # Nested imports are listed too, so the chain that pulls in a heavy one shows
+    slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:top]
+    for module, cumulative in slowest:
+        print(f"  {cumulative / 1000:8.1f} ms  {module}")
+    return median
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure process startup and import time.")
+    parser.add_argument("--target", choices=list(TARGETS), action="append", help="Target to measure (default: all).")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per target (default: 5).")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list per target (default: 15).")
+    parser.add_argument("--budget-ms", type=float, help="Fail when a target's median startup exceeds this.")
+    args = parser.parse_args()
+
+    over_budget = []
+    for name in args.target or TARGETS:
+        median = report(name, args.repeat, args.top)
+        if args.budget_ms is not None and median > args.budget_ms:
+            over_budget.append(name)
+
+    if over_budget:
+        print(f"Over the {args.budget_ms:.0f} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
@@ -0,0 +1,224 @@
+from asgiref.sync import sync_to_async
+from bson.json_util import dumps
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, NotAuthenticated, PermissionDenied, Throttled
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from .buffer import append_logs_async, should_flush_async
+from .exporters import ExportStream, export_headers, export_options
+from .metrics import log_created_counter, log_listed_counter, log_tampered_counter
+from .mongo import find_logs_async, timeseries_options, watch_logs_async
+from .query import FILTER_PARAMS, build_log_query, change_stream_match
+from .pagination import LogPagination, LogCursorPagination, decode_cursor, seek_query
+from .tasks import buffer_entry, flush_log_buffer
+from .throttles import RedisUserRateThrottle
+from .utils import validate_log_fields, verify_log_signatures
+from .views import log_exported_counter
+from pymongo.errors import OperationFailure
+import json
+import time
+
+
+async def queue_log(action, user_id=None, details=None):
+    """
+    Append a log to the shared buffer over async Redis, like create_log_task
+    does from a worker, and request a flush when the buffer is due.
+    """
+    length, age = await append_logs_async([buffer_entry(action, user_id, details)])
+    if await should_flush_async(length, age):
+        await sync_to_async(flush_log_buffer.delay, thread_sensitive=False)()
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncAPIView(View):
+    """
+    Base class for the async endpoints served under ASGI.
+    Authentication, permissions and throttling reuse the DRF classes used by
+    the sync views; they touch the user table and the throttle's Redis, so
+    they run in a worker thread, while handlers await MongoDB and Redis
+    directly. Handlers receive a DRF Request and return Django responses.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [RedisUserRateThrottle]
+    parser_classes = [JSONParser]
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(
+            request,
+            parsers=[parser() for parser in self.parser_classes],
+            authenticators=[auth() for auth in self.authentication_classes],
+        )
+        try:
+            await sync_to_async(self.check_request)(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            return self.handle_exception(request, exc)
+
+    def check_request(self, request):
+        request.user  # Authenticates, raising AuthenticationFailed on a bad token
+        for permission in [permission() for permission in self.permission_classes]:
+            if not permission.has_permission(request, self):
+                if request.authenticators and not request.successful_authenticator:
+                    raise NotAuthenticated()
+                raise PermissionDenied(getattr(permission, "message", None))
+        for throttle in [throttle() for throttle in self.throttle_classes]:
+            if not throttle.allow_request(request, self):
+                raise Throttled(throttle.wait())
+
+    def handle_exception(self, request, exc):
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+        response = JsonResponse(data, status=exc.status_code, safe=False)
+        if exc.status_code == 401:
+            response["WWW-Authenticate"] = self.authentication_classes[0]().authenticate_header(request)
+        return response
+
+
+class AsyncLogCreateView(AsyncAPIView):
+    throttle_scope = "log_create"
+
+    async def post(self, request, *args, **kwargs):
+        log_created_counter.inc()
+        action = request.data.get("action")
+        details = request.data.get("details", {})
+        try:
+            validate_log_fields(action, str(request.user.id), details)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        await queue_log(action, user_id=str(request.user.id), details=details)
+        return JsonResponse({"message": "Log created"}, status=201)
+
+
+class AsyncLogListView(AsyncAPIView):
+    throttle_scope = "log_list"
+
+    async def get(self, request, *args, **kwargs):
+        log_listed_counter.inc()
+        try:
+            # May read the distinct action names for action__contains
+            query = await sync_to_async(build_log_query, thread_sensitive=False)(request.query_params)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        if "cursor" in request.query_params:
+            paginator = LogCursorPagination()
+        else:
+            paginator = LogPagination()
+        page = await paginator.apaginate_query(query, request)
+
+        def verify_and_serialize():
+            verified_logs = []
+            tampered = []
+            for log, valid in zip(page, verify_log_signatures(page)):
+                if valid:
+                    verified_logs.append(log)
+                else:
+                    tampered.append(str(log["_id"]))
+            return json.loads(dumps(verified_logs)), tampered
+
+        # Signature checks are CPU-bound; keep them off the event loop
+        results, tampered = await sync_to_async(verify_and_serialize, thread_sensitive=False)()
+        if tampered:
+            log_tampered_counter.inc(len(tampered))
+        return JsonResponse(paginator.get_paginated_data(results, tampered=tampered))
+
+
+class AsyncLogExportView(AsyncAPIView):
+    throttle_scope = "log_export"
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            # May read the distinct action names for action__contains
+            query = await sync_to_async(build_log_query, thread_sensitive=False)(request.query_params)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            try:
+                query = seek_query(query, decode_cursor(cursor))
+            except ValueError:
+                return JsonResponse({"error": "Invalid cursor"}, status=400)
+        try:
+            export_format, compression = export_options(request.query_params)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        user_id = str(request.user.id)
+        export = ExportStream(find_logs_async(query), export_format, compression, on_batch=log_exported_counter.inc)
+
+        async def stream_export():
+            async for block in export.aiter():
+                yield block
+            await queue_log("export_logs", user_id=user_id, details={
+                "format": export_format.extension, "compression": compression, "count": export.count, "query": query,
+            })
+
+        # An async generator: a slow client holds a coroutine, not a worker
+        content_type, filename = export_headers(export_format, compression)
+        response = StreamingHttpResponse(stream_export(), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class AsyncLogStreamView(AsyncAPIView):
+    """
+    Server-sent events tailing a change stream on the log collections, for
+    consumers that would otherwise poll the list endpoint. Filters are the
+    list filters, applied by MongoDB in the stream's $match. Each event's
+    id is its resume token: EventSource clients resume from it after a
+    reconnect by sending Last-Event-ID (or pass ?resume_after=).
+    """
+    throttle_scope = "log_list"
+
+    async def get(self, request, *args, **kwargs):
+        if timeseries_options():
+            return JsonResponse({"error": "Live streams are not available for time-series log collections."}, status=501)
+        try:
+            match = change_stream_match(request.query_params)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        token = request.headers.get("Last-Event-ID") or request.query_params.get("resume_after")
+        try:
+            # Short awaits keep the loop responsive to heartbeats and disconnects
+            stream = await watch_logs_async([match], resume_after={"_data": token} if token else None, max_await_time_ms=1000)
+        except OperationFailure as e:
+            return JsonResponse({"error": f"Cannot open the log stream: {e}"}, status=400)
+
+        user_id = str(request.user.id)
+        filters = {name: request.query_params[name] for name in FILTER_PARAMS if request.query_params.get(name)}
+        await queue_log("stream_logs", user_id=user_id, details={"filters": filters, "resumed": bool(token)})
+
+        response = StreamingHttpResponse(self.events(stream), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # Stop nginx from buffering events
+        return response
+
+    async def events(self, stream):
+        heartbeat = getattr(settings, "LOG_STREAM_HEARTBEAT", 15)
+        last_sent = time.monotonic()
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                change = await stream.try_next()
+                if change is None:
+                    if time.monotonic() - last_sent >= heartbeat:
+                        yield b": keepalive\n\n"
+                        last_sent = time.monotonic()
+                    continue
+                log = change["fullDocument"]
+                event_id = change["_id"]["_data"]
+                if verify_log_signatures([log])[0]:
+                    yield f"id: {event_id}\nevent: log\ndata: {dumps(log)}\n\n".encode()
+                else:
+                    log_tampered_counter.inc()
+                    yield f"id: {event_id}\nevent: tampered\ndata: {json.dumps({'_id': str(log['_id'])})}\n\n".encode()
+                last_sent = time.monotonic()
+        finally:
+            await stream.close()
@@ -0,0 +1,188 @@
+from django.conf import settings
+from redis.exceptions import ResponseError
+from .serializers import DateTimeEncoder
+from weakref import WeakKeyDictionary
+import redis
+import redis.asyncio
+import asyncio
+import socket
+import json
+import time
+import os
+
+# Lazy per-process client; a prefork child must never reuse its parent's sockets
+_redis = None
+_redis_pid = None
+_group_ready = False
+
+# Async clients for ASGI views, one per event loop
+_async_redis = WeakKeyDictionary()
+
+LOG_BUFFER_GROUP = "flushers"
+
+
+def _buffer_key():
+    return getattr(settings, "LOG_BUFFER_KEY", "audittrail:log_buffer")
+
+
+def get_buffer_redis():
+    """
+    Get the Redis client backing the shared log buffer.
+    Defaults to the Celery broker's Redis.
+    """
+    global _redis, _redis_pid, _group_ready
+    if _redis is None or _redis_pid != os.getpid():
+        url = getattr(settings, "LOG_BUFFER_REDIS_URL", settings.CELERY_BROKER_URL)
+        _redis = redis.Redis.from_url(url)
+        _redis_pid = os.getpid()
+        _group_ready = False
+    return _redis
+
+
+def get_async_buffer_redis():
+    """Async client for the log buffer, bound to the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_redis.get(loop)
+    if client is None:
+        url = getattr(settings, "LOG_BUFFER_REDIS_URL", settings.CELERY_BROKER_URL)
+        client = _async_redis[loop] = redis.asyncio.Redis.from_url(url)
+    return client
+
+
+def _ensure_group(client):
+    global _group_ready
+    if _group_ready:
+        return
+    try:
+        client.xgroup_create(_buffer_key(), LOG_BUFFER_GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+    _group_ready = True
+
+
+def consumer_name():
+    """Name identifying this process as a buffer consumer."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def append_logs(entries):
+    """
+    Append log entries to the shared buffer stream in one round trip.
+    Returns (buffer_length, oldest_entry_age_seconds).
+    """
+    client = get_buffer_redis()
+    key = _buffer_key()
+    pipe = client.pipeline(transaction=False)
+    for entry in entries:
+        pipe.xadd(key, {"log": json.dumps(entry, cls=DateTimeEncoder)})
+    pipe.xlen(key)
+    pipe.xrange(key, count=1)
+    return _buffer_state(pipe.execute())
+
+
+async def append_logs_async(entries):
+    """Async counterpart of append_logs, for ASGI views."""
+    key = _buffer_key()
+    pipe = get_async_buffer_redis().pipeline(transaction=False)
+    for entry in entries:
+        pipe.xadd(key, {"log": json.dumps(entry, cls=DateTimeEncoder)})
+    pipe.xlen(key)
+    pipe.xrange(key, count=1)
+    return _buffer_state(await pipe.execute())
+
+
+def _buffer_state(results):
+    length, oldest = results[-2], results[-1]
+    age = 0.0
+    if oldest:
+        oldest_ms = int(oldest[0][0].split(b"-")[0])
+        age = max(0.0, time.time() - oldest_ms / 1000)
+    return length, age
+
+
+def _flush_due(length, age):
+    flush_size = getattr(settings, "LOG_BUFFER_FLUSH_SIZE", 1000)
+    max_age = getattr(settings, "LOG_BUFFER_MAX_AGE_SECONDS", 5)
+    return length >= flush_size or age >= max_age
+
+
+def should_flush(length, age):
+    """
+    Decide whether the buffer is full or old enough to flush now. At most one
+    flush is requested per debounce window so bursts don't flood the broker.
+    """
+    if not _flush_due(length, age):
+        return False
+    return bool(get_buffer_redis().set(f"{_buffer_key()}:flush_requested", 1, nx=True, ex=1))
+
+
+async def should_flush_async(length, age):
+    """Async counterpart of should_flush."""
+    if not _flush_due(length, age):
+        return False
+    return bool(await get_async_buffer_redis().set(f"{_buffer_key()}:flush_requested", 1, nx=True, ex=1))
+
+
+def claim_logs(count):
+    """
+    Atomically claim up to `count` entries for this process.
+    Entries a crashed flusher claimed but never acknowledged are taken over
+    first, once idle for LOG_BUFFER_CLAIM_IDLE_MS. Returns [(entry_id, log)].
+    """
+    global _group_ready
+    try:
+        messages = _claim(count)
+    except ResponseError as e:
+        # The stream (and its group) vanished, e.g. after a Redis restart
+        if "NOGROUP" not in str(e):
+            raise
+        _group_ready = False
+        messages = _claim(count)
+    return [(entry_id, json.loads(fields[b"log"])) for entry_id, fields in messages if fields]
+
+
+def _claim(count):
+    client = get_buffer_redis()
+    _ensure_group(client)
+    key = _buffer_key()
+    consumer = consumer_name()
+    idle_ms = getattr(settings, "LOG_BUFFER_CLAIM_IDLE_MS", 60000)
+
+    messages = client.xautoclaim(key, LOG_BUFFER_GROUP, consumer, min_idle_time=idle_ms, start_id="0-0", count=count)[1]
+    if len(messages) < count:
+        for _, new_messages in client.xreadgroup(LOG_BUFFER_GROUP, consumer, {key: ">"}, count=count - len(messages)) or []:
+            messages.extend(new_messages)
+    return messages
+
+
+def ack_logs(entry_ids):
+    """Remove flushed entries from the buffer."""
+    if not entry_ids:
+        return
+    client = get_buffer_redis()
+    key = _buffer_key()
+    pipe = client.pipeline()
+    pipe.xack(key, LOG_BUFFER_GROUP, *entry_ids)
+    pipe.xdel(key, *entry_ids)
+    pipe.execute()
+
+
+def dead_letter_logs(claimed):
+    """
+    Move entries MongoDB permanently rejected to a dead-letter stream so they
+    are kept for inspection instead of being retried forever.
+    """
+    if not claimed:
+        return
+    client = get_buffer_redis()
+    pipe = client.pipeline()
+    for _, log in claimed:
+        pipe.xadd(f"{_buffer_key()}:dead", {"log": json.dumps(log, cls=DateTimeEncoder)})
+    pipe.execute()
+    ack_logs([entry_id for entry_id, _ in claimed])
+
+
+def buffer_length():
+    """Number of entries waiting in (or claimed from) the buffer."""
+    return get_buffer_redis().xlen(_buffer_key())
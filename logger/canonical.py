@@ -0,0 +1,79 @@
+# Canonical serialization of log entries for HMAC signing.
+# The signed message has always been json.dumps(entry, sort_keys=True) with the
+# timestamp rendered as "%Y-%m-%d %H:%M:%S+00:00" and the signature left out.
+# Every stored signature depends on those exact bytes, so this module must
+# reproduce them byte for byte; it only avoids the work around the encoder.
+from json.encoder import JSONEncoder, encode_basestring_ascii
+from functools import lru_cache
+
+try:
+    from json.encoder import c_make_encoder
+except ImportError:
+    c_make_encoder = None
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S+00:00"
+
+# Top-level fields of every log written by this service, in sort_keys order
+SIGNED_FIELDS = ("_id", "action", "details", "timestamp", "user_id")
+
+# Reusing one encoder skips building a new JSONEncoder (and C scanner) on every
+# json.dumps call; the options match json.dumps(..., sort_keys=True) exactly.
+# Circular-reference checks are off: entries are decoded JSON or BSON.
+_encoder = JSONEncoder(sort_keys=True)
+if c_make_encoder is not None:
+    _c_encoder = c_make_encoder(None, _encoder.default, encode_basestring_ascii, None, ": ", ", ", True, False, True)
+
+    def _encode_any(value):
+        return "".join(_c_encoder(value, 0))
+else:
+    _encode_any = _encoder.encode
+
+
+@lru_cache(maxsize=8192)
+def _format_timestamp(timestamp, utcoffset):
+    return timestamp.strftime(TIMESTAMP_FORMAT)
+
+
+def format_timestamp(timestamp):
+    """
+    Render a timestamp the way it is signed, ignoring microseconds.
+    Cached per distinct datetime; the offset is part of the key because equal
+    instants in different zones render different wall-clock times.
+    """
+    return _format_timestamp(timestamp, timestamp.utcoffset())
+
+
+def _encode(value):
+    if type(value) is str:
+        return encode_basestring_ascii(value)
+    if value is None:
+        return "null"
+    return _encode_any(value)
+
+
+def signing_message(log_entry):
+    """
+    Return the bytes signed for `log_entry`, excluding its signature.
+    """
+    if len(log_entry) - ("signature" in log_entry) == len(SIGNED_FIELDS):
+        try:
+            return _fast_message(log_entry)
+        except KeyError:
+            pass
+
+    entry = {k: v for k, v in log_entry.items() if k != "signature"}
+    entry["timestamp"] = format_timestamp(entry["timestamp"])
+    return _encode_any(entry).encode()
+
+
+def _fast_message(log_entry):
+    # The fixed top-level layout, without copying or sorting. Raises KeyError
+    # when the entry has other fields, so the caller falls back to the encoder.
+    return (
+        '{"_id": ' + _encode(log_entry["_id"])
+        + ', "action": ' + _encode(log_entry["action"])
+        + ', "details": ' + _encode(log_entry["details"])
+        + ', "timestamp": "' + format_timestamp(log_entry["timestamp"])
+        + '", "user_id": ' + _encode(log_entry["user_id"])
+        + "}"
+    ).encode()
@@ -0,0 +1,205 @@
+from django.conf import settings
+from datetime import datetime, timezone
+from .serializers import DateTimeEncoder
+from .utils import verify_log_signatures
+import importlib
+import importlib.util
+import json
+import os
+
+
+class _LazyModule:
+    """
+    An optional module imported on first attribute access rather than at
+    startup (pyarrow alone adds a few hundred milliseconds to every process).
+    Falsy when the module is not installed, like the None it replaces.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._installed = None
+
+    def __bool__(self):
+        if self._installed is None:
+            self._installed = importlib.util.find_spec(self._name) is not None
+        return self._installed
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+# Optional: only needed for Parquet/Arrow exports and archives
+pa = _LazyModule("pyarrow")
+pq = _LazyModule("pyarrow.parquet")
+
+# Low-cardinality columns stored dictionary-encoded
+DICTIONARY_COLUMNS = ["action", "user_id"]
+
+
+def require_pyarrow():
+    if not pa:
+        raise ImportError("Parquet/Arrow output requires the pyarrow package.")
+
+
+def arrow_schema():
+    """Columns of Parquet/Arrow exports and archives; details are a JSON string."""
+    return pa.schema([
+        ("_id", pa.string()),
+        ("timestamp", pa.timestamp("ms", tz="UTC")),
+        ("action", pa.dictionary(pa.int32(), pa.string())),
+        ("user_id", pa.dictionary(pa.int32(), pa.string())),
+        ("details", pa.string()),
+        ("signature", pa.string()),
+    ])
+
+
+def logs_to_record_batch(logs):
+    """Build an Arrow record batch from log documents."""
+    return pa.RecordBatch.from_arrays([
+        pa.array([str(log["_id"]) for log in logs], pa.string()),
+        pa.array([log["timestamp"] for log in logs], pa.timestamp("ms", tz="UTC")),
+        pa.array([log["action"] for log in logs], pa.string()).dictionary_encode(),
+        pa.array([log.get("user_id") for log in logs], pa.string()).dictionary_encode(),
+        pa.array([json.dumps(log.get("details") or {}, cls=DateTimeEncoder) for log in logs], pa.string()),
+        pa.array([log.get("signature") for log in logs], pa.string()),
+    ], schema=arrow_schema())
+
+
+def encode_arrow_batch(batch):
+    """
+    Verify a batch of logs and return (record batch of the valid ones, count).
+    Module-level so process pools can pickle it, like encode_json_batch.
+    """
+    valid_logs = [log for log, valid in zip(batch, verify_log_signatures(batch)) if valid]
+    return logs_to_record_batch(valid_logs), len(valid_logs)
+
+
+class _ByteSink:
+    """Minimal writable file that hands written bytes back on drain()."""
+
+    closed = False
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def write(self, data):
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+class ColumnarWriter:
+    """
+    Streams record batches as a Parquet file or an Arrow IPC stream.
+    Parquet rows are grouped into row groups of LOG_PARQUET_ROW_GROUP_SIZE,
+    which bounds memory to one row group. Used by ExportStream in place
+    of ChunkedWriter.
+    """
+
+    def __init__(self, kind):
+        require_pyarrow()
+        self.kind = kind
+        self._sink = _ByteSink()
+        out = pa.PythonFile(self._sink, mode="w")
+        if kind == "parquet":
+            self._writer = pq.ParquetWriter(out, arrow_schema(), compression="zstd", use_dictionary=DICTIONARY_COLUMNS)
+        else:
+            self._writer = pa.ipc.new_stream(out, arrow_schema())
+        self._row_group_size = getattr(settings, "LOG_PARQUET_ROW_GROUP_SIZE", 50000)
+        self._pending = []
+        self._pending_rows = 0
+
+    def write(self, record_batch, emit=True):
+        if self.kind != "parquet":
+            self._writer.write_batch(record_batch)
+        else:
+            self._pending.append(record_batch)
+            self._pending_rows += record_batch.num_rows
+            if self._pending_rows >= self._row_group_size:
+                self._write_row_group()
+        return (self._sink.drain() or None) if emit else None
+
+    def _write_row_group(self):
+        if self._pending_rows:
+            self._writer.write_table(pa.Table.from_batches(self._pending), row_group_size=self._pending_rows)
+        self._pending = []
+        self._pending_rows = 0
+
+    def close(self):
+        if self.kind == "parquet":
+            self._write_row_group()
+        self._writer.close()
+        return self._sink.drain()
+
+
+class ParquetArchiveSink:
+    """
+    Writes archived logs to `directory` as Hive-style month partitions,
+    e.g. month=2026-09/logs-20261018T120000-1.parquet, so readers can prune
+    by month and push predicates down to row-group statistics. Files are
+    written under a .tmp name and only renamed into place by close().
+    """
+
+    def __init__(self, directory, part=1):
+        require_pyarrow()
+        self.directory = directory
+        self.name = f"logs-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{part}.parquet"
+        self.row_group_size = getattr(settings, "LOG_PARQUET_ROW_GROUP_SIZE", 50000)
+        self._writers = {}
+        self._pending = {}
+        self.paths = []
+
+    def write(self, logs):
+        months = {}
+        for log in logs:
+            months.setdefault(log["timestamp"].strftime("%Y-%m"), []).append(log)
+        for month, month_logs in months.items():
+            pending = self._pending.setdefault(month, [])
+            pending.extend(month_logs)
+            if len(pending) >= self.row_group_size:
+                self._write_row_group(month)
+
+    def _write_row_group(self, month):
+        pending = self._pending.pop(month, [])
+        if not pending:
+            return
+        writer = self._writers.get(month)
+        if writer is None:
+            month_dir = os.path.join(self.directory, f"month={month}")
+            os.makedirs(month_dir, exist_ok=True)
+            path = os.path.join(month_dir, self.name)
+            writer = self._writers[month] = pq.ParquetWriter(
+                f"{path}.tmp", arrow_schema(), compression="zstd", use_dictionary=DICTIONARY_COLUMNS,
+            )
+            self.paths.append(path)
+        writer.write_batch(logs_to_record_batch(pending), row_group_size=len(pending))
+
+    def close(self):
+        """Finish every file and move it into place. Returns the written paths."""
+        for month in list(self._pending):
+            self._write_row_group(month)
+        for writer in self._writers.values():
+            writer.close()
+        for path in self.paths:
+            with open(f"{path}.tmp", "rb") as f:
+                os.fsync(f.fileno())
+            os.replace(f"{path}.tmp", path)
+        return self.paths
@@ -0,0 +1,206 @@
+from django.conf import settings
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING
+from .exporters import ExportStream, export_headers, export_options
+from .mongo import get_mongo_collection, count_logs, find_logs
+from .query import FILTER_PARAMS, build_log_query
+import time
+import uuid
+import os
+
+# Seconds between progress writes to the job document
+PROGRESS_INTERVAL = 1.0
+
+
+def get_jobs_collection():
+    """Collection of export jobs, one document per job keyed by job id."""
+    return get_mongo_collection("export_jobs")
+
+
+def ensure_export_job_indexes():
+    """Indexes for the cleanup_export_jobs task (ensure_indexes command)."""
+    collection = get_jobs_collection()
+    collection.create_index("expires_at")
+    collection.create_index([("status", ASCENDING), ("started_at", ASCENDING)])
+
+
+def _ttl():
+    return timedelta(hours=getattr(settings, "LOG_EXPORT_JOB_TTL_HOURS", 24))
+
+
+def _expires_at(finished_at):
+    return finished_at + _ttl()
+
+
+def create_export_job(params, user_id):
+    """
+    Validate export parameters and store a queued job for them. Text
+    formats are gzip-compressed unless another compression is requested.
+    Raises ValueError for invalid filters or formats. Returns the job.
+    """
+    export_format, compression = export_options(params)
+    if compression is None and not export_format.columnar:
+        compression = "gzip"
+    filters = {name: str(params[name]) for name in FILTER_PARAMS if params.get(name)}
+    build_log_query(filters)  # Reject bad timestamps now rather than in the worker
+    job = {
+        "_id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "status": "queued",
+        "filters": filters,
+        "format": export_format.extension,
+        "compression": compression,
+        "exported": 0,
+        "total": None,
+        "size": None,
+        "error": None,
+        "created_at": datetime.now(timezone.utc),
+        "started_at": None,
+        "finished_at": None,
+        "expires_at": None,
+    }
+    get_jobs_collection().insert_one(job)
+    return job
+
+
+def job_path(job):
+    """Where a finished job's file is stored (under LOG_EXPORT_JOB_DIR)."""
+    _, filename = export_headers(*export_options(job))
+    extension = filename.split(".", 1)[1]
+    return os.path.join(getattr(settings, "LOG_EXPORT_JOB_DIR", "exports"), f"{job['_id']}.{extension}")
+
+
+def run_export_job(job_id):
+    """
+    Stream a job's query to its file, recording progress on the job as it
+    goes. The file is written under a .tmp name and renamed once complete,
+    so a download never sees a partial export. Returns the finished job.
+    """
+    jobs = get_jobs_collection()
+    job = jobs.find_one({"_id": job_id})
+    export_format, compression = export_options(job)
+    query = build_log_query(job["filters"])
+    path = job_path(job)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    jobs.update_one({"_id": job_id}, {"$set": {
+        "status": "running", "total": count_logs(query), "started_at": datetime.now(timezone.utc),
+    }})
+    last_update = time.monotonic()
+
+    def on_batch(count):
+        nonlocal last_update
+        if time.monotonic() - last_update >= PROGRESS_INTERVAL:
+            jobs.update_one({"_id": job_id}, {"$set": {"exported": export.count}})
+            last_update = time.monotonic()
+
+    export = ExportStream(find_logs(query), export_format, compression, on_batch=on_batch)
+    try:
+        with open(f"{path}.tmp", "wb") as f:
+            for block in export:
+                f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+    except Exception as e:
+        finished_at = datetime.now(timezone.utc)
+        jobs.update_one({"_id": job_id}, {"$set": {
+            "status": "failed", "error": str(e), "finished_at": finished_at, "expires_at": _expires_at(finished_at),
+        }})
+        _remove(f"{path}.tmp")
+        raise
+
+    finished_at = datetime.now(timezone.utc)
+    jobs.update_one({"_id": job_id}, {"$set": {
+        "status": "done",
+        "exported": export.count,
+        "size": os.path.getsize(path),
+        "finished_at": finished_at,
+        "expires_at": _expires_at(finished_at),
+    }})
+    return jobs.find_one({"_id": job_id})
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def fail_stale_export_jobs():
+    """
+    Mark jobs still running LOG_EXPORT_JOB_TIMEOUT_SECONDS after they started
+    as failed, e.g. because their worker crashed, and remove their partial
+    file. Returns the number of jobs failed.
+    """
+    jobs = get_jobs_collection()
+    now = datetime.now(timezone.utc)
+    started_before = now - timedelta(seconds=getattr(settings, "LOG_EXPORT_JOB_TIMEOUT_SECONDS", 3600))
+    failed = 0
+    for job in jobs.find({"status": "running", "started_at": {"$lt": started_before}}):
+        # Guarded on the status so a job finishing meanwhile keeps its result
+        result = jobs.update_one({"_id": job["_id"], "status": "running"}, {"$set": {
+            "status": "failed", "error": "Export timed out", "finished_at": now, "expires_at": _expires_at(now),
+        }})
+        if result.modified_count:
+            _remove(f"{job_path(job)}.tmp")
+            failed += 1
+    return failed
+
+
+def expire_export_jobs():
+    """
+    Delete finished jobs LOG_EXPORT_JOB_TTL_HOURS after they finished,
+    along with their files. Returns the number of jobs deleted.
+    """
+    jobs = get_jobs_collection()
+    now = datetime.now(timezone.utc)
+    expired = jobs.find({"$or": [
+        {"expires_at": {"$lte": now}},
+        # Finished before jobs had an expiry
+        {"expires_at": None, "finished_at": {"$ne": None, "$lte": now - _ttl()}},
+    ]})
+    deleted = 0
+    for job in expired:
+        _remove(job_path(job))
+        deleted += jobs.delete_one({"_id": job["_id"]}).deleted_count
+    return deleted
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range `Range: bytes=...` header against a file of `size`
+    bytes. Returns (start, end) inclusive, or None to serve the whole file
+    (no header, a malformed one, or several ranges). Raises ValueError when
+    the range cannot be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        first = int(first) if first else None
+        last = int(last) if last else None
+    except ValueError:
+        return None
+    if first is None:
+        # Suffix range: the last N bytes
+        if not last or not size:
+            raise ValueError("Unsatisfiable range")
+        return max(size - last, 0), size - 1
+    if first >= size or (last is not None and last < first):
+        raise ValueError("Unsatisfiable range")
+    return first, size - 1 if last is None else min(last, size - 1)
+
+
+def iter_file_range(path, start, end, chunk_size=64 * 1024):
+    """Yield bytes start..end (inclusive) of a file in chunks."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            data = f.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
@@ -0,0 +1,320 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import deque
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .serializers import DateTimeEncoder
+from .utils import verify_log_signatures
+from .columnar import ColumnarWriter, encode_arrow_batch, pa
+import multiprocessing
+import asyncio
+import atexit
+import django
+import json
+import os
+import threading
+import zlib
+import io
+
+try:
+    import zstandard
+except ImportError:  # Optional: only needed for compression=zstd
+    zstandard = None
+
+# Columns of CSV exports; details are embedded as a JSON string
+CSV_COLUMNS = ["_id", "timestamp", "action", "user_id", "details", "signature"]
+
+# This process's export pool, created on first use (see get_export_executor):
+# {"executor", "config": (kind, workers), "pid"}
+_pool = {}
+_pool_lock = threading.Lock()
+
+
+def encode_json_batch(batch):
+    """
+    Verify a batch of logs and encode the valid ones as comma-separated JSON
+    objects. Returns (text, count). Module-level so process pools can pickle it.
+    """
+    rows = [json.dumps(log, cls=DateTimeEncoder) for log, valid in zip(batch, verify_log_signatures(batch)) if valid]
+    return ",".join(rows), len(rows)
+
+
+def encode_ndjson_batch(batch):
+    """Like encode_json_batch, as newline-terminated JSON lines."""
+    rows = [json.dumps(log, cls=DateTimeEncoder) + "\n" for log, valid in zip(batch, verify_log_signatures(batch)) if valid]
+    return "".join(rows), len(rows)
+
+
+def encode_csv_batch(batch):
+    """Like encode_json_batch, as CSV rows in CSV_COLUMNS order."""
+    import csv
+
+    out = io.StringIO()
+    writer = csv.writer(out)
+    count = 0
+    for log, valid in zip(batch, verify_log_signatures(batch)):
+        if not valid:
+            continue
+        writer.writerow([
+            log["_id"],
+            log["timestamp"].isoformat(),
+            log["action"],
+            log.get("user_id") or "",
+            json.dumps(log.get("details") or {}, cls=DateTimeEncoder),
+            log["signature"],
+        ])
+        count += 1
+    return out.getvalue(), count
+
+
+class ExportFormat:
+    """
+    How an export is framed: batch encoder, document header/footer and
+    separator, and the writer turning encoded batches into byte blocks
+    (ChunkedWriter for text formats).
+    """
+
+    def __init__(self, content_type, extension, encode_batch, header="", footer="", separator="", columnar=False):
+        self.content_type = content_type
+        self.extension = extension
+        self.encode_batch = encode_batch
+        self.header = header
+        self.footer = footer
+        self.separator = separator
+        self.columnar = columnar
+
+    def make_writer(self, compression=None):
+        if self.columnar:
+            return ColumnarWriter(self.extension)
+        return ChunkedWriter(compression)
+
+
+EXPORT_FORMATS = {
+    "json": ExportFormat("application/json", "json", encode_json_batch, header="[", footer="]", separator=","),
+    "ndjson": ExportFormat("application/x-ndjson", "ndjson", encode_ndjson_batch),
+    "csv": ExportFormat("text/csv", "csv", encode_csv_batch, header=",".join(CSV_COLUMNS) + "\r\n"),
+    "parquet": ExportFormat("application/vnd.apache.parquet", "parquet", encode_arrow_batch, columnar=True),
+    "arrow": ExportFormat("application/vnd.apache.arrow.stream", "arrow", encode_arrow_batch, columnar=True),
+}
+
+COMPRESSIONS = {
+    "gzip": ("application/gzip", "gz"),
+    "zstd": ("application/zstd", "zst"),
+}
+
+
+def export_options(params):
+    """
+    Validate the `format` and `compression` export parameters.
+    Returns (ExportFormat, compression or None); raises ValueError.
+    """
+    name = params.get("format") or "json"
+    if name not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format {name!r}. Use one of: {', '.join(EXPORT_FORMATS)}.")
+    compression = params.get("compression") or None
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError(f"Unsupported compression {compression!r}. Use one of: {', '.join(COMPRESSIONS)}.")
+    if compression == "zstd" and zstandard is None:
+        raise ValueError("zstd compression requires the zstandard package.")
+    export_format = EXPORT_FORMATS[name]
+    if export_format.columnar:
+        if not pa:
+            raise ValueError(f"{name} export requires the pyarrow package.")
+        if compression:
+            raise ValueError(f"{name} exports are compressed internally; omit compression.")
+    return export_format, compression
+
+
+def export_headers(export_format, compression):
+    """Content type and download filename for an export."""
+    filename = f"logs_export.{export_format.extension}"
+    if compression:
+        content_type, extension = COMPRESSIONS[compression]
+        return content_type, f"{filename}.{extension}"
+    return export_format.content_type, filename
+
+
+class ChunkedWriter:
+    """
+    Accumulates encoded export text and hands it out as compressed (or
+    plain) blocks of about LOG_EXPORT_CHUNK_SIZE bytes, so a streaming
+    response yields a few large writes instead of one per row.
+    """
+
+    def __init__(self, compression=None):
+        self.chunk_size = getattr(settings, "LOG_EXPORT_CHUNK_SIZE", 64 * 1024)
+        if compression == "gzip":
+            self._compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        elif compression == "zstd":
+            self._compressor = zstandard.ZstdCompressor().compressobj()
+        else:
+            self._compressor = None
+        self._buffer = bytearray()
+
+    def write(self, text, emit=True):
+        """
+        Add text. Returns a block once a full chunk is buffered, else None;
+        with emit=False the text is only buffered.
+        """
+        data = text.encode()
+        self._buffer += self._compressor.compress(data) if self._compressor else data
+        if not emit or len(self._buffer) < self.chunk_size:
+            return None
+        block = bytes(self._buffer)
+        self._buffer.clear()
+        return block
+
+    def close(self):
+        """Flush the compressor and return whatever is left."""
+        if self._compressor:
+            self._buffer += self._compressor.flush()
+        block = bytes(self._buffer)
+        self._buffer.clear()
+        return block
+
+
+class ExportStream:
+    """
+    Iterable of byte blocks for an export of `logs` (sync) or, via
+    `aiter`, of an async iterable of logs. `count` holds the number of
+    rows written so far; `on_batch(count)` is called after each batch.
+    """
+
+    def __init__(self, logs, export_format, compression=None, on_batch=None):
+        self.logs = logs
+        self.export_format = export_format
+        self.compression = compression
+        self.on_batch = on_batch
+        self.count = 0
+
+    def _rows(self, rows, batch_count):
+        if self.count and self.export_format.separator:
+            rows = self.export_format.separator + rows
+        self.count += batch_count
+        if self.on_batch:
+            self.on_batch(batch_count)
+        return rows
+
+    def _writer(self):
+        writer = self.export_format.make_writer(self.compression)
+        if self.export_format.header:
+            writer.write(self.export_format.header, emit=False)
+        return writer
+
+    def _close(self, writer):
+        if self.export_format.footer:
+            writer.write(self.export_format.footer, emit=False)
+        return writer.close()
+
+    def __iter__(self):
+        writer = self._writer()
+        for rows, batch_count in iter_encoded_batches(self.logs, self.export_format.encode_batch):
+            if batch_count and (block := writer.write(self._rows(rows, batch_count))):
+                yield block
+        yield self._close(writer)
+
+    async def aiter(self):
+        writer = self._writer()
+        async for rows, batch_count in aiter_encoded_batches(self.logs, self.export_format.encode_batch):
+            if batch_count and (block := writer.write(self._rows(rows, batch_count))):
+                yield block
+        yield self._close(writer)
+
+
+def _init_worker():
+    django.setup()
+
+
+def _make_executor(kind, workers):
+    if kind == "process":
+        # spawn rather than fork: the parent may be a threaded web worker
+        return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker)
+    return ThreadPoolExecutor(workers, thread_name_prefix="log-export")
+
+
+def get_export_executor():
+    """
+    This process's export pool (LOG_EXPORT_EXECUTOR with LOG_EXPORT_WORKERS
+    workers), created on first use and shared by every export, so process
+    workers only pay for spawning and django.setup() once. Like the
+    MongoClient, a forked child creates its own; it is shut down at exit.
+    """
+    config = (getattr(settings, "LOG_EXPORT_EXECUTOR", "thread"), getattr(settings, "LOG_EXPORT_WORKERS", 1))
+    with _pool_lock:
+        if _pool.get("config") != config or _pool.get("pid") != os.getpid():
+            if _pool.get("pid") == os.getpid():
+                # Reconfigured (tests): exports already using the old pool finish on it
+                _pool["executor"].shutdown(wait=False)
+            elif not _pool:
+                atexit.register(shutdown_export_executor)
+            _pool.update(executor=_make_executor(*config), config=config, pid=os.getpid())
+        return _pool["executor"]
+
+
+def shutdown_export_executor():
+    with _pool_lock:
+        if _pool.get("pid") == os.getpid():
+            _pool["executor"].shutdown(wait=False, cancel_futures=True)
+        _pool.clear()
+
+
+def iter_encoded_batches(logs, encode_batch=encode_json_batch):
+    """
+    Yield encode_batch(batch) for consecutive batches of `logs`, in cursor order.
+    With LOG_EXPORT_WORKERS > 1 batches are verified and encoded on the
+    process's export pool (get_export_executor). At most two batches per
+    worker are in flight, so reading from MongoDB only runs ahead of the
+    client by that much and a slow reader applies backpressure all the way
+    to the cursor.
+    """
+    batch_size = getattr(settings, "LOG_EXPORT_BATCH_SIZE", 500)
+    workers = getattr(settings, "LOG_EXPORT_WORKERS", 1)
+    logs = iter(logs)
+
+    if workers <= 1:
+        while batch := list(islice(logs, batch_size)):
+            yield encode_batch(batch)
+        return
+
+    executor = get_export_executor()
+    in_flight = deque()
+    try:
+        while True:
+            while len(in_flight) < workers * 2 and (batch := list(islice(logs, batch_size))):
+                in_flight.append(executor.submit(encode_batch, batch))
+            if not in_flight:
+                break
+            yield in_flight.popleft().result()
+    finally:
+        # The client disconnected mid-stream: drop its queued batches
+        for future in in_flight:
+            future.cancel()
+
+
+async def aiter_encoded_batches(logs, encode_batch=encode_json_batch):
+    """
+    Async counterpart of iter_encoded_batches for an async iterable of logs.
+    Each batch is verified and encoded in a worker thread while the next one
+    is read from MongoDB, so the event loop only ever waits on I/O.
+    """
+    batch_size = getattr(settings, "LOG_EXPORT_BATCH_SIZE", 500)
+    encode = sync_to_async(encode_batch, thread_sensitive=False)
+    pending = None
+    batch = []
+    try:
+        async for log in logs:
+            batch.append(log)
+            if len(batch) < batch_size:
+                continue
+            if pending is not None:
+                yield await pending
+            pending = asyncio.ensure_future(encode(batch))
+            batch = []
+        if pending is not None:
+            yield await pending
+            pending = None
+        if batch:
+            yield await encode(batch)
+    finally:
+        if pending is not None:
+            pending.cancel()
@@ -0,0 +1,35 @@
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+
+
+def lazy_view(view_path, **initkwargs):
+    """
+    Class-based view that is imported and built on its first request, so
+    loading the URLconf does not import GraphQL, OpenAPI or async machinery
+    that most processes (workers, migrate, WSGI servers, ...) never use.
+    """
+    view = None
+
+    @csrf_exempt
+    def dispatch(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(view_path).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+    return dispatch
+
+
+def lazy_async_view(view_path, **initkwargs):
+    """
+    lazy_view for async class-based views: Django must see a coroutine
+    function in the URLconf to run the view on the event loop.
+    """
+    view = None
+
+    @csrf_exempt
+    async def dispatch(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(view_path).as_view(**initkwargs)
+        return await view(request, *args, **kwargs)
+    return dispatch
@@ -0,0 +1,74 @@
+from django.contrib.auth.models import User
+from .mongo import find_logs
+from .utils import verify_log_signatures
+
+
+class BatchLoader:
+    """
+    Per-request loader that resolves every pending key with one call to
+    `batch_fn(keys) -> {key: value}`. Resolvers queue the keys of a whole
+    page up front, so the first node that loads a value loads it for every
+    node on the page. GraphQL runs synchronously under graphene-django,
+    hence this instead of graphene's asyncio DataLoader.
+    """
+
+    def __init__(self, batch_fn):
+        self.batch_fn = batch_fn
+        self._values = {}
+        self._pending = {}
+
+    def queue(self, keys):
+        for key in keys:
+            if key not in self._values:
+                self._pending[key] = None
+
+    def prime(self, values):
+        """Store values that are already known, e.g. computed alongside the page."""
+        self._values.update(values)
+        for key in values:
+            self._pending.pop(key, None)
+
+    def load(self, key):
+        if key not in self._values:
+            self._pending[key] = None
+            keys = list(self._pending)
+            self._pending.clear()
+            loaded = self.batch_fn(keys)
+            for k in keys:
+                self._values[k] = loaded.get(k)
+        return self._values[key]
+
+
+def load_verified(keys):
+    """
+    Signature validity for (log id, timestamp) keys, fetching the logs in one
+    query; the timestamps bound the read to the partitions that hold them.
+    Logs that no longer exist are reported as not verified.
+    """
+    timestamps = [timestamp for _, timestamp in keys]
+    query = {
+        "_id": {"$in": [log_id for log_id, _ in keys]},
+        "timestamp": {"$gte": min(timestamps), "$lte": max(timestamps)},
+    }
+    logs = list(find_logs(query))
+    valid = {str(log["_id"]): result for log, result in zip(logs, verify_log_signatures(logs))}
+    return {key: valid.get(key[0], False) for key in keys}
+
+
+def load_users(user_ids):
+    """Django users for log user_ids, in one query; unknown ids are left out."""
+    ids = [int(user_id) for user_id in user_ids if user_id and user_id.isdigit()]
+    return {str(user.id): user for user in User.objects.filter(id__in=ids)}
+
+
+def get_loaders(context):
+    """
+    The loaders of the current GraphQL request, kept on its context (the
+    HttpRequest under GraphQLView). Without a context nothing is shared.
+    """
+    loaders = getattr(context, "log_loaders", None)
+    if loaders is None:
+        loaders = {"verified": BatchLoader(load_verified), "user": BatchLoader(load_users)}
+        if context is not None:
+            context.log_loaders = loaders
+    return loaders
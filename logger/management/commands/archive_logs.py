@@ -1,5 +1,10 @@
-from django.core.management.base import BaseCommand
-from logger.mongo import get_mongo_collection
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from logger.mongo import get_mongo_collection, get_partitioning, has_legacy_logs, invalidate_partitions, list_partitions, partition_bounds, timeseries_options
+from logger.columnar import ParquetArchiveSink, require_pyarrow
+from logger.merkle import mark_archived
+from logger.query_cache import invalidate_all
+from pymongo import ReplaceOne
 from datetime import datetime, timedelta
 import logging
 
@@ -15,36 +20,205 @@ class Command(BaseCommand):
             default=30,
             help='Number of days to consider for archiving (default: 30)',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of logs copied and deleted per round trip (default: 5000)',
+        )
+        parser.add_argument(
+            '--use-merge',
+            action='store_true',
+            help='Copy each batch server-side with an aggregation $merge instead of sending documents through this process',
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            help='Delete old logs (or drop whole partitions) without keeping an archive copy',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['mongo', 'parquet'],
+            default=getattr(settings, 'LOG_ARCHIVE_FORMAT', 'mongo'),
+            help='Archive into the logs_archive collection (mongo) or into Parquet files (default: LOG_ARCHIVE_FORMAT)',
+        )
+        parser.add_argument(
+            '--output-dir',
+            default=getattr(settings, 'LOG_ARCHIVE_DIR', 'archive'),
+            help='Directory for Parquet archives, partitioned by month (default: LOG_ARCHIVE_DIR)',
+        )
+        parser.add_argument(
+            '--rows-per-file',
+            type=int,
+            default=500000,
+            help='Logs written per Parquet file before they are deleted from MongoDB (default: 500000)',
+        )
 
     def handle(self, *args, **options):
         days = options['days']
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+        if options['rows_per_file'] < 1:
+            raise CommandError("--rows-per-file must be a positive integer.")
+        if options['format'] == 'parquet' and not options['drop']:
+            try:
+                require_pyarrow()
+            except ImportError as e:
+                raise CommandError(str(e))
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         self.stdout.write(f"Archiving logs older than {cutoff_date}")
 
         try:
-            # Get MongoDB collections
-            logs_collection = get_mongo_collection('logs_collection')
-            archive_collection = get_mongo_collection('logs_archive')
-
-            # Find logs to archive
-            query = {'timestamp': {'$lt': cutoff_date}}
-            logs_to_archive = logs_collection.find(query)
-            logs_count = logs_collection.count_documents(query)
+            archived = 0
+            if get_partitioning():
+                try:
+                    archived += self._archive_partitions(cutoff_date, batch_size, options)
+                finally:
+                    invalidate_partitions()  # Renamed or dropped partitions
+            if not get_partitioning() or has_legacy_logs():
+                # audit_logs, including logs written before partitioning was enabled
+                archived += self._archive_collection(
+                    get_mongo_collection('audit_logs'),
+                    get_mongo_collection('logs_archive'),
+                    {'timestamp': {'$lt': cutoff_date}},
+                    batch_size,
+                    options,
+                )
 
-            if logs_count == 0:
+            if archived == 0:
                 self.stdout.write("No logs to archive.")
                 logger.info("No logs to archive.")
                 return
 
-            # Archive logs
-            for log in logs_to_archive:
-                archive_collection.insert_one(log)
-                logs_collection.delete_one({'_id': log['_id']})
-
-            self.stdout.write(self.style.SUCCESS(f"Successfully archived {logs_count} logs."))
-            logger.info(f"Archived {logs_count} logs older than {cutoff_date}.")
+            invalidate_all()  # Cached list results may include the archived logs
+            mark_archived(cutoff_date, self._location(options))
+            self.stdout.write(self.style.SUCCESS(f"Successfully archived {archived} logs."))
+            logger.info(f"Archived {archived} logs older than {cutoff_date}.")
 
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"Error during archival: {str(e)}"))
             logger.error(f"Error during log archival: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def _location(self, options):
+        """Where this run put the logs, as recorded on their integrity batches."""
+        if options['drop']:
+            return 'dropped'
+        if options['format'] == 'parquet':
+            return f"parquet:{options['output_dir']}"
+        return 'logs_archive_*' if get_partitioning() else 'logs_archive'
+
+    def _archive_partitions(self, cutoff_date, batch_size, options):
+        """
+        Retire whole partitions older than the cutoff with a single rename (or
+        drop), and fall back to batches for the partition straddling it.
+        MongoDB cannot rename time-series collections, so with LOG_TIMESERIES
+        whole partitions are copied out in batches too, then dropped.
+        """
+        archived = 0
+        for name in list_partitions(end=cutoff_date):
+            partition = get_mongo_collection(name)
+            archive_name = name.replace('audit_logs_', 'logs_archive_', 1)
+            archive_names = partition.database.list_collection_names()
+            if options['format'] == 'parquet' and not options['drop']:
+                archived += self._archive_to_parquet(partition, {'timestamp': {'$lt': cutoff_date}}, batch_size, options)
+                if partition_bounds(name)[1] <= cutoff_date:
+                    partition.drop()
+                continue
+            whole = partition_bounds(name)[1] <= cutoff_date
+            if whole and archive_name not in archive_names and (options['drop'] or not timeseries_options()):
+                count = partition.estimated_document_count()
+                if options['drop']:
+                    partition.drop()
+                else:
+                    partition.rename(archive_name)
+                archived += count
+                continue
+            archived += self._archive_collection(
+                partition,
+                get_mongo_collection(archive_name),
+                {'timestamp': {'$lt': cutoff_date}},
+                batch_size,
+                options,
+            )
+            if whole and timeseries_options():
+                partition.drop()
+        return archived
+
+    def _archive_collection(self, logs_collection, archive_collection, query, batch_size, options):
+        """
+        Move the logs matching `query` in bounded batches. Each batch is
+        upserted into the archive before it is deleted, so a crash at any
+        point leaves at worst a copy in both collections, which the next run
+        reconciles.
+        """
+        if options['format'] == 'parquet' and not options['drop']:
+            return self._archive_to_parquet(logs_collection, query, batch_size, options)
+
+        archived = 0
+        projection = {'_id': 1} if options['use_merge'] or options['drop'] else None
+        while True:
+            batch = list(
+                logs_collection.find(query, projection)
+                .sort([('timestamp', 1), ('_id', 1)])
+                .limit(batch_size)
+            )
+            if not batch:
+                break
+            ids = [log['_id'] for log in batch]
+
+            if not options['drop']:
+                if options['use_merge']:
+                    logs_collection.aggregate([
+                        {'$match': {'_id': {'$in': ids}}},
+                        {'$merge': {'into': archive_collection.name, 'on': '_id', 'whenMatched': 'replace', 'whenNotMatched': 'insert'}},
+                    ])
+                else:
+                    archive_collection.bulk_write(
+                        [ReplaceOne({'_id': log['_id']}, log, upsert=True) for log in batch],
+                        ordered=False,
+                    )
+            archived += logs_collection.delete_many({'_id': {'$in': ids}}).deleted_count
+        return archived
+
+    def _archive_to_parquet(self, logs_collection, query, batch_size, options):
+        """
+        Stream the logs matching `query` into month-partitioned Parquet files,
+        one row group at a time. Logs are only deleted once the file holding
+        them has been closed and moved into place, so at most rows-per-file
+        ids are held in memory and a crash never loses data.
+        """
+        archived = 0
+        part = 0
+        while True:
+            part += 1
+            sink = ParquetArchiveSink(options['output_dir'], part=part)
+            ids = []
+            position = None
+            while len(ids) < options['rows_per_file']:
+                batch_query = query
+                if position is not None:
+                    timestamp, log_id = position
+                    batch_query = {'$and': [query, {'$or': [
+                        {'timestamp': {'$gt': timestamp}},
+                        {'timestamp': timestamp, '_id': {'$gt': log_id}},
+                    ]}]}
+                batch = list(
+                    logs_collection.find(batch_query)
+                    .sort([('timestamp', 1), ('_id', 1)])
+                    .limit(min(batch_size, options['rows_per_file'] - len(ids)))
+                )
+                if not batch:
+                    break
+                sink.write(batch)
+                ids.extend(log['_id'] for log in batch)
+                position = (batch[-1]['timestamp'], batch[-1]['_id'])
+            if not ids:
+                break
+
+            for path in sink.close():
+                self.stdout.write(f"Wrote {path}")
+            for start in range(0, len(ids), batch_size):
+                archived += logs_collection.delete_many({'_id': {'$in': ids[start:start + batch_size]}}).deleted_count
+        return archived
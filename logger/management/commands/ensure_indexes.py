@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import PyMongoError
+from logger.mongo import ensure_log_indexes
+from logger.merkle import ensure_batch_indexes
+from logger.rollups import ensure_rollup_indexes
+from logger.export_jobs import ensure_export_job_indexes
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Creates the MongoDB collections and indexes the service needs; run once per deployment'
+
+    def handle(self, *args, **options):
+        try:
+            collections = ensure_log_indexes()
+            ensure_batch_indexes()
+            ensure_rollup_indexes()
+            ensure_export_job_indexes()
+        except PyMongoError as e:
+            logger.error(f"Index creation failed: {e}")
+            raise CommandError(f"Index creation failed: {e}")
+
+        summary = f"Indexes ready on {', '.join(collections)}, audit_batches, audit_rollups and export_jobs."
+        self.stdout.write(self.style.SUCCESS(summary))
+        logger.info(summary)
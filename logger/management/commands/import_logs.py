@@ -0,0 +1,146 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from logger.utils import build_log_entry, insert_logs_bulk
+from datetime import timezone
+from itertools import islice
+import logging
+import json
+import time
+import uuid
+import sys
+import os
+
+logger = logging.getLogger(__name__)
+
+# Namespace for deterministic _ids, so re-importing a line is a no-op
+IMPORT_NAMESPACE = uuid.UUID("5b0f6c1e-8a43-4f0e-9d1b-2f3c4a5e6d70")
+
+
+class Command(BaseCommand):
+    help = 'Imports signed logs from a JSONL/NDJSON file (or stdin) with bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='JSONL file to import, or "-" to read from stdin',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of logs per unordered bulk insert (default: 5000)',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording how many lines were imported; an existing checkpoint resumes the import',
+        )
+        parser.add_argument(
+            '--progress-interval',
+            type=float,
+            default=5.0,
+            help='Seconds between progress reports (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        batch_size = options['batch_size']
+        checkpoint = options['checkpoint']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+
+        skip = self._read_checkpoint(checkpoint)
+        if skip:
+            self.stdout.write(f"Resuming after line {skip}")
+
+        stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        started = last_report = time.monotonic()
+        line_number = skip
+        imported = 0
+        invalid = 0
+        failed = 0
+        try:
+            entries = self._parse(islice(stream, skip, None), skip)
+            while True:
+                batch = list(islice(entries, batch_size))
+                if not batch:
+                    break
+                line_number = batch[-1][0]
+                documents = []
+                for number, entry in batch:
+                    if isinstance(entry, str):
+                        invalid += 1
+                        self.stderr.write(f"Line {number}: {entry}")
+                    else:
+                        documents.append(entry)
+
+                inserted, errors = insert_logs_bulk(documents)
+                imported += inserted
+                failed += len(errors)
+                for error in errors:
+                    self.stderr.write(f"Log {error['_id']}: [{error['code']}] {error['errmsg']}")
+                self._write_checkpoint(checkpoint, line_number)
+
+                now = time.monotonic()
+                if now - last_report >= options['progress_interval']:
+                    self.stdout.write(f"Imported {imported} logs ({imported / (now - started):.0f} rows/sec)")
+                    last_report = now
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        summary = f"Imported {imported} logs in {elapsed:.1f}s ({imported / elapsed:.0f} rows/sec); {invalid} invalid lines, {failed} failed inserts."
+        self.stdout.write(self.style.SUCCESS(summary))
+        logger.info(summary)
+
+    def _parse(self, lines, offset):
+        """
+        Yield (line_number, signed_log) pairs, or (line_number, error) for lines
+        that cannot be imported. Blank lines are skipped.
+        """
+        for number, raw in enumerate(lines, start=offset + 1):
+            raw = raw.strip()
+            if not raw:
+                continue
+            try:
+                yield number, self._build(raw, number)
+            except (ValueError, TypeError, KeyError) as e:
+                yield number, f"{type(e).__name__}: {e}"
+
+    def _build(self, raw, number):
+        record = json.loads(raw)
+        if not isinstance(record, dict) or not record.get("action"):
+            raise ValueError("Entry must be an object with an action")
+
+        timestamp = record.get("timestamp")
+        if timestamp is not None:
+            parsed = parse_datetime(timestamp)
+            if parsed is None:
+                raise ValueError(f"Invalid timestamp {timestamp!r}")
+            # Signatures are computed over the UTC wall-clock time MongoDB returns
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            timestamp = parsed.astimezone(timezone.utc).replace(microsecond=0)
+
+        log_id = record.get("_id") or str(uuid.uuid5(IMPORT_NAMESPACE, f"{number}:{raw.decode()}"))
+        return build_log_entry(
+            record["action"],
+            user_id=record.get("user_id"),
+            details=record.get("details"),
+            timestamp=timestamp,
+            log_id=str(log_id),
+        )
+
+    def _read_checkpoint(self, checkpoint):
+        if not checkpoint or not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint) as f:
+            return int(f.read().strip() or 0)
+
+    def _write_checkpoint(self, checkpoint, line_number):
+        if not checkpoint:
+            return
+        tmp_path = f"{checkpoint}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(line_number))
+        os.replace(tmp_path, checkpoint)
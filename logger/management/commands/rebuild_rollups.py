@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from logger.mongo import find_logs, get_mongo_collection
+from logger.rollups import REBUILD_CHECK_SECONDS, REBUILD_COLLECTION, ensure_rollup_indexes, get_rollups_collection, record_rollups
+from datetime import datetime, timedelta
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the activity rollups from the stored logs (e.g. for logs written before rollups existed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Number of logs counted per bulk write (default: 10000)',
+        )
+
+    def handle(self, *args, **options):
+        # The logs are counted into a staging collection that is then swapped
+        # in, so the rollups stay readable throughout. Logs from `since` on are
+        # counted into it by the live writers (record_rollups) and older ones by
+        # the rescan, so none is counted twice or missed.
+        batch_size = options['batch_size']
+        staging = get_mongo_collection(REBUILD_COLLECTION)
+        staging.drop()
+        ensure_rollup_indexes(staging)
+        # Every writer sees the marker within REBUILD_CHECK_SECONDS, before `since`
+        since = datetime.utcnow().replace(microsecond=0) + timedelta(seconds=REBUILD_CHECK_SECONDS + 1)
+        staging.insert_one({"_id": "rebuild", "since": since})
+        try:
+            # Logs from before `since` may still sit in the ingest buffer
+            buffer_age = getattr(settings, "LOG_BUFFER_MAX_AGE_SECONDS", 5)
+            time.sleep(max(0, (since - datetime.utcnow()).total_seconds()) + buffer_age)
+
+            counted = 0
+            batch = []
+            projection = {"timestamp": 1, "action": 1, "user_id": 1}
+            for log in find_logs({"timestamp": {"$lt": since}}, projection=projection):
+                batch.append(log)
+                if len(batch) >= batch_size:
+                    record_rollups(batch, staging)
+                    counted += len(batch)
+                    batch = []
+            record_rollups(batch, staging)
+            counted += len(batch)
+
+            staging.delete_one({"_id": "rebuild"})
+            staging.rename(get_rollups_collection().name, dropTarget=True)
+        except BaseException:
+            staging.drop()
+            raise
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rollups from {counted} logs."))
+        logger.info(f"Rebuilt rollups from {counted} logs.")
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from logger.merkle import verify_range
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Verifies the hash chain of Merkle batch roots (and optionally every log) for a time range'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            help='Start of the range to verify (ISO format); defaults to the beginning of the trail',
+        )
+        parser.add_argument(
+            '--end',
+            help='End of the range to verify (ISO format); defaults to now',
+        )
+        parser.add_argument(
+            '--deep',
+            action='store_true',
+            help='Also check that every recorded log exists and re-hash it, to detect deleted or modified logs',
+        )
+
+    def handle(self, *args, **options):
+        bounds = []
+        for name in ('start', 'end'):
+            value = options[name]
+            parsed = parse_datetime(value) if value else None
+            if value and parsed is None:
+                raise CommandError(f"Invalid --{name} timestamp {value!r}. Use ISO format.")
+            bounds.append(parsed)
+
+        report = verify_range(*bounds, deep=options['deep'])
+        for problem in report['problems']:
+            ids = problem.get('log_ids')
+            suffix = f": {', '.join(ids)}" if ids else ""
+            self.stderr.write(f"Batch {problem['batch']}: {problem['problem']}{suffix}")
+
+        summary = f"Checked {report['batches']} batches covering {report['logs']} logs; head {report['head']}"
+        if not report['valid']:
+            logger.error(f"Integrity check failed: {len(report['problems'])} problems. {summary}")
+            raise CommandError(f"Integrity check failed with {len(report['problems'])} problems. {summary}")
+        self.stdout.write(self.style.SUCCESS(summary))
+        logger.info(summary)
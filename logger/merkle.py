@@ -0,0 +1,292 @@
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+from django.conf import settings
+from datetime import datetime, timedelta, timezone
+from .canonical import signing_message
+from .mongo import get_mongo_collection, find_logs
+import hashlib
+import re
+
+# Chain value preceding the first batch
+GENESIS = "0" * 64
+
+# Domain separation between leaves and inner nodes (RFC 6962 style), so a
+# pair of child hashes can never be passed off as a log entry.
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+RECORD_ATTEMPTS = 50
+
+# Collections archive_logs moves logs into
+ARCHIVE_PATTERN = re.compile(r"^logs_archive(?:_\d{4}_\d{2}(?:_\d{2})?)?$")
+
+
+class BatchContentionError(RuntimeError):
+    """A batch could not claim the head of the chain in RECORD_ATTEMPTS tries."""
+
+
+def get_batches_collection():
+    """
+    Collection of Merkle batch records, one per ingested batch of logs.
+    `_id` is the batch sequence number, so the chain cannot fork.
+    """
+    return get_mongo_collection("audit_batches")
+
+
+def ensure_batch_indexes():
+    """Indexes for proof lookups and range verification (ensure_indexes command)."""
+    collection = get_batches_collection()
+    collection.create_index("log_ids")
+    collection.create_index([("end", ASCENDING), ("start", ASCENDING)])
+
+
+def leaf_hash(log_entry):
+    """Hex leaf hash of a log entry over the same bytes its HMAC signs."""
+    return hashlib.sha256(LEAF_PREFIX + signing_message(log_entry)).hexdigest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def chain_hash(previous, root):
+    return hashlib.sha256(bytes.fromhex(previous) + bytes.fromhex(root)).hexdigest()
+
+
+def _levels(leaves):
+    # An odd node at the end of a level is promoted unchanged rather than
+    # paired with itself, which would let two different batches share a root.
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def merkle_root(leaves):
+    """Root hash over leaf hashes, in order."""
+    if not leaves:
+        raise ValueError("A Merkle batch needs at least one leaf")
+    return _levels(leaves)[-1][0]
+
+
+def inclusion_proof(leaves, index):
+    """
+    Sibling hashes from leaf `index` up to the root, as
+    [{"side": "left"|"right", "hash": ...}] entries.
+    """
+    proof = []
+    for level in _levels(leaves)[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append({"side": "left" if sibling < index else "right", "hash": level[sibling]})
+        index //= 2
+    return proof
+
+
+def verify_proof(leaf, proof, root):
+    """Check an inclusion proof from inclusion_proof against a batch root."""
+    node = leaf
+    for step in proof:
+        if step["side"] == "left":
+            node = node_hash(step["hash"], node)
+        else:
+            node = node_hash(node, step["hash"])
+    return node == root
+
+
+def record_batch(log_entries):
+    """
+    Append Merkle batches over `log_entries` to the chain of batch roots,
+    one per LOG_MERKLE_BATCH_MAX entries so that no batch record nears
+    MongoDB's 16MB document limit, whatever the ingest batch size.
+    Returns the stored batches, none when disabled or empty.
+    """
+    if not log_entries or not getattr(settings, "LOG_INTEGRITY_BATCHES", True):
+        return []
+    size = max(1, getattr(settings, "LOG_MERKLE_BATCH_MAX", 10000))
+    return [_append_batch(log_entries[i:i + size]) for i in range(0, len(log_entries), size)]
+
+
+def _append_batch(log_entries):
+    """
+    Append one batch record. Sequence numbers are claimed optimistically: concurrent writers race on
+    the unique `_id` and the loser re-reads the head and tries again.
+    """
+    leaves = [leaf_hash(entry) for entry in log_entries]
+    root = merkle_root(leaves)
+    # Whole seconds: signatures ignore sub-second precision and MongoDB
+    # truncates it to milliseconds anyway
+    timestamps = [entry["timestamp"].replace(microsecond=0) for entry in log_entries]
+    batches = get_batches_collection()
+    for _ in range(RECORD_ATTEMPTS):
+        head = batches.find_one({}, {"chain": 1}, sort=[("_id", DESCENDING)])
+        sequence, previous = (head["_id"] + 1, head["chain"]) if head else (1, GENESIS)
+        batch = {
+            "_id": sequence,
+            "root": root,
+            "chain": chain_hash(previous, root),
+            "count": len(leaves),
+            "log_ids": [str(entry["_id"]) for entry in log_entries],
+            "leaves": leaves,
+            "start": min(timestamps),
+            "end": max(timestamps),
+            "created_at": datetime.now(timezone.utc),
+        }
+        try:
+            batches.insert_one(batch)
+            return batch
+        except DuplicateKeyError:
+            continue
+    raise BatchContentionError("Could not append an integrity batch: too much contention")
+
+
+def recorded_log_ids(log_ids):
+    """The ids among `log_ids` that are already recorded in a batch."""
+    wanted = {str(log_id) for log_id in log_ids}
+    recorded = set()
+    for batch in get_batches_collection().find({"log_ids": {"$in": list(wanted)}}, {"log_ids": 1}):
+        recorded.update(wanted.intersection(batch["log_ids"]))
+    return recorded
+
+
+def get_inclusion_proof(log_id):
+    """
+    Inclusion proof for one log: the batch it was ingested in, its leaf and
+    the sibling path to that batch's root. Returns None for unknown logs.
+    """
+    batch = get_batches_collection().find_one({"log_ids": str(log_id)})
+    if batch is None:
+        return None
+    index = batch["log_ids"].index(str(log_id))
+    return {
+        "log_id": str(log_id),
+        "batch": batch["_id"],
+        "leaf": batch["leaves"][index],
+        "proof": inclusion_proof(batch["leaves"], index),
+        "root": batch["root"],
+        "chain": batch["chain"],
+    }
+
+
+def mark_archived(before, location):
+    """
+    Record that archive_logs moved the logs older than `before` to
+    `location` (archive collections, a Parquet directory or "dropped").
+    verify_range still checks the chain of these batches but no longer
+    requires their archived logs to exist. Of a batch straddling `before`,
+    only the logs that left the log collections are listed (`archived_ids`);
+    its other logs keep being checked.
+    Returns the number of batches marked.
+    """
+    batches = get_batches_collection()
+    # Not marked yet, or only partly archived by an earlier run
+    pending = {"start": {"$lt": before}, "$or": [{"archived": {"$exists": False}}, {"archived_ids": {"$exists": True}}]}
+    # Batch times are truncated to whole seconds
+    whole = before - timedelta(seconds=1)
+    marked = batches.update_many(
+        {**pending, "end": {"$lte": whole}},
+        {"$set": {"archived": location}, "$unset": {"archived_ids": ""}},
+    ).modified_count
+    for batch in batches.find({**pending, "end": {"$gt": whole}}, {"log_ids": 1, "start": 1, "end": 1}):
+        live = _live_logs(batch, {"_id": 1})
+        archived_ids = [log_id for log_id in batch["log_ids"] if log_id not in live]
+        if archived_ids:
+            batches.update_one({"_id": batch["_id"]}, {"$set": {"archived": location, "archived_ids": archived_ids}})
+            marked += 1
+    return marked
+
+
+def _archive_names():
+    """Collections archive_logs moved logs into (logs_archive, or retired partitions)."""
+    return [name for name in get_batches_collection().database.list_collection_names() if ARCHIVE_PATTERN.match(name)]
+
+
+def _live_logs(batch, projection=None):
+    """The batch's logs still in the log collections, by id."""
+    query = {"_id": {"$in": batch["log_ids"]}, "timestamp": {"$gte": batch["start"], "$lt": batch["end"] + timedelta(seconds=1)}}
+    return {str(log["_id"]): log for log in find_logs(query, projection=projection)}
+
+
+def _stored_logs(batch, archives):
+    ids = batch["log_ids"]
+    logs = _live_logs(batch)
+    # Logs archived to MongoDB still belong to the trail
+    database = get_batches_collection().database
+    for name in archives:
+        missing = [log_id for log_id in ids if log_id not in logs]
+        if not missing:
+            break
+        for log in database[name].find({"_id": {"$in": missing}}):
+            logs[str(log["_id"])] = log
+    return logs
+
+
+def verify_range(start=None, end=None, deep=False):
+    """
+    Verify the batches overlapping [start, end].
+
+    Checks that every batch root matches its leaves and is chained to its
+    predecessor, which reads no logs: a rewritten or removed batch breaks
+    the chain. With `deep`, every recorded log must also still exist, in
+    the log collections or an archive collection, and is re-hashed against
+    its leaf, which detects deleted and modified rows at the cost of
+    reading them. Logs marked by archive_logs are exempt from the existence
+    check, as they may have left MongoDB.
+    Returns {"valid", "batches", "logs", "head", "problems"}; `head` is the
+    chain value of the newest batch checked, suitable for anchoring elsewhere.
+    """
+    time_filter = {}
+    if start is not None:
+        time_filter["end"] = {"$gte": start}
+    if end is not None:
+        time_filter["start"] = {"$lte": end}
+
+    batches = get_batches_collection()
+    archives = _archive_names() if deep else []
+    problems = []
+    checked = logs_checked = 0
+    previous = None
+    for batch in batches.find(time_filter).sort("_id", ASCENDING):
+        sequence = batch["_id"]
+        if sequence == 1:
+            previous_chain = GENESIS
+        elif previous is not None and previous["_id"] == sequence - 1:
+            previous_chain = previous["chain"]
+        else:
+            predecessor = batches.find_one({"_id": sequence - 1}, {"chain": 1})
+            previous_chain = predecessor["chain"] if predecessor else None
+        if previous_chain is None:
+            problems.append({"batch": sequence, "problem": f"batch {sequence - 1} missing"})
+        elif batch["chain"] != chain_hash(previous_chain, batch["root"]):
+            problems.append({"batch": sequence, "problem": "chain hash mismatch"})
+        if merkle_root(batch["leaves"]) != batch["root"]:
+            problems.append({"batch": sequence, "problem": "root does not match leaves"})
+
+        if deep:
+            stored = _stored_logs(batch, archives)
+            archived = set(batch.get("archived_ids", batch["log_ids"])) if batch.get("archived") else set()
+            missing = [log_id for log_id in batch["log_ids"] if log_id not in stored and log_id not in archived]
+            if missing:
+                problems.append({"batch": sequence, "problem": "logs deleted", "log_ids": missing})
+            modified = [
+                log_id for log_id, leaf in zip(batch["log_ids"], batch["leaves"])
+                if log_id in stored and leaf_hash(stored[log_id]) != leaf
+            ]
+            if modified:
+                problems.append({"batch": sequence, "problem": "logs modified", "log_ids": modified})
+
+        checked += 1
+        logs_checked += batch["count"]
+        previous = batch
+
+    return {
+        "valid": not problems,
+        "batches": checked,
+        "logs": logs_checked,
+        "head": previous["chain"] if previous else None,
+        "problems": problems,
+    }
@@ -10,4 +10,23 @@ log_created_counter = Counter(
 log_listed_counter = Counter(
     'audittrail_logs_listed_total',
     'Total number of times logs have been listed'
-)
\ No newline at end of file
+)
+
+# Count how many logs failed signature verification when read back
+log_tampered_counter = Counter(
+    'audittrail_logs_tampered_total',
+    'Total number of logs that failed signature verification on read'
+)
+
+# Query result cache lookups for the list endpoint, by kind ("list" or "count")
+query_cache_hits_counter = Counter(
+    'audittrail_query_cache_hits_total',
+    'Total number of log query cache hits',
+    ['kind']
+)
+
+query_cache_misses_counter = Counter(
+    'audittrail_query_cache_misses_total',
+    'Total number of log query cache misses',
+    ['kind']
+)
@@ -1,42 +1,643 @@
 from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo.errors import CollectionInvalid, OperationFailure
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from datetime import datetime, timedelta, timezone
+from weakref import WeakKeyDictionary
+from itertools import islice
+import asyncio
+import heapq
 import logging
-import sys
+import os
+import re
+import threading
+import time
 
-# Lazy initialization variables
+logger = logging.getLogger(__name__)
+
+# Database holding every collection of the service
+DATABASE_NAME = "audittrail_db"
+
+# This process's client, created on first use (see get_mongo_client)
 _client = None
-_db = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+# Sort order shared by every paginated read; `_id` breaks timestamp ties
+LOG_ORDERING = (("timestamp", DESCENDING), ("_id", DESCENDING))
+
+# Compound indexes for common query patterns on audit_logs (and each partition).
+# The trailing _id matches the (timestamp, _id) keyset ordering.
+LOG_INDEXES = [
+    [("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+    [("action", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+    [("timestamp", DESCENDING), ("_id", DESCENDING)],
+]
+
+# Collection name suffixes for time-partitioned storage
+PARTITION_FORMATS = {"day": "%Y_%m_%d", "month": "%Y_%m"}
+PARTITION_PATTERN = re.compile(r"^audit_logs_(\d{4})_(\d{2})(?:_(\d{2}))?$")
+
+# Log collections this process has already created/indexed
+_prepared_collections = set()
+
+# Whether audit_logs still holds logs from before partitioning was enabled:
+# {"present": bool, "checked": monotonic time}, rechecked after LEGACY_CHECK_SECONDS
+_legacy_logs = {}
+LEGACY_CHECK_SECONDS = 60
+
+# Names of the existing partitions: {"names": list, "checked": monotonic time},
+# reread after PARTITION_CHECK_SECONDS and whenever this process prepares or
+# archives a partition
+_partitions = {}
+PARTITION_CHECK_SECONDS = 5
+
+# Log collections read without index hints after MongoDB rejected one for a
+# missing index (ensure_indexes not run yet), by time of the rejection
+_unhinted = {}
+HINT_RETRY_SECONDS = 60
+
+# Async clients, one per event loop: an AsyncMongoClient is bound to the
+# loop it first ran on
+_async_dbs = WeakKeyDictionary()
+
+def client_options():
+    """
+    Keyword arguments for MongoClient/AsyncMongoClient from the MONGO_*
+    pool and timeout settings; unset ones keep the driver defaults.
+    """
+    options = {
+        "maxPoolSize": getattr(settings, "MONGO_MAX_POOL_SIZE", 100),
+        "minPoolSize": getattr(settings, "MONGO_MIN_POOL_SIZE", 0),
+        "maxIdleTimeMS": getattr(settings, "MONGO_MAX_IDLE_TIME_MS", None),
+        "waitQueueTimeoutMS": getattr(settings, "MONGO_WAIT_QUEUE_TIMEOUT_MS", None),
+        "serverSelectionTimeoutMS": getattr(settings, "MONGO_SERVER_SELECTION_TIMEOUT_MS", 2000),
+        "connectTimeoutMS": getattr(settings, "MONGO_CONNECT_TIMEOUT_MS", None),
+        "socketTimeoutMS": getattr(settings, "MONGO_SOCKET_TIMEOUT_MS", None),
+    }
+    return {name: value for name, value in options.items() if value is not None}
+
+def get_mongo_client():
+    """
+    Get this process's MongoClient, creating it on first use.
+    A MongoClient is not fork-safe, so a process forked after the client
+    was created (Celery prefork children, preloaded web workers) opens its
+    own instead of using its parent's. Nothing connects at import time, and
+    connection errors surface on the first operation as pymongo errors.
+    """
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                MONGO_URI = getattr(settings, "MONGO_URI", "mongodb://localhost:27017")
+                _client = MongoClient(MONGO_URI, **client_options())
+                _client_pid = os.getpid()
+    return _client
 
 def get_mongo_collection(collection_name):
+    """Get a MongoDB collection by name from the audittrail_db database."""
+    return get_mongo_client()[DATABASE_NAME][collection_name]
+
+def ping():
+    """Round-trip to MongoDB; raises a pymongo error when it is unreachable."""
+    get_mongo_client().admin.command("ping")
+
+def timeseries_options():
     """
-    Get a MongoDB collection by name from the audittrail_db database.
-    Lazily initializes the connection if not already established.
+    Options for creating log collections as MongoDB time-series collections,
+    or None when LOG_TIMESERIES is off.
     """
-    global _client, _db
-    if _client is None or _db is None:
+    if not getattr(settings, "LOG_TIMESERIES", False):
+        return None
+    options = {
+        "timeseries": {
+            "timeField": "timestamp",
+            "metaField": getattr(settings, "LOG_TIMESERIES_META_FIELD", "user_id"),
+            "granularity": getattr(settings, "LOG_TIMESERIES_GRANULARITY", "seconds"),
+        }
+    }
+    expire_after = getattr(settings, "LOG_TIMESERIES_EXPIRE_AFTER_SECONDS", None)
+    if expire_after:
+        options["expireAfterSeconds"] = int(expire_after)
+    return options
+
+def _prepare_log_collection(database, name):
+    """
+    Create a log collection (as time-series if configured) and its indexes.
+    Runs once per collection per process: for audit_logs from the
+    ensure_indexes command, for partitions on their first write.
+    """
+    if name in _prepared_collections:
+        return
+    options = timeseries_options()
+    if options and name not in database.list_collection_names():
         try:
-            MONGO_URI = getattr(settings, "MONGO_URI", "mongodb://localhost:27017")
-            _client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)
-            _client.server_info()  # Test connection
-            _db = _client.audittrail_db
-
-            # Create compound indexes for common query patterns on audit_logs
-            audit_logs = _db.audit_logs
-            audit_logs.create_index([("user_id", ASCENDING), ("timestamp", DESCENDING)])
-            audit_logs.create_index([("action", ASCENDING), ("timestamp", DESCENDING)])
-            audit_logs.create_index([("timestamp", DESCENDING)])
-        except Exception as e:
-            logging.error(f"[MongoDB] Connection failed: {e}")
-            sys.exit(1)
-
-    collection = _db[collection_name]
-    if collection is None:
-        raise Exception(f"Collection {collection_name} is None after DB connection.")
-    return collection
+            database.create_collection(name, **options)
+        except CollectionInvalid:
+            pass  # Created concurrently by another process
+    for keys in LOG_INDEXES:
+        database[name].create_index(keys)
+    _prepared_collections.add(name)
+    invalidate_partitions()  # create_index creates the collection if needed
 
 # Backward compatibility for existing code
 def get_logs_collection():
     """Get the audit_logs collection (legacy function)."""
     return get_mongo_collection('audit_logs')
 
-logs_collection = get_logs_collection()
\ No newline at end of file
+def ensure_log_indexes():
+    """
+    Create audit_logs (as time-series if configured) and the indexes of it
+    and of every existing partition. Run once per deployment by the
+    ensure_indexes command rather than by every process at startup.
+    Returns the names of the prepared collections.
+    """
+    database = get_mongo_client()[DATABASE_NAME]
+    names = ["audit_logs", *list_partitions()]
+    for name in names:
+        _prepare_log_collection(database, name)
+    return names
+
+def get_partitioning():
+    """Return "day" or "month" when time-partitioned storage is enabled, else None."""
+    partitioning = getattr(settings, "LOG_PARTITIONING", None) or None
+    if partitioning and partitioning not in PARTITION_FORMATS:
+        raise ValueError(f"LOG_PARTITIONING must be one of {sorted(PARTITION_FORMATS)}, got {partitioning!r}")
+    return partitioning
+
+def partition_name(timestamp):
+    """Name of the partition holding logs written at `timestamp`."""
+    return f"audit_logs_{_naive_utc(timestamp).strftime(PARTITION_FORMATS[get_partitioning()])}"
+
+def partition_bounds(name):
+    """Return the [start, end) UTC range covered by a partition name."""
+    year, month, day = PARTITION_PATTERN.match(name).groups()
+    if day:
+        start = datetime(int(year), int(month), int(day))
+        return start, start + timedelta(days=1)
+    start = datetime(int(year), int(month), 1)
+    end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start, end
+
+def get_log_collection_for(timestamp):
+    """
+    Collection a log written at `timestamp` belongs in: its partition when
+    partitioning is enabled, audit_logs otherwise.
+    """
+    if not get_partitioning():
+        return get_logs_collection()
+    name = partition_name(timestamp)
+    collection = get_mongo_collection(name)
+    _prepare_log_collection(collection.database, name)
+    return collection
+
+def _naive_utc(timestamp):
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def _partition_names():
+    checked = _partitions.get("checked")
+    if checked is None or time.monotonic() - checked >= PARTITION_CHECK_SECONDS:
+        database = get_mongo_collection("audit_logs").database
+        _partitions["names"] = [name for name in database.list_collection_names() if PARTITION_PATTERN.match(name)]
+        _partitions["checked"] = time.monotonic()
+    return _partitions["names"]
+
+def invalidate_partitions():
+    """Forget the cached partition names, after creating or removing a partition."""
+    _partitions.clear()
+
+def list_partitions(start=None, end=None):
+    """
+    Names of existing partitions overlapping [start, end], newest first.
+    The names are cached for PARTITION_CHECK_SECONDS, so partitions created
+    by other processes may take that long to be read from.
+    """
+    selected = []
+    for name in _partition_names():
+        lower, upper = partition_bounds(name)
+        if start is not None and upper <= _naive_utc(start):
+            continue
+        if end is not None and lower > _naive_utc(end):
+            continue
+        selected.append(name)
+    return sorted(selected, key=partition_bounds, reverse=True)
+
+def _time_bounds(query):
+    """
+    Extract the tightest (start, end) timestamp bounds a query imposes,
+    looking at top-level conditions and $and clauses.
+    """
+    start = end = None
+    clauses = [query]
+    while clauses:
+        clause = clauses.pop()
+        condition = clause.get("timestamp")
+        if isinstance(condition, dict):
+            for op in ("$gte", "$gt"):
+                if op in condition and (start is None or _naive_utc(condition[op]) > start):
+                    start = _naive_utc(condition[op])
+            for op in ("$lte", "$lt"):
+                if op in condition and (end is None or _naive_utc(condition[op]) < end):
+                    end = _naive_utc(condition[op])
+        elif isinstance(condition, datetime):
+            start = end = _naive_utc(condition)
+        clauses.extend(clause.get("$and", []))
+    return start, end
+
+def has_legacy_logs():
+    """
+    Whether audit_logs still holds logs written before partitioning was
+    enabled. Partitioned reads keep including them, and archive_logs retires
+    them, so turning LOG_PARTITIONING on hides nothing. The answer is cached
+    for LEGACY_CHECK_SECONDS; nothing new is written there while partitioned.
+    """
+    checked = _legacy_logs.get("checked")
+    if checked is None or time.monotonic() - checked >= LEGACY_CHECK_SECONDS:
+        _legacy_logs["present"] = get_logs_collection().estimated_document_count() > 0
+        _legacy_logs["checked"] = time.monotonic()
+    return _legacy_logs["present"]
+
+def _log_collections(query):
+    """
+    Collections a query has to read: newest partition first, then audit_logs
+    when it still holds logs from before partitioning was enabled.
+    """
+    if not get_partitioning():
+        return [get_logs_collection()]
+    collections = [get_mongo_collection(name) for name in list_partitions(*_time_bounds(query))]
+    if has_legacy_logs():
+        collections.append(get_logs_collection())
+    return collections
+
+def _merge_order(sort, projection):
+    """
+    Sort key and direction for merging sorted reads in Python, and the
+    projection extended with the sort fields the key needs.
+    """
+    if len({direction for _, direction in sort}) > 1:
+        raise ValueError("Merged reads must sort every field in the same direction")
+    fields = [field for field, _ in sort]
+    if projection and all(projection.values()):
+        projection = {**projection, **{field: 1 for field in fields}}
+    return (lambda log: tuple(log[field] for field in fields)), sort[0][1] == DESCENDING, projection
+
+def _conditions(query):
+    """Field conditions of a query, from the top level and $and clauses."""
+    conditions = {}
+    clauses = [query]
+    while clauses:
+        clause = clauses.pop()
+        for field, condition in clause.items():
+            if field == "$and":
+                clauses.extend(condition)
+            elif not field.startswith("$"):
+                conditions.setdefault(field, condition)
+    return conditions
+
+def _uses_index_bounds(condition):
+    # Equality, $in and ranges narrow an index scan; a regex or negation does not
+    return not isinstance(condition, dict) or not ({"$regex", "$nin", "$ne", "$not"} & condition.keys())
+
+def index_hint(query):
+    """
+    The LOG_INDEXES entry to read `query` with, or None to leave the choice
+    to MongoDB (lookups by _id, or LOG_QUERY_HINTS off). An exact user_id
+    is the most selective filter, then an indexable action condition;
+    anything else walks the timestamp index in LOG_ORDERING, which stops as
+    soon as a page is filled.
+    """
+    if not getattr(settings, "LOG_QUERY_HINTS", True):
+        return None
+    conditions = _conditions(query)
+    if "_id" in conditions:
+        return None
+    if "user_id" in conditions and _uses_index_bounds(conditions["user_id"]):
+        return LOG_INDEXES[0]
+    if "action" in conditions and _uses_index_bounds(conditions["action"]):
+        return LOG_INDEXES[1]
+    return LOG_INDEXES[2]
+
+def explain_summary(collection_name, query, hint=None, sort=None, limit=0):
+    """
+    Summarize explain() of a find on a log collection: the winning plan's
+    stages and indexes, and the keys and documents it examined.
+    """
+    command = {"find": collection_name, "filter": query}
+    if sort:
+        command["sort"] = dict(sort)
+    if hint:
+        command["hint"] = dict(hint)
+    if limit:
+        command["limit"] = limit
+    try:
+        explain = get_mongo_collection(collection_name).database.command("explain", command, verbosity="executionStats")
+    except Exception as e:
+        return {"error": str(e)}
+
+    plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+    plan = plan.get("queryPlan", plan)  # Nested one level deeper by the slot-based engine
+    stages, indexes = [], []
+    while plan:
+        stages.append(plan.get("stage"))
+        if plan.get("indexName"):
+            indexes.append(plan["indexName"])
+        plan = plan.get("inputStage") or next(iter(plan.get("inputStages", [])), None)
+    stats = explain.get("executionStats", {})
+    return {
+        "stages": " <- ".join(stages),
+        "indexes": indexes,
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "returned": stats.get("nReturned"),
+        "ms": stats.get("executionTimeMillis"),
+    }
+
+def _slow(started):
+    elapsed_ms = (time.monotonic() - started) * 1000
+    return elapsed_ms if elapsed_ms >= getattr(settings, "LOG_SLOW_QUERY_MS", 500) else None
+
+def _log_slow_query(elapsed_ms, collection_name, query, hint=None, sort=None, limit=0):
+    logger.warning(
+        "Slow log query on %s (%.0f ms): %s, plan: %s",
+        collection_name, elapsed_ms, query, explain_summary(collection_name, query, hint, sort, limit),
+    )
+
+def _hint_for(collection, query):
+    failed = _unhinted.get(collection.name)
+    if failed is not None and time.monotonic() - failed < HINT_RETRY_SECONDS:
+        return None
+    return index_hint(query)
+
+def _hint_failed(collection, hint, exc):
+    """
+    Whether `exc` is MongoDB rejecting `hint` because the collection lacks
+    that index, as before ensure_indexes has run. If so, the collection is
+    read without hints for HINT_RETRY_SECONDS and the read should be re-run.
+    """
+    if not hint or "hint" not in str(exc).lower():
+        return False
+    logger.warning(
+        "Index %s is missing on %s; reading without index hints until `manage.py ensure_indexes` creates it",
+        hint, collection.name,
+    )
+    _unhinted[collection.name] = time.monotonic()
+    return True
+
+def _cursor(collection, query, projection, sort, skip, limit, hint):
+    cursor = collection.find(query, projection).sort(sort).skip(skip).limit(limit)
+    return cursor.hint(hint) if hint else cursor
+
+def _find(collection, query, projection, sort, skip, limit):
+    # Runs the find with its index hint, timing the first batch (where the
+    # server does the work of a sorted, limited query) and explaining it if slow
+    hint = _hint_for(collection, query)
+    started = time.monotonic()
+    try:
+        logs = iter(_cursor(collection, query, projection, sort, skip, limit, hint))
+        first = next(logs, None)
+    except OperationFailure as e:
+        if not _hint_failed(collection, hint, e):
+            raise
+        hint = None
+        logs = iter(_cursor(collection, query, projection, sort, skip, limit, hint))
+        first = next(logs, None)
+    elapsed_ms = _slow(started)
+    if elapsed_ms:
+        _log_slow_query(elapsed_ms, collection.name, query, hint, sort, limit)
+    if first is None:
+        return
+    yield first
+    yield from logs
+
+def _count(collection, query):
+    if not query:
+        return collection.estimated_document_count()
+    hint = _hint_for(collection, query)
+    started = time.monotonic()
+    try:
+        count = collection.count_documents(query, hint=hint) if hint else collection.count_documents(query)
+    except OperationFailure as e:
+        if not _hint_failed(collection, hint, e):
+            raise
+        hint = None
+        count = collection.count_documents(query)
+    elapsed_ms = _slow(started)
+    if elapsed_ms:
+        _log_slow_query(elapsed_ms, collection.name, query, hint)
+    return count
+
+def find_logs(query, sort=LOG_ORDERING, skip=0, limit=0, projection=None):
+    """
+    Iterate the logs matching `query` in `sort` order, reading each
+    collection with the index chosen by index_hint.
+    With partitioning enabled only the partitions overlapping the query's
+    time range are read. Partitions cover disjoint time ranges, so for a
+    timestamp-first sort, concatenating them in order is the merge-sort.
+    """
+    sort = list(sort)
+    collections = _log_collections(query)
+    if len(collections) == 1:
+        return _find(collections[0], query, projection, sort, skip, limit)
+
+    if sort[0][0] != "timestamp":
+        raise ValueError("Partitioned reads must sort on timestamp first")
+    if collections and collections[-1].name == "audit_logs":
+        return _merge_legacy(collections[:-1], collections[-1], query, sort, skip, limit, projection)
+    if sort[0][1] == ASCENDING:
+        collections.reverse()
+    return _chain_partitions(collections, query, sort, skip, limit, projection)
+
+def _merge_legacy(partitions, legacy, query, sort, skip, limit, projection):
+    # Logs from before partitioning can have any timestamp, so audit_logs is
+    # merged with the partitions rather than chained: each side is read up to
+    # skip + limit logs in `sort` order and the skip applies to the merge
+    key, reverse, projection = _merge_order(sort, projection)
+    if not reverse:
+        partitions = partitions[::-1]
+    window = skip + limit if limit else 0
+    merged = heapq.merge(
+        _chain_partitions(partitions, query, sort, 0, window, projection),
+        _find(legacy, query, projection, sort, 0, window),
+        key=key, reverse=reverse,
+    )
+    return islice(merged, skip, window or None)
+
+def _chain_partitions(collections, query, sort, skip, limit, projection):
+    remaining = limit or None
+    for collection in collections:
+        if skip:
+            # Skip whole partitions using their (indexed) counts
+            count = _count(collection, query)
+            if skip >= count:
+                skip -= count
+                continue
+        logs = _find(collection, query, projection, sort, skip, remaining or 0)
+        skip = 0
+        for log in logs:
+            yield log
+            if remaining is not None:
+                remaining -= 1
+                if remaining == 0:
+                    return
+
+def count_logs(query):
+    """
+    Count the logs matching `query`, using collection metadata when unfiltered.
+    """
+    return sum(_count(collection, query) for collection in _log_collections(query))
+
+def distinct_actions(limit):
+    """
+    Distinct action names across the log collections, read from the action
+    index, or None if there are more than `limit` of them.
+    """
+    pipeline = [{"$sort": {"action": ASCENDING}}, {"$group": {"_id": "$action"}}, {"$limit": limit + 1}]
+    actions = set()
+    for collection in _log_collections({}):
+        actions.update(group["_id"] for group in collection.aggregate(pipeline) if group["_id"] is not None)
+        if len(actions) > limit:
+            return None
+    return actions
+
+def get_async_mongo_collection(collection_name):
+    """
+    Get a collection from the async driver for the running event loop.
+    Collections are created and indexed by the sync client (ensure_indexes command).
+    """
+    loop = asyncio.get_running_loop()
+    database = _async_dbs.get(loop)
+    if database is None:
+        from pymongo import AsyncMongoClient  # Only ASGI processes use the async driver
+        MONGO_URI = getattr(settings, "MONGO_URI", "mongodb://localhost:27017")
+        database = _async_dbs[loop] = AsyncMongoClient(MONGO_URI, **client_options())[DATABASE_NAME]
+    return database[collection_name]
+
+async def _async_log_collections(query):
+    if not get_partitioning():
+        return [get_async_mongo_collection("audit_logs")]
+    names = await sync_to_async(list_partitions, thread_sensitive=False)(*_time_bounds(query))
+    if await sync_to_async(has_legacy_logs, thread_sensitive=False)():
+        names.append("audit_logs")
+    return [get_async_mongo_collection(name) for name in names]
+
+async def find_logs_async(query, sort=LOG_ORDERING, skip=0, limit=0, projection=None):
+    """
+    Async counterpart of find_logs: an async generator over the logs matching
+    `query` in `sort` order, reading only the overlapping partitions (and
+    audit_logs while it holds logs from before partitioning).
+    """
+    sort = list(sort)
+    collections = await _async_log_collections(query)
+    if len(collections) > 1:
+        if sort[0][0] != "timestamp":
+            raise ValueError("Partitioned reads must sort on timestamp first")
+        if collections[-1].name == "audit_logs":
+            key, reverse, projection = _merge_order(sort, projection)
+            partitions = collections[:-1] if reverse else collections[-2::-1]
+            window = skip + limit if limit else 0
+            merged = _merge_async([
+                _chain_partitions_async(partitions, query, sort, 0, window, projection),
+                _find_async(collections[-1], query, projection, sort, 0, window),
+            ], key, reverse)
+            position = 0
+            async for log in merged:
+                if position >= skip:
+                    yield log
+                position += 1
+                if window and position >= window:
+                    return
+            return
+        if sort[0][1] == ASCENDING:
+            collections.reverse()
+    async for log in _chain_partitions_async(collections, query, sort, skip, limit, projection):
+        yield log
+
+async def _chain_partitions_async(collections, query, sort, skip, limit, projection):
+    remaining = limit or None
+    for collection in collections:
+        if skip and len(collections) > 1:
+            count = await _count_async(collection, query)
+            if skip >= count:
+                skip -= count
+                continue
+        logs = _find_async(collection, query, projection, sort, skip, remaining or 0)
+        skip = 0
+        async for log in logs:
+            yield log
+            if remaining is not None:
+                remaining -= 1
+                if remaining == 0:
+                    return
+
+async def _find_async(collection, query, projection, sort, skip, limit):
+    hint = _hint_for(collection, query)
+    started = time.monotonic()
+    cursor = _cursor(collection, query, projection, sort, skip, limit, hint)
+    try:
+        first = await anext(cursor, None)
+    except OperationFailure as e:
+        if not _hint_failed(collection, hint, e):
+            raise
+        hint = None
+        cursor = _cursor(collection, query, projection, sort, skip, limit, hint)
+        first = await anext(cursor, None)
+    await _check_slow_async(started, collection.name, query, hint, sort, limit)
+    if first is None:
+        return
+    yield first
+    async for log in cursor:
+        yield log
+
+async def _merge_async(streams, key, reverse):
+    # Merge sorted async streams; there are only ever a couple of them
+    heads = [await anext(stream, None) for stream in streams]
+    while True:
+        live = [i for i, log in enumerate(heads) if log is not None]
+        if not live:
+            return
+        pick = (max if reverse else min)(live, key=lambda i: key(heads[i]))
+        yield heads[pick]
+        heads[pick] = await anext(streams[pick], None)
+
+async def _check_slow_async(started, collection_name, query, hint, sort=None, limit=0):
+    elapsed_ms = _slow(started)
+    if elapsed_ms:
+        # explain() goes through the sync client
+        await sync_to_async(_log_slow_query, thread_sensitive=False)(elapsed_ms, collection_name, query, hint, sort, limit)
+
+async def _count_async(collection, query):
+    if not query:
+        return await collection.estimated_document_count()
+    hint = _hint_for(collection, query)
+    started = time.monotonic()
+    try:
+        count = await (collection.count_documents(query, hint=hint) if hint else collection.count_documents(query))
+    except OperationFailure as e:
+        if not _hint_failed(collection, hint, e):
+            raise
+        hint = None
+        count = await collection.count_documents(query)
+    await _check_slow_async(started, collection.name, query, hint)
+    return count
+
+async def count_logs_async(query):
+    """Async counterpart of count_logs."""
+    total = 0
+    for collection in await _async_log_collections(query):
+        total += await _count_async(collection, query)
+    return total
+
+async def watch_logs_async(pipeline, resume_after=None, max_await_time_ms=None):
+    """
+    Open a change stream over the log collections: audit_logs, or every
+    partition (a database-level stream filtered by name) when partitioning
+    is enabled. Needs a replica set; time-series collections cannot be watched.
+    """
+    collection = get_async_mongo_collection("audit_logs")
+    target = collection
+    if get_partitioning():
+        target = collection.database
+        pipeline = [{"$match": {"ns.coll": {"$regex": PARTITION_PATTERN.pattern}}}, *pipeline]
+    return await target.watch(pipeline, resume_after=resume_after, max_await_time_ms=max_await_time_ms)
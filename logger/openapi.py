@@ -0,0 +1,49 @@
+"""
+OpenAPI annotations for the REST views, applied when a schema is generated.
+
+drf_spectacular.utils (and the plumbing it pulls in) is only needed to build
+the schema, so the views use these stand-ins, which record their arguments.
+apply_annotations, a drf-spectacular preprocessing hook (SPECTACULAR_SETTINGS),
+hands them to the real extend_schema before the first schema is built, and
+loading the URLconf imports none of it.
+"""
+
+# (view method, extend_schema arguments) not yet applied
+_pending = []
+
+
+class OpenApiParameter:
+    """Arguments for drf_spectacular.utils.OpenApiParameter, built with the schema."""
+
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+    def build(self):
+        from drf_spectacular.utils import OpenApiParameter
+        return OpenApiParameter(*self.args, **self.kwargs)
+
+
+def extend_schema(**kwargs):
+    """Record drf_spectacular.utils.extend_schema arguments for a view method."""
+    def decorator(method):
+        _pending.append((method, kwargs))
+        return method
+    return decorator
+
+
+def _build(value):
+    if isinstance(value, OpenApiParameter):
+        return value.build()
+    if isinstance(value, (list, tuple)):
+        return [_build(item) for item in value]
+    return value
+
+
+def apply_annotations(endpoints):
+    """Preprocessing hook: annotate the recorded view methods, then pass the endpoints through."""
+    from drf_spectacular.utils import extend_schema
+    while _pending:
+        method, kwargs = _pending.pop(0)
+        extend_schema(**{name: _build(value) for name, value in kwargs.items()})(method)
+    return endpoints
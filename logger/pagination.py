@@ -0,0 +1,183 @@
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from django.utils.dateparse import parse_datetime
+import base64
+import binascii
+import json
+import math
+from .mongo import LOG_ORDERING, count_logs, count_logs_async, find_logs, find_logs_async
+
+
+def encode_cursor(log):
+    """
+    Build an opaque cursor pointing just after `log` in LOG_ORDERING.
+    """
+    position = [log["timestamp"].isoformat(), str(log["_id"])]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    Decode a cursor from encode_cursor into a (timestamp, _id) tuple.
+    Raises ValueError if the token is malformed.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        timestamp, log_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        position = (parse_datetime(timestamp), log_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if position[0] is None or not isinstance(log_id, str):
+        raise ValueError("Invalid cursor")
+    return position
+
+
+def seek_query(query, position):
+    """
+    Restrict `query` to logs that sort strictly after `position` in LOG_ORDERING.
+    """
+    if position is None:
+        return query
+    timestamp, log_id = position
+    seek = {"$or": [
+        {"timestamp": {"$lt": timestamp}},
+        {"timestamp": timestamp, "_id": {"$lt": log_id}},
+    ]}
+    return {"$and": [query, seek]} if query else seek
+
+
+class LogPagination(PageNumberPagination):
+    """
+    Page-number pagination that pushes skip/limit down to MongoDB.
+    Only the requested page is ever fetched from the collection.
+    """
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def paginate_query(self, query, request, sort=LOG_ORDERING, count=None):
+        """
+        Return the logs for the requested page of `query`.
+        The total count comes from the collection metadata when no filter is
+        set, unless the caller already has it (e.g. cached) and passes `count`.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count = count_logs(query) if count is None else count
+        skip = self._page_offset(request)
+        return list(find_logs(query, sort=sort, skip=skip, limit=self.page_size))
+
+    async def apaginate_query(self, query, request, sort=LOG_ORDERING):
+        """Async counterpart of paginate_query."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count = await count_logs_async(query)
+        skip = self._page_offset(request)
+        return [log async for log in find_logs_async(query, sort=sort, skip=skip, limit=self.page_size)]
+
+    def _page_offset(self, request):
+        num_pages = max(1, math.ceil(self.count / self.page_size))
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except (TypeError, ValueError):
+            raise NotFound("Invalid page.")
+        if self.page_number < 1 or self.page_number > num_pages:
+            raise NotFound("Invalid page.")
+        self.num_pages = num_pages
+        return (self.page_number - 1) * self.page_size
+
+    def get_next_link(self):
+        if self.page_number >= self.num_pages:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+    def get_paginated_data(self, data, tampered=None):
+        return {
+            "count": self.count,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+            "tampered": tampered or [],
+        }
+
+    def get_paginated_response(self, data, tampered=None):
+        return Response(self.get_paginated_data(data, tampered))
+
+
+class LogCursorPagination(BasePagination):
+    """
+    Keyset pagination on (timestamp, _id).
+    Each page seeks past the previous cursor, so deep pages cost the same as
+    the first one and concurrent inserts never shift rows between pages.
+    """
+    cursor_query_param = "cursor"
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def paginate_query(self, query, request):
+        """
+        Return the logs following the cursor in the request, if any.
+        """
+        page_size = self.get_page_size(request)
+        logs = list(find_logs(self._seek(query, request), limit=page_size + 1))
+        return self._trim(logs, page_size)
+
+    async def apaginate_query(self, query, request):
+        """Async counterpart of paginate_query."""
+        page_size = self.get_page_size(request)
+        logs = [log async for log in find_logs_async(self._seek(query, request), limit=page_size + 1)]
+        return self._trim(logs, page_size)
+
+    def _seek(self, query, request):
+        self.request = request
+        token = request.query_params.get(self.cursor_query_param)
+        try:
+            position = decode_cursor(token) if token else None
+        except ValueError:
+            raise NotFound("Invalid cursor")
+        return seek_query(query, position)
+
+    def _trim(self, logs, page_size):
+        self.has_next = len(logs) > page_size
+        logs = logs[:page_size]
+        self.next_cursor = encode_cursor(logs[-1]) if self.has_next else None
+        return logs
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_data(self, data, tampered=None):
+        return {
+            "next": self.get_next_link(),
+            "next_cursor": self.next_cursor,
+            "results": data,
+            "tampered": tampered or [],
+        }
+
+    def get_paginated_response(self, data, tampered=None):
+        return Response(self.get_paginated_data(data, tampered))
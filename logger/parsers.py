@@ -0,0 +1,49 @@
+from rest_framework.parsers import BaseParser
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework import status
+import json
+
+
+class InvalidLine:
+    """Placeholder for an NDJSON line that is not valid JSON."""
+    def __init__(self, error):
+        self.error = error
+
+
+class TooManyEntries(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_code = "too_many_entries"
+
+    def __init__(self, max_entries):
+        super().__init__(f"A batch may contain at most {max_entries} entries")
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline-delimited JSON into a list, one item per non-blank line.
+    Malformed lines become InvalidLine items so callers can reject them
+    individually instead of failing the whole request. If the view has a
+    `max_entries` attribute, parsing stops with a 413 as soon as the body
+    has more lines than that, without reading the rest of it.
+    """
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", "utf-8")
+        max_entries = getattr(parser_context.get("view"), "max_entries", None)
+        items = []
+        try:
+            for line in stream:
+                line = line.decode(encoding).strip()
+                if not line:
+                    continue
+                if max_entries is not None and len(items) >= max_entries:
+                    raise TooManyEntries(max_entries)
+                try:
+                    items.append(json.loads(line))
+                except ValueError as exc:
+                    items.append(InvalidLine(f"Invalid JSON: {exc}"))
+        except UnicodeDecodeError as exc:
+            raise ParseError(f"NDJSON parse error - {exc}")
+        return items
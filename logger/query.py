@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from .mongo import distinct_actions
+import re
+
+# Query parameters accepted as log filters by list, export, export jobs and GraphQL
+FILTER_PARAMS = (
+    "user_id", "action", "action__startswith", "action__contains", "action__in", "action__nin",
+    "start_time", "end_time",
+)
+
+def prefix_range(prefix):
+    """
+    Anchored range matching every string that starts with `prefix`, which
+    MongoDB answers with a bounded scan of the (action, timestamp) index.
+    """
+    # The smallest string greater than every match: bump the last character
+    # that can be bumped and drop what follows it
+    upper = prefix.rstrip(chr(0x10FFFF))
+    if not upper:
+        return {"$gte": prefix}
+    return {"$gte": prefix, "$lt": upper[:-1] + chr(ord(upper[-1]) + 1)}
+
+def _compile_pattern(pattern):
+    max_pattern = getattr(settings, "LOG_QUERY_MAX_PATTERN_LENGTH", 100)
+    if len(pattern) > max_pattern:
+        raise ValueError(f"action__contains may be at most {max_pattern} characters.")
+    try:
+        return re.compile(pattern, re.IGNORECASE)
+    except re.error:
+        raise ValueError("Invalid action__contains pattern.")
+
+def _distinct_actions(limit):
+    """
+    distinct_actions through the query cache, so polling action__contains
+    filters do not run the aggregate on every request. The entry is keyed on
+    the global generation, which every write bumps, so new actions show up.
+    """
+    from .query_cache import get_or_set  # query_cache imports this module
+    actions = get_or_set("actions", {}, lambda: {"actions": _sorted_or_none(distinct_actions(limit))}, vary=(limit,))
+    return actions["actions"]
+
+def _sorted_or_none(actions):
+    return None if actions is None else sorted(actions)
+
+def _action_list(param, value):
+    actions = value.split(",")
+    max_values = getattr(settings, "LOG_QUERY_MAX_IN_VALUES", 100)
+    if len(actions) > max_values:
+        raise ValueError(f"{param} may list at most {max_values} actions.")
+    return actions
+
+def _contains_condition(pattern, indexed_bound):
+    """
+    Resolve an `action__contains` pattern (a case-insensitive regex) against
+    the distinct action names, which is an index-only scan, and match those
+    exactly. An unanchored $regex cannot use the action index and would scan
+    every log, so it is only used as a fallback when there are too many
+    actions to list, and then only with an indexed user_id or time bound.
+    """
+    regex = _compile_pattern(pattern)
+    actions = _distinct_actions(getattr(settings, "LOG_QUERY_MAX_ACTIONS", 1000))
+    if actions is not None:
+        return {"$in": sorted(action for action in actions if regex.search(action))}
+    if not indexed_bound:
+        raise ValueError("action__contains needs a user_id, start_time or end_time filter on this deployment.")
+    return {"$regex": pattern, "$options": "i"}
+
+def build_log_query(params):
+    """
+    Translate the list/export filter parameters into a MongoDB query.
+    Later action filters override earlier ones. Raises ValueError for
+    unparseable timestamps, oversized action lists and for filters that
+    could not use an index.
+    """
+    query = {}
+    if params.get("user_id"):
+        query["user_id"] = params["user_id"]
+    if params.get("action"):
+        query["action"] = params["action"]
+    if params.get("action__startswith"):
+        query["action"] = prefix_range(params["action__startswith"])
+    for param, op in (("start_time", "$gte"), ("end_time", "$lte")):
+        if params.get(param):
+            value = parse_datetime(params[param])
+            if value is None:
+                raise ValueError(f"Invalid {param} format. Use ISO format.")
+            query.setdefault("timestamp", {})[op] = value
+    if params.get("action__contains"):
+        indexed_bound = "user_id" in query or "timestamp" in query
+        query["action"] = _contains_condition(params["action__contains"], indexed_bound)
+    if params.get("action__in"):
+        query["action"] = {"$in": _action_list("action__in", params["action__in"])}
+    if params.get("action__nin"):
+        query["action"] = {"$nin": _action_list("action__nin", params["action__nin"])}
+    return query
+
+def change_stream_match(params):
+    """
+    $match stage selecting inserted logs that pass the filter parameters,
+    for change streams. action__contains stays a regex here: change events
+    are matched in memory, and resolving it to the current action names
+    would miss actions first seen while the stream is open.
+    """
+    query = build_log_query({name: params.get(name) for name in FILTER_PARAMS if name != "action__contains"})
+    pattern = params.get("action__contains")
+    if pattern and not params.get("action__in") and not params.get("action__nin"):
+        _compile_pattern(pattern)
+        query["action"] = {"$regex": pattern, "$options": "i"}
+    match = {"operationType": "insert"}
+    match.update({f"fullDocument.{field}": condition for field, condition in query.items()})
+    return {"$match": match}
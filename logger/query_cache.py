@@ -0,0 +1,92 @@
+# Short-lived cache of list results for dashboards that poll the same filters.
+# Entries are keyed on the normalized filters plus a generation counter per
+# filter dimension; writes bump the counters of the dimensions they touch, so
+# stale entries are never read again and simply expire.
+from django.conf import settings
+from django.core.cache import cache
+from .metrics import query_cache_hits_counter, query_cache_misses_counter
+from .query import FILTER_PARAMS
+import hashlib
+import json
+import time
+
+GENERATION_PREFIX = "logq:gen:"
+
+# Generations must outlive every entry keyed on them
+GENERATION_TIMEOUT = 86400
+
+
+def _ttl():
+    return getattr(settings, "LOG_QUERY_CACHE_TTL", 5)
+
+
+def _dimensions(params):
+    """
+    Generation counters a filter set depends on. Exact user_id and action
+    filters only depend on their own counters; anything else (substring or
+    exclusion filters, no filter) depends on the global one.
+    """
+    dimensions = []
+    if params.get("user_id"):
+        dimensions.append(f"user:{params['user_id']}")
+    # Mirrors build_log_query, where later action filters override earlier ones
+    if params.get("action__nin"):
+        pass
+    elif params.get("action__in"):
+        dimensions.extend(f"action:{action}" for action in params["action__in"].split(","))
+    elif params.get("action") and not params.get("action__contains") and not params.get("action__startswith"):
+        dimensions.append(f"action:{params['action']}")
+    return dimensions or ["all"]
+
+
+def _cache_key(kind, params, extra_params=(), vary=()):
+    normalized = {name: params[name] for name in (*FILTER_PARAMS, *extra_params) if params.get(name)}
+    # The epoch is bumped when logs are removed, which may affect any query
+    dimensions = _dimensions(normalized) + ["epoch"]
+    generations = cache.get_many([GENERATION_PREFIX + d for d in dimensions])
+    key_data = [kind, sorted(normalized.items()), list(vary), [generations.get(GENERATION_PREFIX + d, 0) for d in dimensions]]
+    return "logq:" + hashlib.sha1(json.dumps(key_data).encode()).hexdigest()
+
+
+def get_or_set(kind, params, compute, extra_params=(), vary=()):
+    """
+    Return the cached result of `compute()` for this filter set (plus any
+    `extra_params`, e.g. page or cursor, and `vary` values such as the host
+    links are built for), computing and caching it on a miss.
+    Disabled when LOG_QUERY_CACHE_TTL is 0.
+    """
+    ttl = _ttl()
+    if ttl <= 0:
+        return compute()
+    key = _cache_key(kind, params, extra_params, vary)
+    result = cache.get(key)
+    if result is not None:
+        query_cache_hits_counter.labels(kind).inc()
+        return result
+    query_cache_misses_counter.labels(kind).inc()
+    result = compute()
+    cache.set(key, result, ttl)
+    return result
+
+
+def invalidate_for(log_entries):
+    """
+    Bump the generations of every filter dimension the new logs touch, so
+    cached results that could include them are never served again.
+    """
+    if _ttl() <= 0 or not log_entries:
+        return
+    dimensions = {"all"}
+    for entry in log_entries:
+        if entry.get("user_id"):
+            dimensions.add(f"user:{entry['user_id']}")
+        dimensions.add(f"action:{entry['action']}")
+    generation = time.time_ns()
+    cache.set_many({GENERATION_PREFIX + d: generation for d in dimensions}, GENERATION_TIMEOUT)
+
+
+def invalidate_all():
+    """Invalidate every cached result, e.g. after logs were archived."""
+    if _ttl() <= 0:
+        return
+    cache.set(GENERATION_PREFIX + "epoch", time.time_ns(), GENERATION_TIMEOUT)
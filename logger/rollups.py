@@ -0,0 +1,225 @@
+from pymongo import ASCENDING, UpdateOne
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from datetime import datetime, timedelta, timezone
+from collections import Counter
+from .mongo import get_mongo_collection
+import time
+
+# Bucket widths; a bucket is identified by its (naive UTC) start
+GRANULARITIES = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+# Rolled-up dimensions; "all" counts every log under the value "*"
+DIMENSIONS = ("action", "user_id", "all")
+
+# Default retention per granularity in days (None keeps buckets forever)
+RETENTION_DAYS = {"minute": 7, "hour": 90, "day": None}
+
+# Where rebuild_rollups builds the new counters before swapping them in. Its
+# "rebuild" document holds the cutoff from which live writes count there too.
+REBUILD_COLLECTION = "audit_rollups_rebuild"
+REBUILD_CHECK_SECONDS = 5
+
+# This process's view of the running rebuild: {"since": datetime or None,
+# "checked": monotonic time}, rechecked after REBUILD_CHECK_SECONDS
+_rebuild = {}
+
+
+def get_rollups_collection():
+    """
+    Collection of activity counters: one document per (granularity,
+    dimension, value, bucket) with a `count`. Minute and hour buckets carry
+    an `expires_at` for the TTL index.
+    """
+    return get_mongo_collection("audit_rollups")
+
+
+def ensure_rollup_indexes(collection=None):
+    """
+    The unique counter index, which upserts rely on to never create a
+    counter twice, and the TTL index (ensure_indexes command).
+    """
+    collection = get_rollups_collection() if collection is None else collection
+    collection.create_index(
+        [("granularity", ASCENDING), ("dimension", ASCENDING), ("bucket", ASCENDING), ("value", ASCENDING)],
+        unique=True,
+    )
+    collection.create_index("expires_at", expireAfterSeconds=0)
+
+
+def _naive_utc(timestamp):
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def bucket_start(timestamp, granularity):
+    """Start of the bucket holding `timestamp`, as a naive UTC datetime."""
+    timestamp = _naive_utc(timestamp)
+    if granularity == "minute":
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _retention(granularity):
+    days = getattr(settings, "LOG_ROLLUP_RETENTION_DAYS", RETENTION_DAYS).get(granularity)
+    return timedelta(days=days) if days else None
+
+
+def rebuild_since():
+    """
+    Cutoff of the running rebuild_rollups, or None. Checked at most every
+    REBUILD_CHECK_SECONDS, which the rebuild allows for before its cutoff.
+    """
+    checked = _rebuild.get("checked")
+    if checked is None or time.monotonic() - checked >= REBUILD_CHECK_SECONDS:
+        marker = get_mongo_collection(REBUILD_COLLECTION).find_one({"_id": "rebuild"})
+        _rebuild.update(since=marker["since"] if marker else None, checked=time.monotonic())
+    return _rebuild["since"]
+
+
+def record_rollups(log_entries, collection=None):
+    """
+    Add newly stored logs to the rollups with one unordered bulk write of
+    $inc upserts, one per touched counter. Callers must pass each log only
+    once (insert_logs_bulk leaves out duplicates of already stored logs).
+    While rebuild_rollups runs, logs from its cutoff on are also counted
+    into its staging collection, which replaces the rollups when it is done.
+    """
+    if not log_entries or not getattr(settings, "LOG_ROLLUPS", True):
+        return
+    if collection is None:
+        since = rebuild_since()
+        if since is not None:
+            record_rollups(
+                [entry for entry in log_entries if _naive_utc(entry["timestamp"]) >= since],
+                get_mongo_collection(REBUILD_COLLECTION),
+            )
+        collection = get_rollups_collection()
+
+    increments = Counter()
+    for entry in log_entries:
+        values = {"action": entry["action"], "user_id": entry.get("user_id"), "all": "*"}
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(entry["timestamp"], granularity)
+            for dimension in DIMENSIONS:
+                if values[dimension] is not None:
+                    increments[granularity, dimension, str(values[dimension]), bucket] += 1
+
+    operations = []
+    for (granularity, dimension, value, bucket), count in increments.items():
+        update = {"$inc": {"count": count}}
+        retention = _retention(granularity)
+        if retention:
+            update["$setOnInsert"] = {"expires_at": bucket + GRANULARITIES[granularity] + retention}
+        operations.append(UpdateOne(
+            {"granularity": granularity, "dimension": dimension, "value": value, "bucket": bucket},
+            update,
+            upsert=True,
+        ))
+    collection.bulk_write(operations, ordered=False)
+
+
+def _bucket_range(granularity, start, end):
+    first, last = bucket_start(start, granularity), bucket_start(end, granularity)
+    max_buckets = getattr(settings, "LOG_STATS_MAX_BUCKETS", 1000)
+    if (last - first) / GRANULARITIES[granularity] >= max_buckets:
+        raise ValueError(f"The range spans more than {max_buckets} {granularity} buckets; use a coarser granularity.")
+    return first, last
+
+
+def histogram(granularity, start, end, dimension="all", value="*"):
+    """
+    Log counts per bucket between `start` and `end` for one dimension value
+    (every log by default), with empty buckets filled in as zero.
+    Raises ValueError when the range has too many buckets.
+    """
+    first, last = _bucket_range(granularity, start, end)
+    counts = Counter()
+    for row in get_rollups_collection().find(
+        {"granularity": granularity, "dimension": dimension, "value": str(value), "bucket": {"$gte": first, "$lte": last}},
+        {"bucket": 1, "count": 1},
+    ):
+        # Summed: without the unique index, racing upserts may split a counter
+        counts[row["bucket"]] += row["count"]
+    buckets = []
+    bucket = first
+    while bucket <= last:
+        buckets.append({"bucket": bucket.replace(tzinfo=timezone.utc), "count": counts.get(bucket, 0)})
+        bucket += GRANULARITIES[granularity]
+    return buckets
+
+
+def top_values(granularity, start, end, dimension, limit=10):
+    """The `limit` most frequent actions or users between `start` and `end`."""
+    first, last = _bucket_range(granularity, start, end)
+    pipeline = [
+        {"$match": {"granularity": granularity, "dimension": dimension, "bucket": {"$gte": first, "$lte": last}}},
+        {"$group": {"_id": "$value", "count": {"$sum": "$count"}}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": limit},
+    ]
+    return [{"value": row["_id"], "count": row["count"]} for row in get_rollups_collection().aggregate(pipeline)]
+
+
+def stats_options(params):
+    """
+    Parse stats parameters shared by the REST endpoint and GraphQL:
+    granularity (default hour), start_time/end_time (default the last day),
+    action or user_id to chart one value, group_by and top for top-N.
+    Returns a dict of arguments; raises ValueError for invalid ones.
+    """
+    granularity = params.get("granularity") or "hour"
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}.")
+    bounds = {}
+    for param in ("start_time", "end_time"):
+        if params.get(param):
+            bounds[param] = parse_datetime(params[param])
+            if bounds[param] is None:
+                raise ValueError(f"Invalid {param} format. Use ISO format.")
+            if bounds[param].tzinfo is None:
+                bounds[param] = bounds[param].replace(tzinfo=timezone.utc)
+    end = bounds.get("end_time") or datetime.now(timezone.utc)
+    start = bounds.get("start_time") or end - timedelta(days=1)
+    if start > end:
+        raise ValueError("start_time must be before end_time.")
+
+    dimension, value = "all", "*"
+    for param in ("action", "user_id"):
+        if params.get(param):
+            dimension, value = param, params[param]
+
+    group_by = params.get("group_by") or None
+    if group_by not in (None, "action", "user_id"):
+        raise ValueError("group_by must be action or user_id.")
+    try:
+        top = int(params.get("top") or 10)
+    except (TypeError, ValueError):
+        raise ValueError("top must be an integer.")
+    if not 1 <= top <= 100:
+        raise ValueError("top must be between 1 and 100.")
+    return {
+        "granularity": granularity, "start": start, "end": end,
+        "dimension": dimension, "value": value, "group_by": group_by, "top": top,
+    }
+
+
+def log_stats(options):
+    """Answer a stats request from stats_options using only the rollups."""
+    stats = {
+        "granularity": options["granularity"],
+        "start": options["start"],
+        "end": options["end"],
+        "histogram": histogram(options["granularity"], options["start"], options["end"], options["dimension"], options["value"]),
+        "top": None,
+    }
+    if options["group_by"]:
+        stats["top"] = top_values(options["granularity"], options["start"], options["end"], options["group_by"], options["top"])
+    return stats
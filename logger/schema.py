@@ -1,8 +1,20 @@
 import graphene
+from django.conf import settings
 from graphene.types.generic import GenericScalar
+from graphene.utils.str_converters import to_camel_case
+from graphql.language import FragmentSpreadNode, InlineFragmentNode
 from bson.json_util import dumps
-from .mongo import logs_collection
-from .utils import verify_log_signature
+from .canonical import SIGNED_FIELDS
+from .loaders import get_loaders
+from .mongo import find_logs
+from .utils import validate_log_fields, verify_log_signature, verify_log_signatures
+from .pagination import decode_cursor, encode_cursor, seek_query
+from .query import build_log_query
+from .rollups import log_stats, stats_options
+
+class UserType(graphene.ObjectType):
+    id = graphene.ID()
+    username = graphene.String()
 
 class LogEntryType(graphene.ObjectType):
     _id = graphene.String()
@@ -11,20 +23,203 @@ class LogEntryType(graphene.ObjectType):
     user_id = graphene.String()
     details = GenericScalar()
     signature = graphene.String()
+    verified = graphene.Boolean(description="Whether the log's signature verifies")
+    user = graphene.Field(UserType, description="The Django user who performed the action, if any (signed-in requests only)")
+
+    def resolve_verified(parent, info):
+        return get_loaders(info.context)["verified"].load(_verified_key(parent))
+
+    def resolve_user(parent, info):
+        if not parent.get("user_id") or not _authenticated(info):
+            return None
+        return get_loaders(info.context)["user"].load(parent["user_id"])
+
+# Fields stored on log documents, by GraphQL name
+STORED_FIELDS = {to_camel_case(name): name for name in ("_id", "timestamp", "action", "user_id", "details", "signature")}
+
+def _verified_key(log):
+    return (log["_id"], log["timestamp"])
+
+def _authenticated(info):
+    """Whether the GraphQL request comes from a signed-in user; /graphql/ is open to anyone."""
+    user = getattr(info.context, "user", None)
+    return bool(user and user.is_authenticated)
+
+def _queue_loads(info, logs):
+    """
+    Queue a page of logs on the request's loaders, so `verified` and `user`
+    are loaded for the whole page at once. When the page already holds every
+    signed field, signatures are checked directly instead of re-reading logs.
+    """
+    loaders = get_loaders(info.context)
+    if logs and all(field in logs[0] for field in (*SIGNED_FIELDS, "signature")):
+        loaders["verified"].prime(dict(zip(map(_verified_key, logs), verify_log_signatures(logs))))
+    else:
+        loaders["verified"].queue(map(_verified_key, logs))
+    if _authenticated(info):
+        loaders["user"].queue(log["user_id"] for log in logs if log.get("user_id"))
+
+def _selections(info, selection_set):
+    for selection in selection_set.selections:
+        if isinstance(selection, FragmentSpreadNode):
+            yield from _selections(info, info.fragments[selection.name.value].selection_set)
+        elif isinstance(selection, InlineFragmentNode):
+            yield from _selections(info, selection.selection_set)
+        else:
+            yield selection
+
+def selected_fields(info, *path):
+    """GraphQL names selected under `path` (e.g. "edges", "node") of the current field."""
+    nodes = list(info.field_nodes)
+    for name in path:
+        nodes = [s for node in nodes if node.selection_set for s in _selections(info, node.selection_set) if s.name.value == name]
+    return {s.name.value for node in nodes if node.selection_set for s in _selections(info, node.selection_set)}
+
+def log_projection(selected):
+    """
+    MongoDB projection for the selected log fields; timestamp and _id are
+    always read because cursors are built from them.
+    """
+    fields = {STORED_FIELDS[name] for name in selected if name in STORED_FIELDS}
+    fields.add("timestamp")
+    if "user" in selected:
+        fields.add("user_id")
+    return dict.fromkeys(sorted(fields), 1)
+
+class StatsBucketType(graphene.ObjectType):
+    bucket = graphene.DateTime()
+    count = graphene.Int()
+
+class StatsTopType(graphene.ObjectType):
+    value = graphene.String()
+    count = graphene.Int()
+
+class LogStatsType(graphene.ObjectType):
+    granularity = graphene.String()
+    start = graphene.DateTime()
+    end = graphene.DateTime()
+    histogram = graphene.List(StatsBucketType)
+    top = graphene.List(StatsTopType)
+
+class LogConnection(graphene.relay.Connection):
+    class Meta:
+        node = LogEntryType
+
+class LogPageType(graphene.ObjectType):
+    results = graphene.List(LogEntryType)
+    next_cursor = graphene.String()
+
+# Filter arguments shared by the log queries, named like the REST parameters
+LOG_FILTER_ARGUMENTS = {
+    "user_id": graphene.String(),
+    "action": graphene.String(),
+    "action_startswith": graphene.String(),
+    "action_contains": graphene.String(),
+    "action_in": graphene.List(graphene.String),
+    "action_nin": graphene.List(graphene.String),
+    "start_time": graphene.String(),
+    "end_time": graphene.String(),
+}
+
+def log_filter_query(filters):
+    """Build the MongoDB query for GraphQL filter arguments with build_log_query."""
+    params = {}
+    for name, value in filters.items():
+        if value is None or name not in LOG_FILTER_ARGUMENTS:
+            continue
+        if isinstance(value, list):
+            value = ",".join(value)
+        params[name.replace("action_", "action__")] = value
+    try:
+        return build_log_query(params)
+    except ValueError as e:
+        raise Exception(str(e))
+
+def _fetch_logs(filters, cursor=None, limit=100):
+    query = log_filter_query(filters)
+    if cursor:
+        try:
+            query = seek_query(query, decode_cursor(cursor))
+        except ValueError:
+            raise Exception("Invalid cursor")
+
+    limit = max(1, min(limit, 100))
+    logs = list(find_logs(query, limit=limit + 1))
+    next_cursor = encode_cursor(logs[limit - 1]) if len(logs) > limit else None
+    logs = logs[:limit]
+    for log in logs:
+        log["_id"] = str(log["_id"])
+    return logs, next_cursor
+
+def _fetch_connection(info, filters, first=None, after=None):
+    max_page_size = getattr(settings, "LOG_GRAPHQL_MAX_PAGE_SIZE", 500)
+    first = max_page_size if first is None else first
+    if not 1 <= first <= max_page_size:
+        raise Exception(f"first must be between 1 and {max_page_size}")
+    query = log_filter_query(filters)
+    if after:
+        try:
+            query = seek_query(query, decode_cursor(after))
+        except ValueError:
+            raise Exception("Invalid cursor")
+
+    projection = log_projection(selected_fields(info, "edges", "node"))
+    logs = list(find_logs(query, limit=first + 1, projection=projection))
+    has_next = len(logs) > first
+    logs = logs[:first]
+    for log in logs:
+        log["_id"] = str(log["_id"])
+    _queue_loads(info, logs)
+
+    edges = [LogConnection.Edge(node=log, cursor=encode_cursor(log)) for log in logs]
+    return LogConnection(edges=edges, page_info=graphene.relay.PageInfo(
+        has_next_page=has_next,
+        has_previous_page=bool(after),
+        start_cursor=edges[0].cursor if edges else None,
+        end_cursor=edges[-1].cursor if edges else None,
+    ))
 
 class Query(graphene.ObjectType):
-    logs = graphene.List(LogEntryType, action=graphene.String())
+    logs = graphene.List(LogEntryType, cursor=graphene.String(), limit=graphene.Int(), **LOG_FILTER_ARGUMENTS)
+    logs_page = graphene.Field(LogPageType, cursor=graphene.String(), limit=graphene.Int(), **LOG_FILTER_ARGUMENTS)
+
+    logs_connection = graphene.relay.ConnectionField(
+        LogConnection, description="Relay connection over logs; only the selected node fields are read", **LOG_FILTER_ARGUMENTS,
+    )
 
-    def resolve_logs(self, info, action=None):
-        query = {}
-        if action:
-            query["action"] = action
+    log_stats = graphene.Field(
+        LogStatsType,
+        description="Histogram and top-N from the activity rollups (same arguments as /api/logs/stats/)",
+        granularity=graphene.String(),
+        start_time=graphene.String(),
+        end_time=graphene.String(),
+        action=graphene.String(),
+        user_id=graphene.String(),
+        group_by=graphene.String(),
+        top=graphene.Int(),
+    )
 
-        logs = list(logs_collection.find(query).sort("timestamp", -1).limit(100))
-        for log in logs:
-            log["_id"] = str(log["_id"])
+    def resolve_log_stats(self, info, **params):
+        try:
+            return log_stats(stats_options(params))
+        except ValueError as e:
+            raise Exception(str(e))
+
+    def resolve_logs(self, info, cursor=None, limit=100, **filters):
+        logs, _ = _fetch_logs(filters, cursor, limit)
+        _queue_loads(info, logs)
         return logs
 
+    def resolve_logs_page(self, info, cursor=None, limit=100, **filters):
+        logs, next_cursor = _fetch_logs(filters, cursor, limit)
+        _queue_loads(info, logs)
+        return LogPageType(results=logs, next_cursor=next_cursor)
+
+    def resolve_logs_connection(self, info, first=None, after=None, last=None, before=None, **filters):
+        if last is not None or before is not None:
+            raise Exception("logsConnection only pages forwards; use first and after")
+        return _fetch_connection(info, filters, first, after)
+
 class CreateLog(graphene.Mutation):
     class Arguments:
         action = graphene.String(required=True)
@@ -35,6 +230,7 @@ class CreateLog(graphene.Mutation):
 
     def mutate(self, info, action, user_id=None, details=None):
         from .tasks import create_log_task
+        validate_log_fields(action, user_id, details)
         create_log_task.delay(action, user_id, details)
         return CreateLog(ok=True)
 
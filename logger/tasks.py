@@ -1,11 +1,28 @@
 from celery import shared_task
 from pymongo.errors import PyMongoError, AutoReconnect
-from logger.utils import create_log_sync
-from collections import deque
+from logger.utils import build_log_entry, insert_logs_bulk, validate_log_fields
+from logger.export_jobs import expire_export_jobs, fail_stale_export_jobs, run_export_job
+from logger.merkle import BatchContentionError
+from logger.buffer import append_logs, should_flush, claim_logs, ack_logs, dead_letter_logs
+from datetime import datetime, timezone
+from django.conf import settings
 from django.core.management import call_command
+import logging
+import time
+import uuid
 
-# In-memory buffer for batching logs (max 100 logs)
-LOG_BUFFER = deque(maxlen=100)
+logger = logging.getLogger(__name__)
+
+# How many times a flush writes documents that failed with a transient error,
+# and the delay before the first re-send (doubled for each further one)
+FLUSH_WRITE_ATTEMPTS = 3
+FLUSH_RETRY_BACKOFF = 0.5
+
+# Write error codes worth re-sending (elections, shutdowns, timeouts, write
+# conflicts); anything else (document too large, validation) is dead-lettered
+TRANSIENT_WRITE_ERRORS = {
+    6, 7, 50, 89, 91, 112, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436,
+}
 
 @shared_task(
     bind=True,
@@ -15,34 +32,104 @@ LOG_BUFFER = deque(maxlen=100)
 )
 def flush_log_buffer(self):
     """
-    Flush the in-memory log buffer to MongoDB in a batch.
+    Drain the shared Redis log buffer into MongoDB in large unordered batches.
+    Entries are acknowledged only once written, so a crashed or failed flush
+    leaves them claimable by the next one. Every write is also recorded as a
+    Merkle batch and counted in the activity rollups (see insert_logs_bulk).
+    Returns a per-document report.
     """
-    try:
-        logs_to_flush = list(LOG_BUFFER)  
-        if not logs_to_flush:
-            return  
-
-        # Batch insert into MongoDB
-        batch = []
-        for log in logs_to_flush:
-            log_entry = {
-                "action": log["action"],
-                "user_id": log["user_id"],
-                "details": log["details"]
-            }
-            batch.append(create_log_sync(**log_entry)) 
-
-        LOG_BUFFER.clear()  
-    except (PyMongoError, AutoReconnect) as exc:
-        raise self.retry(exc=exc)
+    batch_size = getattr(settings, "LOG_BUFFER_BATCH_SIZE", 1000)
+    max_batches = getattr(settings, "LOG_BUFFER_MAX_BATCHES_PER_FLUSH", 50)
+    report = {"inserted": 0, "errors": []}
+
+    for _ in range(max_batches):
+        claimed = claim_logs(batch_size)
+        if not claimed:
+            break
+
+        # Sign the whole batch in memory; _id and timestamp were fixed at enqueue
+        # time, so insert_logs_bulk recognizes a re-sent document as already stored
+        entry_ids = {}
+        pending = []
+        invalid = []
+        for entry_id, log in claimed:
+            try:
+                built = build_log_entry(
+                    log["action"],
+                    user_id=log["user_id"],
+                    details=log["details"],
+                    timestamp=datetime.fromisoformat(log["timestamp"]),
+                    log_id=log["_id"],
+                )
+            except ValueError as exc:
+                # Buffered before fields were validated on enqueue; never writable
+                logger.error(f"Dead-lettering invalid log {log['_id']}: {exc}")
+                invalid.append((entry_id, log))
+                continue
+            entry_ids[log["_id"]] = entry_id
+            pending.append(built)
+        dead_letter_logs(invalid)
+
+        try:
+            errors = []
+            for attempt in range(1, FLUSH_WRITE_ATTEMPTS + 1):
+                inserted, attempt_errors = insert_logs_bulk(pending)
+                report["inserted"] += inserted
+                retry_ids = set()
+                if attempt < FLUSH_WRITE_ATTEMPTS:
+                    retry_ids = {error["_id"] for error in attempt_errors if error["code"] in TRANSIENT_WRITE_ERRORS}
+                errors.extend(error for error in attempt_errors if error["_id"] not in retry_ids)
+                pending = [log for log in pending if log["_id"] in retry_ids]
+                if not pending:
+                    break
+                time.sleep(FLUSH_RETRY_BACKOFF * 2 ** (attempt - 1))
+        except (PyMongoError, AutoReconnect, BatchContentionError) as exc:
+            # Leave the batch unacknowledged; it is reclaimed after the idle timeout
+            raise self.retry(exc=exc)
+
+        failed_ids = {error["_id"] for error in errors}
+        ack_logs([entry_id for log_id, entry_id in entry_ids.items() if log_id not in failed_ids])
+        dead_letter_logs([(entry_id, log) for entry_id, log in claimed if log["_id"] in failed_ids])
+        for error in errors:
+            logger.error(f"Failed to insert log {error['_id']}: [{error['code']}] {error['errmsg']}")
+        report["errors"].extend(errors)
+
+    return report
+
+def buffer_entry(action, user_id=None, details=None):
+    """
+    Buffered form of a new log: its _id and timestamp are fixed here.
+    Raises ValueError for invalid fields, which would otherwise fail every flush.
+    """
+    validate_log_fields(action, user_id, details)
+    return {
+        "_id": str(uuid.uuid4()),
+        "timestamp": datetime.now(timezone.utc).replace(microsecond=0),
+        "action": action,
+        "user_id": user_id,
+        "details": details,
+    }
 
 @shared_task
 def create_log_task(action, user_id=None, details=None):
     """
-    Queue a log entry into the in-memory buffer. Flush if buffer is full.
+    Queue a log entry into the shared buffer. Flush if the buffer is full or old.
     """
-    LOG_BUFFER.append({"action": action, "user_id": user_id, "details": details})
-    if len(LOG_BUFFER) >= 100:  # Flush at 100 logs
+    length, age = append_logs([buffer_entry(action, user_id, details)])
+    if should_flush(length, age):
+        flush_log_buffer.delay()
+
+@shared_task
+def create_logs_batch_task(entries):
+    """
+    Queue many already-validated log entries into the shared buffer at once.
+    Each entry is a dict with action, user_id and details.
+    """
+    length, age = append_logs([
+        buffer_entry(entry["action"], entry.get("user_id"), entry.get("details"))
+        for entry in entries
+    ])
+    if should_flush(length, age):
         flush_log_buffer.delay()
 
 @shared_task(
@@ -58,4 +145,36 @@ def archive_logs_task(self, days=30):
     try:
         call_command('archive_logs', days=days)
     except Exception as exc:
-        raise self.retry(exc=exc)
\ No newline at end of file
+        raise self.retry(exc=exc)
+
+@shared_task(acks_late=True)
+def export_logs_job_task(job_id):
+    """
+    Run an export job created through POST /api/logs/export/jobs/, writing
+    the result file for later (resumable) download.
+    """
+    job = run_export_job(job_id)
+    create_log_task.delay(
+        action="export_logs",
+        user_id=job["user_id"],
+        details={
+            "format": job["format"],
+            "compression": job["compression"],
+            "count": job["exported"],
+            "job_id": job_id,
+            "filters": job["filters"],
+        },
+    )
+    logger.info(f"Export job {job_id} finished: {job['exported']} logs, {job['size']} bytes")
+
+@shared_task
+def cleanup_export_jobs():
+    """
+    Fail export jobs whose worker died mid-run and delete expired jobs and
+    their files, so LOG_EXPORT_JOB_DIR does not grow without bound.
+    """
+    failed = fail_stale_export_jobs()
+    deleted = expire_export_jobs()
+    if failed or deleted:
+        logger.info(f"Export jobs cleaned up: {failed} timed out, {deleted} expired")
+    return {"failed": failed, "deleted": deleted}
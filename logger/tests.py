@@ -4,12 +4,18 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
-from logger.mongo import get_mongo_collection
-from logger.utils import create_log_sync, verify_log_signature
+from logger import mongo
+from logger.mongo import LOG_INDEXES, distinct_actions, find_logs, get_mongo_collection, index_hint
+from logger.query import build_log_query
+from logger.utils import build_log_entry, create_log_sync, insert_logs_bulk, verify_log_signature, verify_log_signatures
 from datetime import datetime, timedelta
 from unittest.mock import patch
+from unittest import skipUnless
+from logger.columnar import pa
 import os
-from pymongo.errors import OperationFailure
+from pymongo.errors import AutoReconnect, OperationFailure
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework_simplejwt.tokens import AccessToken
 
 class LoggerTests(TestCase):
@@ -31,6 +37,12 @@ class LoggerTests(TestCase):
         # Clear collections
         self.logs_collection.delete_many({})
         self.archive_collection.delete_many({})
+        get_mongo_collection('audit_batches').delete_many({})
+        get_mongo_collection('audit_rollups').delete_many({})
+        cache.clear()  # Cached list results and their generations
+        self._reset_throttles()
+        mongo._legacy_logs.clear()
+        mongo._partitions.clear()
 
         # Debug prints
         if os.getenv("TEST_DEBUG", "False").lower() == "true":
@@ -57,6 +69,22 @@ class LoggerTests(TestCase):
         is_valid = verify_log_signature(log_entry)
         self.assertFalse(is_valid, "Signature should be invalid")
 
+    def test_verify_log_signatures_cache(self):
+        create_log_sync(action="login", user_id="user123", details={"ip": "192.168.1.1"})
+        stored = self.logs_collection.find_one({"action": "login"})
+        self.assertEqual(verify_log_signatures([stored]), [True])
+
+        with patch("logger.utils.sign_message") as mock_hmac:
+            self.assertEqual(verify_log_signatures([stored]), [True])
+        mock_hmac.assert_not_called()
+
+        # Rotating the signing key invalidates cached results
+        with self.settings(LOG_SIGNING_KEY="rotated-key"):
+            self.assertEqual(verify_log_signatures([stored]), [False])
+
+        # The single-entry check used for client-supplied entries never consults the cache
+        self.assertFalse(verify_log_signature(dict(stored, action="tampered")))
+
     def test_create_log_sync(self):
         self._get_tokens()
         log_entry = create_log_sync(action="signup", user_id="user456", details={"email": "test@example.com"})
@@ -67,6 +95,103 @@ class LoggerTests(TestCase):
         saved_log = self.logs_collection.find_one({"_id": log_entry["_id"]})
         self.assertIsNotNone(saved_log)
 
+    def test_insert_logs_bulk_treats_duplicates_as_inserted(self):
+        existing = create_log_sync(action="login", user_id="user123")
+        batch = [build_log_entry("logout", user_id="user123") for _ in range(3)]
+        inserted, errors = insert_logs_bulk([existing] + batch)
+        self.assertEqual(inserted, 4)
+        self.assertEqual(errors, [])
+        self.assertEqual(self.logs_collection.count_documents({}), 4)
+
+    def test_insert_logs_bulk_skips_stored_logs_in_timeseries(self):
+        from logger.rollups import histogram
+        batch = [build_log_entry("login", user_id="user123") for _ in range(2)]
+        collection_class = type(self.logs_collection)
+        with self.settings(LOG_TIMESERIES=True), \
+                patch.object(collection_class, "insert_many", autospec=True, side_effect=collection_class.insert_many) as mock_insert:
+            self.assertEqual(insert_logs_bulk(batch), (2, []))
+            # A retried flush: time-series collections would accept the duplicates
+            retried = batch + [build_log_entry("logout", user_id="user123")]
+            self.assertEqual(insert_logs_bulk(retried), (3, []))
+        self.assertEqual([log["_id"] for log in mock_insert.call_args.args[1]], [retried[2]["_id"]])
+        self.assertEqual(self.logs_collection.count_documents({}), 3)
+        now = datetime.utcnow()
+        self.assertEqual(sum(bucket["count"] for bucket in histogram("day", now - timedelta(days=1), now)), 3)
+
+    def _clear_log_buffer(self):
+        from logger.buffer import get_buffer_redis
+        get_buffer_redis().delete(getattr(settings, "LOG_BUFFER_KEY", "audittrail:log_buffer"))
+
+    def test_flush_log_buffer_bulk_inserts(self):
+        from logger.tasks import create_log_task, flush_log_buffer
+        from logger.buffer import buffer_length
+        self._clear_log_buffer()
+        with patch("logger.tasks.flush_log_buffer.delay"):
+            for i in range(5):
+                create_log_task(action="login", user_id="user123", details={"index": i})
+        self.assertEqual(buffer_length(), 5)
+
+        with patch("logger.utils.get_log_collection_for", return_value=self.logs_collection), \
+                patch.object(self.logs_collection, "insert_one") as mock_insert_one:
+            report = flush_log_buffer()
+        mock_insert_one.assert_not_called()
+        self.assertEqual(report, {"inserted": 5, "errors": []})
+        self.assertEqual(buffer_length(), 0)
+        logs = list(self.logs_collection.find({"action": "login"}))
+        self.assertEqual(len(logs), 5)
+        self.assertTrue(all(verify_log_signature(log) for log in logs))
+
+    def test_flush_log_buffer_keeps_entries_on_mongodb_failure(self):
+        from logger.tasks import create_log_task, flush_log_buffer
+        from logger.buffer import buffer_length
+        from celery.exceptions import Retry
+        self._clear_log_buffer()
+        with patch("logger.tasks.flush_log_buffer.delay"):
+            for i in range(3):
+                create_log_task(action="login", user_id="user123", details={"index": i})
+
+        with patch("logger.tasks.insert_logs_bulk", side_effect=AutoReconnect("Simulated outage")), \
+                patch("logger.tasks.flush_log_buffer.retry", side_effect=Retry()):
+            with self.assertRaises(Retry):
+                flush_log_buffer()
+        self.assertEqual(buffer_length(), 3)
+
+        with self.settings(LOG_BUFFER_CLAIM_IDLE_MS=0):
+            report = flush_log_buffer()
+        self.assertEqual(report["inserted"], 3)
+        self.assertEqual(buffer_length(), 0)
+
+    def test_flush_log_buffer_retries_only_transient_errors(self):
+        from logger.tasks import create_log_task, flush_log_buffer
+        from logger.buffer import buffer_length, get_buffer_redis
+        self._clear_log_buffer()
+        get_buffer_redis().delete(f"{getattr(settings, 'LOG_BUFFER_KEY', 'audittrail:log_buffer')}:dead")
+        with patch("logger.tasks.flush_log_buffer.delay"):
+            for i in range(3):
+                create_log_task(action="login", user_id="user123", details={"index": i})
+
+        calls = []
+
+        def insert(pending):
+            calls.append([log["_id"] for log in pending])
+            if len(calls) > 1:
+                return len(pending), []
+            # A primary stepping down is transient, an oversized document is not
+            return 1, [
+                {"index": 0, "_id": pending[0]["_id"], "code": 189, "errmsg": "stepped down"},
+                {"index": 1, "_id": pending[1]["_id"], "code": 10334, "errmsg": "too large"},
+            ]
+
+        with patch("logger.tasks.insert_logs_bulk", side_effect=insert), patch("logger.tasks.time.sleep") as mock_sleep:
+            report = flush_log_buffer()
+        self.assertEqual(calls[1], [calls[0][0]])
+        self.assertEqual(len(calls), 2)
+        mock_sleep.assert_called_once_with(0.5)
+        self.assertEqual(report["inserted"], 2)
+        self.assertEqual([error["code"] for error in report["errors"]], [10334])
+        self.assertEqual(buffer_length(), 0)
+        self.assertEqual(get_buffer_redis().xlen(f"{getattr(settings, 'LOG_BUFFER_KEY', 'audittrail:log_buffer')}:dead"), 1)
+
     # Integration Tests
     @patch("logger.tasks.create_log_task.delay")
     def test_create_log_endpoint(self, mock_create_log_task):
@@ -87,6 +212,102 @@ class LoggerTests(TestCase):
             action="login", user_id=str(self.user.id), details={"ip": "192.168.1.1"}
         )
 
+    @patch("logger.tasks.create_log_task.delay")
+    def test_create_log_rejects_fields_of_the_wrong_type(self, mock_create_log_task):
+        self._get_tokens()
+        for data, error in (
+            ({"action": "login", "details": ["not", "an", "object"]}, "Details must be an object"),
+            ({"action": ["login"]}, "Action is required"),
+        ):
+            response = self.client.post(
+                reverse("log-create"),
+                data=json.dumps(data),
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f'Bearer {self.user_token}',
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.json(), {"error": error})
+        mock_create_log_task.assert_not_called()
+
+        with self.assertRaisesMessage(ValueError, "User ID must be a string"):
+            build_log_entry("login", user_id=42)
+        with self.assertRaisesMessage(ValueError, "Details must be an object"):
+            build_log_entry("login", details="ip=1.2.3.4")
+
+    def test_flush_log_buffer_dead_letters_invalid_entries(self):
+        from logger.buffer import append_logs, buffer_length, get_buffer_redis
+        from logger.tasks import buffer_entry, flush_log_buffer
+        self._clear_log_buffer()
+        dead_key = f"{getattr(settings, 'LOG_BUFFER_KEY', 'audittrail:log_buffer')}:dead"
+        get_buffer_redis().delete(dead_key)
+        # Buffered by an older release that did not validate on enqueue
+        invalid = dict(buffer_entry("login", user_id="user123"), details="not an object")
+        append_logs([buffer_entry("login", user_id="user123"), invalid])
+        with self.assertRaises(ValueError):
+            buffer_entry("login", user_id=42)
+
+        report = flush_log_buffer()
+        self.assertEqual(report["inserted"], 1)
+        self.assertEqual(buffer_length(), 0)
+        self.assertEqual(get_buffer_redis().xlen(dead_key), 1)
+
+    @patch("logger.tasks.create_logs_batch_task.delay")
+    def test_batch_create_endpoint(self, mock_batch_task):
+        self._get_tokens()
+        data = [
+            {"action": "login", "details": {"ip": "192.168.1.1"}},
+            {"details": {"ip": "192.168.1.2"}},
+            {"action": "logout"},
+        ]
+        response = self.client.post(
+            reverse("log-batch-create"),
+            data=json.dumps(data),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f'Bearer {self.user_token}',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        body = response.json()
+        self.assertEqual(body["accepted"], 2)
+        self.assertEqual(body["rejected"], 1)
+        self.assertEqual(body["results"][1], {"index": 1, "status": "rejected", "error": "Action is required"})
+        mock_batch_task.assert_called_once_with([
+            {"action": "login", "user_id": str(self.user.id), "details": {"ip": "192.168.1.1"}},
+            {"action": "logout", "user_id": str(self.user.id), "details": {}},
+        ])
+
+    @patch("logger.tasks.create_logs_batch_task.delay")
+    def test_batch_create_endpoint_ndjson(self, mock_batch_task):
+        self._get_tokens()
+        body = '{"action": "login"}\n\n{not json}\n{"action": "logout"}\n'
+        response = self.client.post(
+            reverse("log-batch-create"),
+            data=body,
+            content_type="application/x-ndjson",
+            HTTP_AUTHORIZATION=f'Bearer {self.user_token}',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        results = response.json()["results"]
+        self.assertEqual([result["status"] for result in results], ["accepted", "rejected", "accepted"])
+        self.assertEqual(len(mock_batch_task.call_args.args[0]), 2)
+
+        # Parsing stops at the first line over the limit
+        with self.settings(LOG_BATCH_MAX_ENTRIES=1), patch("logger.parsers.json.loads", wraps=json.loads) as loads:
+            response = self.client.post(
+                reverse("log-batch-create"),
+                data=body,
+                content_type="application/x-ndjson",
+                HTTP_AUTHORIZATION=f'Bearer {self.user_token}',
+            )
+            self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            self.assertNotIn(("{not json}",), [call.args for call in loads.call_args_list])
+            response = self.client.post(
+                reverse("log-batch-create"),
+                data=json.dumps([{"action": "login"}, {"action": "logout"}]),
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f'Bearer {self.user_token}',
+            )
+            self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
     def test_create_log_unauthorized(self):
         data = {"action": "login", "details": {"ip": "192.168.1.1"}}
         response = self.client.post(
@@ -143,6 +364,208 @@ class LoggerTests(TestCase):
         self.assertEqual(list_data["results"][0]["action"], "signup")
         self.assertEqual(list_data["results"][0]["details"], {"email": "user@example.com"})
 
+    def test_list_logs_paginates_in_mongodb(self):
+        self._get_tokens()
+        for i in range(25):
+            create_log_sync(action="login", user_id="testuser", details={'index': i}, timestamp=datetime.utcnow() - timedelta(minutes=i))
+
+        response = self.client.get(
+            f"{reverse('log-list')}?action=login&page=2&page_size=10",
+            HTTP_AUTHORIZATION=f'Bearer {self.user_token}',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["count"], 25)
+        self.assertEqual([log["details"]["index"] for log in data["results"]], list(range(10, 20)))
+        self.assertIsNotNone(data["next"])
+        self.assertIsNotNone(data["previous"])
+
+        response = self.client.get(
+            f"{reverse('log-list')}?page=9",
+            HTTP_AUTHORIZATION=f'Bearer {self.user_token}',
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_logs_reports_tampered(self):
+        self._get_tokens()
+        create_log_sync(action="login", user_id="testuser", details={'ip_address': '192.168.1.1'})
+        tampered_log = create_log_sync(action="logout", user_id="testuser", details={'ip_address': '192.168.1.2'})
+        self.logs_collection.update_one({"_id": tampered_log["_id"]}, {"$set": {"action": "login"}})
+
+        response = self.client.get(
+            reverse('log-list'),
+            HTTP_AUTHORIZATION=f'Bearer {self.user_token}',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(len(data["results"]), 1)
+        self.assertEqual(data["tampered"], [tampered_log["_id"]])
+
+    def test_action_prefix_and_contains_filters_use_index(self):
+        self._get_tokens()
+        for action in ("user.login", "user.logout", "admin.login", "user"):
+            create_log_sync(action=action, user_id="testuser")
+        auth = {"HTTP_AUTHORIZATION": f'Bearer {self.user_token}'}
+
+        query = build_log_query({"action__startswith": "user.", "action__contains": "LOGIN"})
+        self.assertEqual(query, {"action": {"$in": ["admin.login", "user.login"]}})
+        self.assertEqual(build_log_query({"action__startswith": "user."}), {"action": {"$gte": "user.", "$lt": "user/"}})
+        self.assertEqual(index_hint(query), LOG_INDEXES[1])
+        self.assertEqual(index_hint({"action": {"$nin": ["user"]}}), LOG_INDEXES[2])
+
+        response = self.client.get(f"{reverse('log-list')}?action__startswith=user.", **auth)
+        self.assertEqual(sorted(log["action"] for log in response.json()["results"]), ["user.login", "user.logout"])
+
+        # Too many actions to resolve: an unbounded regex would scan every log
+        with self.settings(LOG_QUERY_MAX_ACTIONS=2):
+            response = self.client.get(f"{reverse('log-list')}?action__contains=login", **auth)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            response = self.client.get(f"{reverse('log-list')}?action__contains=login&user_id=testuser", **auth)
+            self.assertEqual(response.json()["count"], 2)
+
+    def test_action_lists_are_capped_and_distinct_actions_cached(self):
+        self._get_tokens()
+        create_log_sync(action="user.login", user_id="testuser")
+        auth = {"HTTP_AUTHORIZATION": f'Bearer {self.user_token}'}
+        with self.settings(LOG_QUERY_MAX_IN_VALUES=2):
+            for param in ("action__in", "action__nin"):
+                response = self.client.get(f"{reverse('log-list')}?{param}=a,b,c", **auth)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(build_log_query({"action__nin": "a,b"}), {"action": {"$nin": ["a", "b"]}})
+
+        with patch("logger.query.distinct_actions", wraps=distinct_actions) as aggregate:
+            build_log_query({"action__contains": "login"})
+            self.assertEqual(build_log_query({"action__contains": "login"}), {"action": {"$in": ["user.login"]}})
+            self.assertEqual(aggregate.call_count, 1)
+            # New logs bump the generation, so their actions are seen at once
+            create_log_sync(action="admin.login", user_id="testuser")
+            self.assertEqual(build_log_query({"action__contains": "login"}), {"action": {"$in": ["admin.login", "user.login"]}})
+            self.assertEqual(aggregate.call_count, 2)
+
+    def test_slow_queries_are_logged_with_explain(self):
+        create_log_sync(action="login", user_id="testuser")
+        with self.settings(LOG_SLOW_QUERY_MS=0), self.assertLogs("logger.mongo", "WARNING") as logs:
+            list(find_logs({"user_id": "testuser"}, limit=1))
+        self.assertIn("Slow log query on audit_logs", logs.output[0])
+
+    def test_list_logs_served_from_cache_until_invalidated(self):
+        self._get_tokens()
+        create_log_sync(action="login", user_id="testuser")
+        url = f"{reverse('log-list')}?action=login"
+        auth = {"HTTP_AUTHORIZATION": f'Bearer {self.user_token}'}
+
+        first = self.client.get(url, **auth).json()
+        with patch("logger.views.count_logs") as mock_count, patch("logger.pagination.find_logs") as mock_find:
+            second = self.client.get(url, **auth).json()
+        mock_count.assert_not_called()
+        mock_find.assert_not_called()
+        self.assertEqual(first, second)
+
+        # Logs for another action leave the cached result alone; a new login invalidates it
+        create_log_sync(action="logout", user_id="other")
+        self.assertEqual(self.client.get(url, **auth).json()["count"], 1)
+        create_log_sync(action="login", user_id="other")
+        self.assertEqual(self.client.get(url, **auth).json()["count"], 2)
+
+    def test_list_logs_cache_disabled(self):
+        self._get_tokens()
+        create_log_sync(action="login", user_id="testuser")
+        url = reverse('log-list')
+        auth = {"HTTP_AUTHORIZATION": f'Bearer {self.user_token}'}
+        with self.settings(LOG_QUERY_CACHE_TTL=0):
+            self.assertEqual(self.client.get(url, **auth).json()["count"], 1)
+            self.logs_collection.delete_many({})
+            self.assertEqual(self.client.get(url, **auth).json()["count"], 0)
+
+    def test_list_logs_cursor_pagination(self):
+        self._get_tokens()
+        timestamp = datetime.utcnow().replace(microsecond=0)
+        created = [
+            create_log_sync(action="login", user_id="testuser", details={'index': i}, timestamp=timestamp - timedelta(minutes=i // 2))
+            for i in range(7)
+        ]
+
+        seen = []
+        url = f"{reverse('log-list')}?cursor=&page_size=3"
+        while url:
+            response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertNotIn("count", data)
+            seen.extend(log["_id"] for log in data["results"])
+            url = f"{reverse('log-list')}?cursor={data['next_cursor']}&page_size=3" if data["next_cursor"] else None
+
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(set(seen), {log["_id"] for log in created})
+
+    def test_list_logs_invalid_cursor(self):
+        self._get_tokens()
+        response = self.client.get(
+            f"{reverse('log-list')}?cursor=not-a-cursor",
+            HTTP_AUTHORIZATION=f'Bearer {self.user_token}',
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_graphql_logs_page_cursor(self):
+        for i in range(3):
+            create_log_sync(action="login", user_id="testuser", details={'index': i}, timestamp=datetime.utcnow() - timedelta(minutes=i))
+
+        from logger.schema import schema
+        result = schema.execute('{ logsPage(limit: 2) { nextCursor results { action details } } }')
+        self.assertIsNone(result.errors)
+        page = result.data["logsPage"]
+        self.assertEqual([log["details"]["index"] for log in page["results"]], [0, 1])
+
+        result = schema.execute('query ($c: String) { logsPage(limit: 2, cursor: $c) { nextCursor results { details } } }', variables={"c": page["nextCursor"]})
+        self.assertIsNone(result.errors)
+        self.assertEqual([log["details"]["index"] for log in result.data["logsPage"]["results"]], [2])
+        self.assertIsNone(result.data["logsPage"]["nextCursor"])
+
+    def test_graphql_logs_connection_projects_and_batches(self):
+        from types import SimpleNamespace
+        from logger.schema import schema
+        user_id = str(self.user.id)
+        for i in range(3):
+            create_log_sync(action="login", user_id=user_id, details={'index': i}, timestamp=datetime.utcnow() - timedelta(minutes=i))
+        tampered_log = self.logs_collection.find_one({"details.index": 1})
+        self.logs_collection.update_one({"_id": tampered_log["_id"]}, {"$set": {"details.index": 9}})
+
+        query = """query ($after: String) {
+            logsConnection(first: 2, after: $after, action: "login") {
+                edges { node { action timestamp verified user { username } } }
+                pageInfo { hasNextPage endCursor }
+            }
+        }"""
+        with patch("logger.schema.find_logs", wraps=find_logs) as mock_find, \
+                patch("logger.loaders.find_logs", wraps=find_logs) as mock_verify_find, \
+                self.assertNumQueries(1):
+            result = schema.execute(query, context_value=SimpleNamespace(user=self.user))
+        self.assertIsNone(result.errors)
+        self.assertNotIn("details", mock_find.call_args.kwargs["projection"])
+        self.assertEqual(mock_verify_find.call_count, 1)  # One read verifies the whole page
+        connection = result.data["logsConnection"]
+        self.assertEqual([edge["node"]["verified"] for edge in connection["edges"]], [True, False])
+        self.assertEqual({edge["node"]["user"]["username"] for edge in connection["edges"]}, {"testuser"})
+        self.assertTrue(connection["pageInfo"]["hasNextPage"])
+
+        result = schema.execute(query, variables={"after": connection["pageInfo"]["endCursor"]}, context_value=SimpleNamespace())
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(result.data["logsConnection"]["edges"]), 1)
+        self.assertFalse(result.data["logsConnection"]["pageInfo"]["hasNextPage"])
+
+    def test_graphql_hides_users_from_anonymous_requests(self):
+        create_log_sync(action="login", user_id=str(self.user.id))
+        query = {"query": "{ logs { action user { id username } } }"}
+        with self.assertNumQueries(0):
+            response = self.client.post("/graphql/", query, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["data"]["logs"], [{"action": "login", "user": None}])
+
+        self.client.force_login(self.user)
+        response = self.client.post("/graphql/", query, content_type="application/json")
+        self.assertEqual(response.json()["data"]["logs"][0]["user"], {"id": str(self.user.id), "username": "testuser"})
+
     # Log Export Tests (Updated for JSON-only)
     def test_export_all_logs_with_user(self):
         self._get_tokens()
@@ -230,6 +653,36 @@ class LoggerTests(TestCase):
         data = json.loads(content)
         self.assertEqual(len(data), 1)  # 1 recent log (signup)
 
+    def test_export_parallel_preserves_order(self):
+        self._get_tokens()
+        created = [
+            create_log_sync(action="login", user_id="testuser", details={'index': i}, timestamp=datetime.utcnow() - timedelta(minutes=i))
+            for i in range(50)
+        ]
+        self.logs_collection.update_one({"_id": created[7]["_id"]}, {"$set": {"action": "tampered"}})
+
+        with self.settings(LOG_EXPORT_WORKERS=3, LOG_EXPORT_BATCH_SIZE=4, LOG_EXPORT_EXECUTOR="thread"):
+            response = self.client.get(reverse('log-export'), HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+            content = b''.join(response.streaming_content).decode('utf-8')
+        data = json.loads(content)
+        self.assertEqual([log["details"]["index"] for log in data], [i for i in range(50) if i != 7])
+
+    def test_export_pool_is_shared_between_exports(self):
+        from logger import exporters
+        from logger.exporters import get_export_executor, iter_encoded_batches, shutdown_export_executor
+        shutdown_export_executor()
+        self.addCleanup(shutdown_export_executor)
+        logs = [build_log_entry("login", user_id="testuser") for _ in range(10)]
+        with self.settings(LOG_EXPORT_WORKERS=2, LOG_EXPORT_BATCH_SIZE=3, LOG_EXPORT_EXECUTOR="thread"), \
+                patch("logger.exporters._make_executor", wraps=exporters._make_executor) as mock_make:
+            for _ in range(3):
+                self.assertEqual(sum(count for _, count in iter_encoded_batches(logs)), 10)
+            executor = get_export_executor()
+        mock_make.assert_called_once_with("thread", 2)
+        # Settings changes (or a fork) get a new pool
+        with self.settings(LOG_EXPORT_WORKERS=3, LOG_EXPORT_EXECUTOR="thread"):
+            self.assertIsNot(get_export_executor(), executor)
+
     def test_export_unauthorized(self):
         url = f"{reverse('log-export')}?format=json"
         response = self.client.get(url)
@@ -259,6 +712,534 @@ class LoggerTests(TestCase):
         data = json.loads(content)
         self.assertEqual(len(data), 1000)  # All 1000 logs
 
+    def test_export_ndjson_gzip_in_large_blocks(self):
+        import gzip
+        self._get_tokens()
+        for i in range(50):
+            create_log_sync(action="login", user_id="testuser", details={"index": i})
+        url = f"{reverse('log-export')}?format=ndjson&compression=gzip"
+        with self.settings(LOG_EXPORT_BATCH_SIZE=10, LOG_EXPORT_CHUNK_SIZE=512):
+            response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+            blocks = list(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn('filename="logs_export.ndjson.gz"', response["Content-Disposition"])
+        self.assertTrue(all(len(block) >= 512 for block in blocks[:-1]))
+        lines = gzip.decompress(b"".join(blocks)).decode().splitlines()
+        self.assertEqual(sorted(json.loads(line)["details"]["index"] for line in lines), list(range(50)))
+
+    def test_export_csv_and_invalid_options(self):
+        import csv
+        import io
+        self._get_tokens()
+        log_entry = create_log_sync(action="login", user_id="testuser", details={"ip_address": "192.168.1.1"})
+        response = self.client.get(f"{reverse('log-export')}?format=csv", HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["_id"], log_entry["_id"])
+        self.assertEqual(json.loads(rows[0]["details"]), {"ip_address": "192.168.1.1"})
+
+        for params in ("format=xml", "compression=brotli"):
+            response = self.client.get(f"{reverse('log-export')}?{params}", HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+            self.assertEqual(response.status_code, 400)
+
+    @skipUnless(pa, "pyarrow is not installed")
+    def test_export_parquet(self):
+        import io
+        import pyarrow.parquet as pq
+        self._get_tokens()
+        for i in range(30):
+            create_log_sync(action="login" if i % 2 else "logout", user_id="testuser", details={"index": i})
+        with self.settings(LOG_PARQUET_ROW_GROUP_SIZE=10, LOG_EXPORT_BATCH_SIZE=10):
+            response = self.client.get(f"{reverse('log-export')}?format=parquet", HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+            content = b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        parquet = pq.ParquetFile(io.BytesIO(content))
+        self.assertEqual(parquet.metadata.num_rows, 30)
+        self.assertEqual(parquet.metadata.num_row_groups, 3)
+        table = parquet.read()
+        self.assertEqual(table.schema.names, ["_id", "timestamp", "action", "user_id", "details", "signature"])
+        self.assertEqual(sorted(json.loads(d)["index"] for d in table.column("details").to_pylist()), list(range(30)))
+
+    def test_export_parquet_requires_pyarrow(self):
+        self._get_tokens()
+        with patch("logger.exporters.pa", None):
+            response = self.client.get(f"{reverse('log-export')}?format=parquet", HTTP_AUTHORIZATION=f'Bearer {self.user_token}')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("pyarrow", response.json()["error"])
+
+    def test_export_job_runs_and_serves_ranges(self):
+        import gzip
+        import tempfile
+        from logger.export_jobs import run_export_job
+        self._get_tokens()
+        for i in range(20):
+            create_log_sync(action="login", user_id="testuser", details={"index": i})
+        create_log_sync(action="logout", user_id="testuser")
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {self.user_token}"}
+
+        with tempfile.TemporaryDirectory() as directory, self.settings(LOG_EXPORT_JOB_DIR=directory):
+            with patch("logger.views.export_logs_job_task.delay") as mock_delay:
+                response = self.client.post(reverse("log-export-jobs"), {"action": "login", "format": "ndjson"}, content_type="application/json", **auth)
+            self.assertEqual(response.status_code, 202)
+            job_id = response.json()["id"]
+            mock_delay.assert_called_once_with(job_id)
+            self.assertEqual(response.json()["compression"], "gzip")
+
+            response = self.client.get(reverse("log-export-job-download", args=[job_id]), **auth)
+            self.assertEqual(response.status_code, 409)
+            run_export_job(job_id)
+            job = self.client.get(reverse("log-export-job", args=[job_id]), **auth).json()
+            self.assertEqual((job["status"], job["exported"], job["total"], job["progress"]), ("done", 20, 20, 1.0))
+
+            url = reverse("log-export-job-download", args=[job_id])
+            whole = b"".join(self.client.get(url, **auth).streaming_content)
+            self.assertEqual(len(whole), job["size"])
+            self.assertEqual(len(gzip.decompress(whole).splitlines()), 20)
+
+            response = self.client.get(url, HTTP_RANGE="bytes=10-", **auth)
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response["Content-Range"], f"bytes 10-{job['size'] - 1}/{job['size']}")
+            self.assertEqual(whole[:10] + b"".join(response.streaming_content), whole)
+            response = self.client.get(url, HTTP_RANGE="bytes=-5", **auth)
+            self.assertEqual(b"".join(response.streaming_content), whole[-5:])
+            response = self.client.get(url, HTTP_RANGE=f"bytes={job['size']}-", **auth)
+            self.assertEqual(response.status_code, 416)
+
+            # Jobs are private to their creator (and admins)
+            other = self.client.get(reverse("log-export-job", args=[job_id]), HTTP_AUTHORIZATION=f"Bearer {self.admin_token}")
+            self.assertEqual(other.status_code, 200)
+            User.objects.create_user(username="other", password="otherpass")
+            other_token = str(RefreshToken.for_user(User.objects.get(username="other")).access_token)
+            other = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {other_token}")
+            self.assertEqual(other.status_code, 404)
+
+    def test_export_jobs_expire_and_time_out(self):
+        import tempfile
+        from logger.export_jobs import create_export_job, get_jobs_collection, job_path, run_export_job
+        from logger.tasks import cleanup_export_jobs
+        self._get_tokens()
+        create_log_sync(action="login", user_id="testuser")
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {self.user_token}"}
+        jobs = get_jobs_collection()
+
+        with tempfile.TemporaryDirectory() as directory, self.settings(LOG_EXPORT_JOB_DIR=directory):
+            done = run_export_job(create_export_job({"format": "ndjson"}, str(self.user.id))["_id"])
+            self.assertEqual(done["expires_at"] - done["finished_at"], timedelta(hours=24))
+            # A worker died mid-export
+            stale = create_export_job({"format": "csv"}, str(self.user.id))
+            jobs.update_one({"_id": stale["_id"]}, {"$set": {"status": "running", "started_at": datetime.utcnow() - timedelta(hours=2)}})
+            open(f"{job_path(stale)}.tmp", "wb").close()
+            self.assertEqual(cleanup_export_jobs(), {"failed": 1, "deleted": 0})
+            data = self.client.get(reverse("log-export-job", args=[stale["_id"]]), **auth).json()
+            self.assertEqual((data["status"], data["error"]), ("failed", "Export timed out"))
+            self.assertFalse(os.path.exists(f"{job_path(stale)}.tmp"))
+
+            jobs.update_one({"_id": done["_id"]}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+            self.assertEqual(cleanup_export_jobs(), {"failed": 0, "deleted": 1})
+            self.assertFalse(os.path.exists(job_path(done)))
+            response = self.client.get(reverse("log-export-job-download", args=[done["_id"]]), **auth)
+            self.assertEqual(response.status_code, 404)
+            self.assertIsNotNone(jobs.find_one({"_id": stale["_id"]}))
+
+    def test_export_job_rejects_invalid_parameters(self):
+        self._get_tokens()
+        for data in ({"format": "xml"}, {"start_time": "yesterday"}):
+            response = self.client.post(reverse("log-export-jobs"), data, content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {self.user_token}")
+            self.assertEqual(response.status_code, 400)
+
+    # Async (ASGI) endpoint tests
+    async def test_async_create_list_and_export(self):
+        from asgiref.sync import sync_to_async
+        from logger.buffer import buffer_length
+        self._clear_log_buffer()
+        self._get_tokens()
+        headers = {"Authorization": f"Bearer {self.user_token}"}
+
+        with patch("logger.async_views.flush_log_buffer.delay"):
+            response = await self.async_client.post(
+                reverse("async-log-create"), {"action": "login", "details": {"ip_address": "192.168.1.1"}},
+                content_type="application/json", headers=headers,
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(buffer_length(), 1)
+
+        for i in range(3):
+            create_log_sync(action="logout", user_id="testuser", details={"index": i})
+        url = f"{reverse('async-log-list')}?action=logout&page_size=2"
+        response = await self.async_client.get(url, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        sync_response = await sync_to_async(self.client.get)(
+            f"{reverse('log-list')}?action=logout&page_size=2", HTTP_AUTHORIZATION=f"Bearer {self.user_token}"
+        )
+        self.assertEqual(response.json()["results"], sync_response.json()["results"])
+        self.assertEqual(response.json()["count"], 3)
+
+        response = await self.async_client.get(f"{reverse('async-log-export')}?action=logout", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(sorted(log["details"]["index"] for log in json.loads(content)), [0, 1, 2])
+
+    async def test_async_endpoints_require_authentication(self):
+        response = await self.async_client.get(reverse("async-log-list"))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["detail"], "Authentication credentials were not provided.")
+        response = await self.async_client.post(reverse("async-log-create"), {}, content_type="application/json")
+        self.assertEqual(response.status_code, 401)
+
+    async def test_async_stream_sends_verified_logs_with_resume_tokens(self):
+        from unittest.mock import AsyncMock
+        self._clear_log_buffer()
+        self._get_tokens()
+        valid = build_log_entry("login", user_id="testuser")
+        tampered = dict(build_log_entry("login", user_id="testuser"), action="admin")
+        changes = [{"_id": {"_data": "token1"}, "fullDocument": valid}, {"_id": {"_data": "token2"}, "fullDocument": tampered}]
+
+        class FakeChangeStream:
+            async def try_next(self):
+                return changes.pop(0) if changes else None
+
+            async def close(self):
+                pass
+
+        with patch("logger.async_views.watch_logs_async", AsyncMock(return_value=FakeChangeStream())) as mock_watch, \
+                patch("logger.async_views.flush_log_buffer.delay"):
+            response = await self.async_client.get(
+                f"{reverse('async-log-stream')}?user_id=testuser&action__contains=log",
+                headers={"Authorization": f"Bearer {self.user_token}", "Last-Event-ID": "token0"},
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            content = response.streaming_content
+            events = [await anext(content) for _ in range(3)]
+            await content.aclose()
+
+        pipeline = mock_watch.call_args.args[0]
+        self.assertEqual(pipeline, [{"$match": {
+            "operationType": "insert",
+            "fullDocument.user_id": "testuser",
+            "fullDocument.action": {"$regex": "log", "$options": "i"},
+        }}])
+        self.assertEqual(mock_watch.call_args.kwargs["resume_after"], {"_data": "token0"})
+        self.assertTrue(events[1].startswith(b"id: token1\nevent: log\ndata: "))
+        self.assertIn(valid["_id"].encode(), events[1])
+        self.assertEqual(events[2], f'id: token2\nevent: tampered\ndata: {{"_id": "{tampered["_id"]}"}}\n\n'.encode())
+
+    def test_mongo_client_is_lazy_and_per_process(self):
+        from logger import mongo
+        client = mongo.get_mongo_client()
+        self.assertIs(mongo.get_mongo_client(), client)
+        with patch("logger.mongo.os.getpid", return_value=-1):
+            forked_client = mongo.get_mongo_client()
+        self.assertIsNot(forked_client, client)  # A forked child never reuses its parent's client
+
+        from django.core.management import call_command
+        call_command("ensure_indexes", stdout=open(os.devnull, "w"))
+        self.assertIn("action_1_timestamp_-1__id_-1", self.logs_collection.index_information())
+        self.assertIn("log_ids_1", get_mongo_collection("audit_batches").index_information())
+
+    def test_reads_fall_back_when_hinted_index_is_missing(self):
+        import asyncio
+        from unittest.mock import MagicMock
+        from logger.mongo import _count, _count_async, _find, _find_async
+        missing = OperationFailure("error processing query :: caused by :: hint provided does not correspond to an existing index", code=2)
+        self.addCleanup(mongo._unhinted.clear)
+        log = {"_id": "a", "action": "login"}
+
+        collection = MagicMock()
+        collection.name = "audit_logs"
+        cursor = collection.find.return_value.sort.return_value.skip.return_value.limit.return_value
+        cursor.hint.return_value.__iter__.side_effect = missing
+        cursor.__iter__.return_value = iter([log])
+        with self.assertLogs("logger.mongo", "WARNING"):
+            self.assertEqual(list(_find(collection, {"user_id": "u"}, None, [("timestamp", -1)], 0, 0)), [log])
+        # Later reads of the collection skip the hint instead of failing first
+        collection.count_documents.return_value = 1
+        self.assertEqual(_count(collection, {"user_id": "u"}), 1)
+        collection.count_documents.assert_called_once_with({"user_id": "u"})
+
+        mongo._unhinted.clear()
+        collection.count_documents.reset_mock()
+        collection.count_documents.side_effect = [missing, 1]
+        with self.assertLogs("logger.mongo", "WARNING"):
+            self.assertEqual(_count(collection, {"user_id": "u"}), 1)
+        self.assertEqual(collection.count_documents.call_args.args, ({"user_id": "u"},))
+
+        class Cursor:
+            def __init__(self, logs):
+                self.logs = iter(logs)
+
+            def hint(self, hint):
+                return HintedCursor([])
+
+            async def __anext__(self):
+                try:
+                    return next(self.logs)
+                except StopIteration:
+                    raise StopAsyncIteration
+
+            def __aiter__(self):
+                return self
+
+        class HintedCursor(Cursor):
+            async def __anext__(self):
+                raise missing
+
+        async_collection = MagicMock()
+        async_collection.name = "audit_logs"
+        async_collection.find.return_value.sort.return_value.skip.return_value.limit.side_effect = lambda limit: Cursor([log])
+
+        async def count(query, **kwargs):
+            if "hint" in kwargs:
+                raise missing
+            return 1
+        async_collection.count_documents.side_effect = count
+
+        async def read():
+            return [log async for log in _find_async(async_collection, {"user_id": "u"}, None, [("timestamp", -1)], 0, 0)]
+
+        mongo._unhinted.clear()
+        with self.assertLogs("logger.mongo", "WARNING"):
+            self.assertEqual(asyncio.run(read()), [log])
+        mongo._unhinted.clear()
+        with self.assertLogs("logger.mongo", "WARNING"):
+            self.assertEqual(asyncio.run(_count_async(async_collection, {"user_id": "u"})), 1)
+
+        # Other failures still raise
+        mongo._unhinted.clear()
+        collection.count_documents.side_effect = OperationFailure("unauthorized", code=13)
+        with self.assertRaises(OperationFailure):
+            _count(collection, {"user_id": "u"})
+
+    def test_readiness_probe(self):
+        response = self.client.get(reverse("health-ready"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {"status": "ok", "mongo": "ok", "redis": "ok"})
+
+        with patch("logger.views.ping_mongo", side_effect=AutoReconnect("down")):
+            response = self.client.get(reverse("health-ready"))
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.json()["mongo"], "AutoReconnect")
+        self.assertEqual(self.client.get(reverse("health-live")).status_code, status.HTTP_200_OK)
+
+    # Partitioning Tests
+    def _drop_partitions(self):
+        database = self.logs_collection.database
+        for name in database.list_collection_names():
+            if name.startswith(("audit_logs_", "logs_archive_")):
+                database.drop_collection(name)
+
+    def test_partitioned_writes_and_pruned_reads(self):
+        from logger.mongo import count_logs, list_partitions
+        self._get_tokens()
+        self._drop_partitions()
+        self.addCleanup(self._drop_partitions)
+        with self.settings(LOG_PARTITIONING="month"):
+            create_log_sync(action="login", user_id="testuser", timestamp=datetime(2026, 8, 31, 23, 0))
+            create_log_sync(action="login", user_id="testuser", timestamp=datetime(2026, 9, 15, 12, 0))
+            create_log_sync(action="logout", user_id="testuser", timestamp=datetime(2026, 10, 1, 0, 0))
+            self.assertEqual(self.logs_collection.count_documents({}), 0)
+            self.assertEqual(list_partitions(), ["audit_logs_2026_10", "audit_logs_2026_09", "audit_logs_2026_08"])
+
+            query = {"timestamp": {"$gte": datetime(2026, 9, 1), "$lte": datetime(2026, 10, 31)}}
+            self.assertEqual(list_partitions(datetime(2026, 9, 1), datetime(2026, 10, 31)), ["audit_logs_2026_10", "audit_logs_2026_09"])
+            self.assertEqual([log["action"] for log in find_logs(query)], ["logout", "login"])
+            self.assertEqual(count_logs({}), 3)
+            self.assertEqual(len(list(find_logs({}, skip=1, limit=1))), 1)
+
+            # Partition names are cached, and refreshed when this process creates one
+            database_class = type(self.logs_collection.database)
+            with patch.object(database_class, "list_collection_names", wraps=self.logs_collection.database.list_collection_names) as listed:
+                count_logs({})
+                self.assertEqual(listed.call_count, 0)
+                create_log_sync(action="login", user_id="testuser", timestamp=datetime(2026, 7, 2, 0, 0))
+                self.assertEqual(count_logs({}), 4)
+                self.assertEqual(listed.call_count, 1)
+            self.assertEqual(count_logs({}), 4)
+
+            response = self.client.get(
+                f"{reverse('log-list')}?start_time=2026-09-01T00:00:00&page_size=1&page=2",
+                HTTP_AUTHORIZATION=f'Bearer {self.user_token}',
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertEqual(data["count"], 2)
+            self.assertEqual(data["results"][0]["action"], "login")
+            self.assertEqual(data["tampered"], [])
+
+    def test_partitioned_reads_include_logs_from_before_partitioning(self):
+        import asyncio
+        from io import StringIO
+        from django.core.management import call_command
+        from logger.mongo import count_logs, find_logs_async
+        self._get_tokens()
+        self._drop_partitions()
+        self.addCleanup(self._drop_partitions)
+        create_log_sync(action="legacy_old", user_id="testuser", timestamp=datetime(2026, 8, 1, 12, 0))
+        create_log_sync(action="legacy_new", user_id="testuser", timestamp=datetime(2026, 9, 20, 12, 0))
+        with self.settings(LOG_PARTITIONING="month"):
+            create_log_sync(action="login", user_id="testuser", timestamp=datetime(2026, 9, 15, 12, 0))
+            create_log_sync(action="logout", user_id="testuser", timestamp=datetime(2026, 10, 1, 0, 0))
+            self.assertEqual(self.logs_collection.count_documents({}), 2)
+
+            # Merged in order with the partitions, skip and limit applying to the merge
+            self.assertEqual([log["action"] for log in find_logs({})], ["logout", "legacy_new", "login", "legacy_old"])
+            self.assertEqual([log["action"] for log in find_logs({}, skip=1, limit=2, projection={"action": 1})], ["legacy_new", "login"])
+            self.assertEqual(count_logs({"user_id": "testuser"}), 4)
+
+            async def read_async():
+                return [log["action"] async for log in find_logs_async({}, sort=[("timestamp", 1), ("_id", 1)], skip=1)]
+            self.assertEqual(asyncio.run(read_async()), ["login", "legacy_new", "logout"])
+
+            response = self.client.get(
+                f"{reverse('log-list')}?start_time=2026-09-01T00:00:00",
+                HTTP_AUTHORIZATION=f'Bearer {self.user_token}',
+            )
+            self.assertEqual([log["action"] for log in response.json()["results"]], ["logout", "legacy_new", "login"])
+
+            # archive_logs retires them too
+            with patch("logger.management.commands.archive_logs.datetime") as mock_datetime:
+                mock_datetime.utcnow.return_value = datetime(2026, 9, 10)
+                call_command("archive_logs", days=0, stdout=StringIO())
+            self.assertEqual([log["action"] for log in self.logs_collection.find()], ["legacy_new"])
+            self.assertEqual(self.archive_collection.count_documents({"action": "legacy_old"}), 1)
+
+    def test_archive_logs_retires_whole_partitions(self):
+        from io import StringIO
+        from django.core.management import call_command
+        self._drop_partitions()
+        self.addCleanup(self._drop_partitions)
+        with self.settings(LOG_PARTITIONING="day"):
+            old_log = create_log_sync(action="login", user_id="testuser", timestamp=datetime.utcnow() - timedelta(days=40))
+            create_log_sync(action="logout", user_id="testuser", timestamp=datetime.utcnow())
+            call_command("archive_logs", days=30, stdout=StringIO())
+
+            database = self.logs_collection.database
+            archive_name = "logs_archive_" + old_log["timestamp"].strftime("%Y_%m_%d")
+            self.assertIn(archive_name, database.list_collection_names())
+            self.assertNotIn(archive_name.replace("logs_archive_", "audit_logs_"), database.list_collection_names())
+            self.assertEqual(database[archive_name].count_documents({}), 1)
+
+    def test_archive_logs_copies_timeseries_partitions(self):
+        from io import StringIO
+        from django.core.management import call_command
+        self._drop_partitions()
+        self.addCleanup(self._drop_partitions)
+        collection_class = type(self.logs_collection)
+        with self.settings(LOG_PARTITIONING="day"):
+            old_log = create_log_sync(action="login", user_id="testuser", timestamp=datetime.utcnow() - timedelta(days=40))
+            create_log_sync(action="logout", user_id="testuser", timestamp=datetime.utcnow())
+            # MongoDB refuses to rename time-series collections
+            with patch("logger.management.commands.archive_logs.timeseries_options", return_value={"timeseries": {}}), \
+                    patch.object(collection_class, "rename", side_effect=OperationFailure("cannot rename a time-series collection")):
+                call_command("archive_logs", days=30, stdout=StringIO())
+
+            database = self.logs_collection.database
+            archive_name = "logs_archive_" + old_log["timestamp"].strftime("%Y_%m_%d")
+            self.assertEqual([log["_id"] for log in database[archive_name].find()], [old_log["_id"]])
+            self.assertNotIn(archive_name.replace("logs_archive_", "audit_logs_"), database.list_collection_names())
+
+    def test_verify_range_after_archiving(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from logger.merkle import get_batches_collection, verify_range
+        self._drop_partitions()
+        self.addCleanup(self._drop_partitions)
+        with self.settings(LOG_PARTITIONING="month"):
+            old_log = create_log_sync(action="login", user_id="testuser", timestamp=datetime.utcnow() - timedelta(days=120))
+            create_log_sync(action="logout", user_id="testuser", timestamp=datetime.utcnow())
+            call_command("archive_logs", days=30, stdout=StringIO())
+            archive_name = "logs_archive_" + old_log["timestamp"].strftime("%Y_%m")
+            self.assertEqual(self.logs_collection.database[archive_name].count_documents({}), 1)
+            self.assertEqual(get_batches_collection().find_one({"log_ids": old_log["_id"]})["archived"], "logs_archive_*")
+            self.assertTrue(verify_range()["valid"])
+            self.assertTrue(verify_range(deep=True)["valid"])
+
+            # Archived copies are still re-hashed by deep checks
+            self.logs_collection.database[archive_name].update_one({"_id": old_log["_id"]}, {"$set": {"action": "forged"}})
+            self.assertIn({"batch": 1, "problem": "logs modified", "log_ids": [old_log["_id"]]}, verify_range(deep=True)["problems"])
+
+            # Logs that left MongoDB only need their chain to hold
+            create_log_sync(action="login", user_id="testuser", timestamp=datetime.utcnow() - timedelta(days=200))
+            call_command("archive_logs", days=30, drop=True, stdout=StringIO())
+            report = verify_range()
+            self.assertEqual((report["valid"], report["batches"]), (True, 3))
+            get_batches_collection().update_one({"_id": 3}, {"$set": {"root": "0" * 64}})
+            self.assertEqual(verify_range()["problems"], [
+                {"batch": 3, "problem": "chain hash mismatch"},
+                {"batch": 3, "problem": "root does not match leaves"},
+            ])
+
+    def test_verify_range_keeps_checking_unarchived_logs_of_a_batch(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from datetime import timezone
+        from logger.merkle import get_batches_collection, mark_archived, verify_range
+        old_log = build_log_entry("login", user_id="testuser", timestamp=datetime.now(timezone.utc) - timedelta(days=40))
+        new_log = build_log_entry("logout", user_id="testuser")
+        insert_logs_bulk([old_log, new_log])
+        call_command("archive_logs", days=30, drop=True, stdout=StringIO())
+
+        batch = get_batches_collection().find_one({"_id": 1})
+        self.assertEqual((batch["archived"], batch["archived_ids"]), ("dropped", [old_log["_id"]]))
+        self.assertTrue(verify_range(deep=True)["valid"])
+        self.logs_collection.delete_one({"_id": new_log["_id"]})
+        self.assertEqual(verify_range(deep=True)["problems"], [{"batch": 1, "problem": "logs deleted", "log_ids": [new_log["_id"]]}])
+
+        # Once the rest is archived too, the batch is marked whole
+        self.assertEqual(mark_archived(datetime.utcnow() + timedelta(seconds=2), "dropped"), 1)
+        self.assertNotIn("archived_ids", get_batches_collection().find_one({"_id": 1}))
+        self.assertTrue(verify_range(deep=True)["valid"])
+
+    def test_timeseries_log_collection_creation(self):
+        from unittest.mock import MagicMock
+        from logger.mongo import _prepare_log_collection
+        database = MagicMock()
+        database.list_collection_names.return_value = []
+        with self.settings(LOG_TIMESERIES=True, LOG_TIMESERIES_GRANULARITY="minutes", LOG_TIMESERIES_EXPIRE_AFTER_SECONDS=86400):
+            _prepare_log_collection(database, "audit_logs_timeseries_test")
+        database.create_collection.assert_called_once_with(
+            "audit_logs_timeseries_test",
+            timeseries={"timeField": "timestamp", "metaField": "user_id", "granularity": "minutes"},
+            expireAfterSeconds=86400,
+        )
+        self.assertEqual(database["audit_logs_timeseries_test"].create_index.call_count, 3)
+
+    # Import Tests
+    def test_import_logs_command(self):
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        lines = [
+            json.dumps({"action": "login", "user_id": "legacy1", "details": {"ip": "10.0.0.1"}, "timestamp": "2024-01-02T03:04:05+02:00"}),
+            "",
+            "{broken",
+            json.dumps({"action": "logout", "user_id": "legacy1", "timestamp": "2024-01-02T04:00:00Z"}),
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "legacy.jsonl")
+            checkpoint = os.path.join(tmp, "legacy.checkpoint")
+            with open(path, "w") as f:
+                f.write("\n".join(lines) + "\n")
+
+            err = StringIO()
+            call_command("import_logs", path, batch_size=2, checkpoint=checkpoint, stdout=StringIO(), stderr=err)
+            self.assertIn("Line 3", err.getvalue())
+            with open(checkpoint) as f:
+                self.assertEqual(f.read(), "4")
+
+            logs = list(self.logs_collection.find({"user_id": "legacy1"}).sort("timestamp", 1))
+            self.assertEqual([log["action"] for log in logs], ["login", "logout"])
+            self.assertEqual(logs[0]["timestamp"], datetime(2024, 1, 2, 1, 4, 5))
+            self.assertTrue(all(verify_log_signature(log) for log in logs))
+
+            # Re-importing from scratch is idempotent
+            os.remove(checkpoint)
+            call_command("import_logs", path, stdout=StringIO(), stderr=StringIO())
+            self.assertEqual(self.logs_collection.count_documents({"user_id": "legacy1"}), 2)
+
     # Archive Tests
     @patch("logger.tasks.archive_logs_task.delay")
     def test_trigger_archive_endpoint_admin(self, mock_archive_task):
@@ -402,11 +1383,50 @@ class LoggerTests(TestCase):
         self.assertEqual(active_logs, 0)  # All logs archived
         self.assertEqual(archived_logs, initial_active_logs + initial_archived_logs)
 
+    @skipUnless(pa, "pyarrow is not installed")
+    def test_archive_logs_to_parquet(self):
+        import tempfile
+        import pyarrow.parquet as pq
+        from django.core.management import call_command
+        old_time = datetime.utcnow() - timedelta(days=40)
+        for i in range(5):
+            create_log_sync(action="login", user_id="testuser", details={"index": i}, timestamp=old_time)
+        create_log_sync(action="recent", user_id="testuser")
+
+        with tempfile.TemporaryDirectory() as directory:
+            call_command("archive_logs", days=30, format="parquet", output_dir=directory, batch_size=2, stdout=open(os.devnull, "w"))
+            table = pq.read_table(os.path.join(directory, f"month={old_time:%Y-%m}"))
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(self.logs_collection.count_documents({}), 1)
+        self.assertEqual(self.archive_collection.count_documents({}), 0)
+
+    def test_archive_logs_command_batches(self):
+        from io import StringIO
+        from django.core.management import call_command
+        old_logs = [
+            create_log_sync(action="login", user_id="testuser", details={'index': i}, timestamp=datetime.utcnow() - timedelta(days=40 + i))
+            for i in range(5)
+        ]
+        create_log_sync(action="logout", user_id="testuser", timestamp=datetime.utcnow())
+
+        # A copy left behind by an interrupted run must not break the next one
+        self.archive_collection.insert_one(dict(old_logs[0], timestamp=old_logs[0]["timestamp"].replace(tzinfo=None)))
+
+        call_command("archive_logs", days=30, batch_size=2, stdout=StringIO())
+        self.assertEqual(self.logs_collection.count_documents({}), 1)
+        self.assertEqual(self.archive_collection.count_documents({}), 5)
+        archived = self.archive_collection.find_one({'_id': old_logs[3]['_id']})
+        self.assertTrue(verify_log_signature(archived))
+
     @patch("logger.mongo.get_mongo_collection")
     def test_archive_mongodb_error(self, mock_get_mongo_collection):
         self._get_tokens()
         self.logs_collection.delete_many({})
         self.archive_collection.delete_many({})
+
+        # Mock get_mongo_collection to return the correct collections
+        mock_get_mongo_collection.side_effect = lambda x: self.archive_collection if x == 'logs_archive' else self.logs_collection
+
         create_log_sync(action="login", user_id="testuser", details={'ip_address': '192.168.1.1'}, timestamp=datetime.utcnow() - timedelta(days=40))
         create_log_sync(action="logout", user_id="testuser", details={'ip_address': '192.168.1.2'}, timestamp=datetime.utcnow() - timedelta(days=10))
         create_log_sync(action="signup", user_id="testuser", details={'ip_address': '192.168.1.3'}, timestamp=datetime.utcnow())
@@ -414,9 +1434,6 @@ class LoggerTests(TestCase):
         initial_active_logs = self.logs_collection.count_documents({})
         initial_archived_logs = self.archive_collection.count_documents({})
 
-        # Mock get_mongo_collection to return the correct collections
-        mock_get_mongo_collection.side_effect = lambda x: self.archive_collection if x == 'logs_archive' else self.logs_collection
-
         # Directly mock insert_one on self.archive_collection
         with patch.object(self.archive_collection, 'insert_one', side_effect=OperationFailure("Simulated MongoDB error")):
             with self.assertRaises(OperationFailure):
@@ -430,4 +1447,283 @@ class LoggerTests(TestCase):
         active_logs = self.logs_collection.count_documents({})
         archived_logs = self.archive_collection.count_documents({})
         self.assertEqual(active_logs, initial_active_logs)
-        self.assertEqual(archived_logs, initial_archived_logs)
\ No newline at end of file
+        self.assertEqual(archived_logs, initial_archived_logs)
+
+    def test_stats_from_rollups(self):
+        self._get_tokens()
+        now = datetime.utcnow().replace(minute=30, second=0, microsecond=0)
+        for hours_ago, action, user in ((0, "login", "alice"), (0, "login", "bob"), (0, "logout", "alice"), (2, "login", "alice")):
+            create_log_sync(action=action, user_id=user, timestamp=now - timedelta(hours=hours_ago))
+        # A retried batch of already stored logs is not counted twice
+        insert_logs_bulk([self.logs_collection.find_one({"user_id": "bob"})])
+
+        start = (now - timedelta(hours=2)).isoformat()
+        with patch("logger.mongo._log_collections") as mock_collections:
+            response = self.client.get(
+                f"{reverse('log-stats')}?start_time={start}&end_time={now.isoformat()}&action=login&group_by=user_id",
+                HTTP_AUTHORIZATION=f'Bearer {self.user_token}',
+            )
+        mock_collections.assert_not_called()  # Answered without reading any log collection
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual([bucket["count"] for bucket in data["histogram"]], [1, 0, 2])
+        self.assertEqual(data["top"], [{"value": "alice", "count": 3}, {"value": "bob", "count": 1}])
+
+        from logger.schema import schema
+        result = schema.execute('{ logStats(granularity: "day", groupBy: "action", top: 1) { histogram { count } top { value count } } }')
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data["logStats"]["top"], [{"value": "login", "count": 3}])
+
+        response = self.client.get(
+            f"{reverse('log-stats')}?granularity=minute&start_time=2020-01-01T00:00:00",
+            HTTP_AUTHORIZATION=f'Bearer {self.user_token}',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rebuild_rollups_counts_logs_ingested_meanwhile_once(self):
+        from io import StringIO
+        from datetime import timezone
+        from django.core.management import call_command
+        from logger import rollups
+        from logger.rollups import get_rollups_collection, histogram
+        rollups._rebuild.clear()
+        self.addCleanup(rollups._rebuild.clear)
+        for user in ("alice", "bob"):
+            create_log_sync(action="login", user_id=user)
+        get_rollups_collection().delete_many({})  # As before rollups existed
+        live = build_log_entry("logout", user_id="bob", timestamp=datetime.now(timezone.utc) + timedelta(seconds=30))
+
+        def scan(*args, **kwargs):
+            insert_logs_bulk([live])  # Ingested while the rebuild reads the logs
+            yield from find_logs(*args, **kwargs)
+
+        # Waiting lets every writer's cached rebuild check expire
+        with patch("logger.management.commands.rebuild_rollups.time.sleep", side_effect=lambda seconds: rollups._rebuild.clear()) as mock_sleep, \
+                patch("logger.management.commands.rebuild_rollups.find_logs", side_effect=scan):
+            call_command("rebuild_rollups", stdout=StringIO())
+        self.assertGreater(mock_sleep.call_args.args[0], rollups.REBUILD_CHECK_SECONDS)
+        now = datetime.utcnow()
+        self.assertEqual(sum(bucket["count"] for bucket in histogram("day", now - timedelta(days=1), now + timedelta(days=1))), 3)
+        self.assertNotIn(rollups.REBUILD_COLLECTION, self.logs_collection.database.list_collection_names())
+        self.assertIsNone(get_rollups_collection().find_one({"_id": "rebuild"}))
+
+    def test_signing_message_matches_legacy_serialization(self):
+        from logger.canonical import signing_message
+        from datetime import timezone as dt_timezone
+        import hashlib
+        import hmac
+
+        def legacy(entry):
+            temp_entry = {k: v for k, v in entry.items() if k != "signature"}
+            temp_entry["timestamp"] = temp_entry["timestamp"].replace(microsecond=0).strftime("%Y-%m-%d %H:%M:%S+00:00")
+            return json.dumps(temp_entry, sort_keys=True).encode()
+
+        timestamp = datetime(2024, 3, 1, 12, 30, 45, 123456)
+        entries = [
+            {"_id": "a", "timestamp": timestamp, "action": "login", "user_id": "testuser", "details": {"ip_address": "192.168.1.1"}},
+            {"_id": "b", "timestamp": timestamp, "action": "café \"quoted\"\n", "user_id": None, "details": {}},
+            {"_id": 7, "timestamp": timestamp.replace(tzinfo=dt_timezone.utc), "action": "x", "user_id": 3, "details": {"z": [1, 2.5, None, True], "a": {"☃": "\U0001f600"}}},
+            {"_id": "c", "timestamp": timestamp, "action": "extra", "user_id": "u", "details": {}, "source": "import"},
+            {"_id": "d", "timestamp": timestamp, "action": "sig", "user_id": "u", "details": {"n": 1e100}, "signature": "deadbeef"},
+        ]
+        for entry in entries:
+            self.assertEqual(signing_message(entry), legacy(entry))
+
+        # Signatures written before the canonical encoder must still verify
+        entry = dict(entries[0])
+        entry["signature"] = hmac.new(settings.LOG_SIGNING_KEY.encode(), legacy(entry), hashlib.sha256).hexdigest()
+        self.assertTrue(verify_log_signature(entry))
+        self.assertEqual(build_log_entry("login", user_id="testuser", details={"ip_address": "192.168.1.1"}, timestamp=timestamp, log_id="a")["signature"], entry["signature"])
+
+    def test_merkle_batches_prove_inclusion_and_detect_deletions(self):
+        from logger.merkle import get_inclusion_proof, verify_proof, verify_range
+        entries = [build_log_entry(f"action_{i}", user_id="testuser") for i in range(5)]
+        insert_logs_bulk(entries)
+        create_log_sync(action="single", user_id="testuser")
+
+        for entry in entries:
+            proof = get_inclusion_proof(entry["_id"])
+            self.assertEqual(proof["batch"], 1)
+            self.assertTrue(verify_proof(proof["leaf"], proof["proof"], proof["root"]))
+        self.assertFalse(verify_proof(proof["leaf"], proof["proof"][1:], proof["root"]))
+        single = get_inclusion_proof(self.logs_collection.find_one({"action": "single"})["_id"])
+        self.assertEqual(single["batch"], 2)
+        self.assertEqual(verify_range(deep=True), {"valid": True, "batches": 2, "logs": 6, "head": single["chain"], "problems": []})
+
+        self.logs_collection.delete_one({"_id": entries[2]["_id"]})
+        self.logs_collection.update_one({"_id": entries[3]["_id"]}, {"$set": {"details": {"forged": True}}})
+        # The default check reads batch records only
+        with patch("logger.merkle.find_logs") as mock_find:
+            self.assertTrue(verify_range()["valid"])
+        mock_find.assert_not_called()
+        deep_report = verify_range(deep=True)
+        self.assertFalse(deep_report["valid"])
+        self.assertEqual(deep_report["problems"], [
+            {"batch": 1, "problem": "logs deleted", "log_ids": [entries[2]["_id"]]},
+            {"batch": 1, "problem": "logs modified", "log_ids": [entries[3]["_id"]]},
+        ])
+
+    def test_merkle_batches_are_split_at_the_cap(self):
+        from logger.merkle import get_batches_collection, get_inclusion_proof, verify_proof, verify_range
+        entries = [build_log_entry(f"action_{i}", user_id="testuser") for i in range(5)]
+        with self.settings(LOG_MERKLE_BATCH_MAX=2):
+            insert_logs_bulk(entries)
+        self.assertEqual([batch["count"] for batch in get_batches_collection().find().sort("_id", 1)], [2, 2, 1])
+        proof = get_inclusion_proof(entries[4]["_id"])
+        self.assertEqual(proof["batch"], 3)
+        self.assertTrue(verify_proof(proof["leaf"], proof["proof"], proof["root"]))
+        self.assertEqual(verify_range(deep=True)["problems"], [])
+
+    def test_merkle_batches_record_retried_logs_once(self):
+        from celery.exceptions import Retry
+        from logger.buffer import buffer_length
+        from logger.merkle import BatchContentionError, get_batches_collection
+        from logger.tasks import create_log_task, flush_log_buffer
+        entries = [build_log_entry(f"action_{i}", user_id="testuser") for i in range(3)]
+        insert_logs_bulk(entries)
+        insert_logs_bulk(entries + [build_log_entry("new", user_id="testuser")])
+        self.assertEqual([batch["count"] for batch in get_batches_collection().find()], [3, 1])
+
+        # A flush whose batch could not be recorded is retried, and the retry
+        # records the logs its first attempt already inserted
+        self._clear_log_buffer()
+        with patch("logger.tasks.flush_log_buffer.delay"):
+            create_log_task(action="flushed", user_id="testuser")
+        with patch("logger.utils.record_batch", side_effect=BatchContentionError("contention")), \
+                patch("logger.tasks.flush_log_buffer.retry", side_effect=Retry()):
+            with self.assertRaises(Retry):
+                flush_log_buffer()
+        self.assertEqual(buffer_length(), 1)
+        self.assertEqual(self.logs_collection.count_documents({"action": "flushed"}), 1)
+        with self.settings(LOG_BUFFER_CLAIM_IDLE_MS=0):
+            flush_log_buffer()
+        self.assertEqual(buffer_length(), 0)
+        self.assertEqual([batch["count"] for batch in get_batches_collection().find()], [3, 1, 1])
+
+    def test_integrity_endpoints_and_command(self):
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        self._get_tokens()
+        log_entry = create_log_sync(action="login", user_id="testuser")
+        create_log_sync(action="logout", user_id="testuser")
+
+        response = self.client.get(reverse("log-integrity"), HTTP_AUTHORIZATION=f"Bearer {self.admin_token}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()["valid"])
+        response = self.client.get(reverse("log-integrity"), HTTP_AUTHORIZATION=f"Bearer {self.user_token}")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.get(reverse("log-proof", args=[log_entry["_id"]]), HTTP_AUTHORIZATION=f"Bearer {self.user_token}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["proof"], [])
+        response = self.client.get(reverse("log-proof", args=["missing"]), HTTP_AUTHORIZATION=f"Bearer {self.user_token}")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # Rewriting a batch root breaks the chain from that batch on
+        get_mongo_collection("audit_batches").update_one({"_id": 1}, {"$set": {"root": "0" * 64}})
+        with self.assertRaisesMessage(CommandError, "Integrity check failed"):
+            call_command("verify_integrity", stdout=open(os.devnull, "w"), stderr=open(os.devnull, "w"))
+
+    def test_startup_imports_are_lazy(self):
+        import subprocess
+        import sys
+        # A new interpreter: this one already imported everything
+        code = (
+            "import django, sys; django.setup(); import audittrail.urls; "
+            "print([m for m in ('logger.schema', 'logger.async_views', 'drf_spectacular.views', 'drf_spectacular.utils', 'pyarrow') if m in sys.modules])"
+        )
+        result = subprocess.run([sys.executable, "-c", code], cwd=settings.BASE_DIR, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, "[]\n")
+
+        # The deferred views still work on first use
+        self._get_tokens()
+        create_log_sync(action="login", user_id="testuser")
+        response = self.client.post("/graphql/", {"query": "{ logs { action } }"}, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["data"]["logs"], [{"action": "login"}])
+        response = self.client.get(reverse("schema"), HTTP_AUTHORIZATION=f"Bearer {self.user_token}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The views' deferred annotations made it into the schema
+        self.assertIn(b"Verify the integrity of a time range", response.content)
+        self.assertIn(b"action__nin", response.content)
+        response = self.client.get(reverse("async-log-list"), HTTP_AUTHORIZATION=f"Bearer {self.user_token}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def _reset_throttles(self):
+        from logger import throttles
+        from logger.buffer import get_buffer_redis
+        client = get_buffer_redis()
+        for key in client.scan_iter("audittrail:throttle:*"):
+            client.delete(key)
+        throttles._reserved.clear()
+
+    def _throttle_rates(self, **rates):
+        return self.settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates})
+
+    def test_throttle_scopes(self):
+        self._get_tokens()
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {self.user_token}"}
+        with self._throttle_rates(log_create="1/min", log_list="2/min"):
+            for _ in range(2):
+                self.assertEqual(self.client.get(reverse("log-list"), **auth).status_code, status.HTTP_200_OK)
+            response = self.client.get(reverse("log-list"), **auth)
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(response.json()["error"], "Rate limit exceeded")
+            self.assertTrue(1 <= int(response.json()["retry_after_seconds"]) <= 30)
+
+            # Scopes are limited separately; log_export has no rate here
+            response = self.client.post(reverse("log-create"), {"action": "login"}, content_type="application/json", **auth)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            response = self.client.post(reverse("log-create"), {"action": "login"}, content_type="application/json", **auth)
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(self.client.get(reverse("log-export"), **auth).status_code, status.HTTP_200_OK)
+            # Another user has their own budget
+            response = self.client.get(reverse("log-list"), HTTP_AUTHORIZATION=f"Bearer {self.admin_token}")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_every_throttled_view_has_a_scope(self):
+        import inspect
+        from audittrail import settings as project_settings
+        from logger import async_views, views
+        from logger.throttles import RedisUserRateThrottle
+        rates = project_settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]
+        throttled = [
+            view for module in (views, async_views) for _, view in inspect.getmembers(module, inspect.isclass)
+            if view.__module__ == module.__name__ and RedisUserRateThrottle in getattr(view, "throttle_classes", [])
+            and view is not async_views.AsyncAPIView
+        ]
+        self.assertIn(views.LogIntegrityView, throttled)
+        for view in throttled:
+            self.assertIn(getattr(view, "throttle_scope", "user"), set(rates) - {"user"}, view.__name__)
+
+        # A view without a scope falls back to the "user" rate
+        class UnscopedView:
+            pass
+        self.assertEqual(RedisUserRateThrottle().get_scope(UnscopedView()), "user")
+        self._get_tokens()
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {self.admin_token}"}
+        with self._throttle_rates(user="1/min", log_admin="2/min"), patch("logger.views.archive_logs_task.delay"):
+            for expected in (status.HTTP_202_ACCEPTED, status.HTTP_202_ACCEPTED, status.HTTP_429_TOO_MANY_REQUESTS):
+                response = self.client.post(reverse("log-archive"), {"days": 30}, content_type="application/json", **auth)
+                self.assertEqual(response.status_code, expected)
+
+    def test_throttle_preallocation_and_redis_outage(self):
+        from logger import throttles
+        from redis.exceptions import ConnectionError as RedisConnectionError
+        self._get_tokens()
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {self.user_token}"}
+        with self._throttle_rates(log_list="6/min"), self.settings(LOG_THROTTLE_PREALLOCATE=4), \
+                patch("logger.throttles._gcra", wraps=throttles._gcra) as mock_gcra:
+            statuses = [self.client.get(reverse("log-list"), **auth).status_code for _ in range(7)]
+            # 4 reserved by the first call, the remaining 2 by the second, then none left
+            self.assertEqual(statuses, [200] * 6 + [429])
+            self.assertEqual(mock_gcra.call_count, 3)
+
+        self._reset_throttles()
+        with self._throttle_rates(log_list="1/min"), \
+                patch("logger.throttles._gcra", side_effect=RedisConnectionError("down")), \
+                self.assertLogs("logger.throttles", "WARNING"):
+            # Fails open
+            for _ in range(2):
+                self.assertEqual(self.client.get(reverse("log-list"), **auth).status_code, status.HTTP_200_OK)
@@ -1,17 +1,144 @@
-from rest_framework.throttling import SimpleRateThrottle
+from django.conf import settings
 from rest_framework.exceptions import Throttled
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+from redis.exceptions import RedisError
+from .buffer import get_buffer_redis
+import logging
+import math
+import os
+import threading
+import time
 
-class RedisUserRateThrottle(SimpleRateThrottle):
-    scope = 'log_create'
+logger = logging.getLogger(__name__)
 
-    def get_cache_key(self, request, view):
+# GCRA (generic cell rate algorithm) over one key per user and scope holding
+# the "theoretical arrival time" in ms: a limit of N per period spaces requests
+# `interval` = period / N apart and allows bursts of up to N. Grants up to
+# ARGV[3] requests at once and returns {granted, retry after in ms}.
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local wanted = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local tat = math.max(tonumber(redis.call('GET', KEYS[1])) or now, now)
+local available = math.floor((now + period - tat) / interval)
+if available < 1 then
+    return {0, tat + interval - period - now}
+end
+local granted = math.min(wanted, available)
+tat = tat + granted * interval
+redis.call('SET', KEYS[1], tat, 'PX', tat - now)
+return {granted, 0}
+"""
+
+DURATIONS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+_script = None
+_script_client = None
+
+# Requests reserved ahead by this process: {key: (remaining, expires at)}
+_reserved = {}
+_reserved_pid = None
+_reserved_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """'100/hour' -> (100, 3600), as DRF's SimpleRateThrottle reads rates."""
+    num, period = rate.split("/")
+    return int(num), DURATIONS[period[0]]
+
+
+def _gcra(client, key, interval_ms, period_ms, wanted):
+    global _script, _script_client
+    if _script_client is not client:
+        _script = client.register_script(GCRA_SCRIPT)
+        _script_client = client
+    granted, retry_ms = _script(keys=[key], args=[interval_ms, period_ms, wanted])
+    return int(granted), int(retry_ms) / 1000
+
+
+def _take_reserved(key):
+    """Use one of this process's reserved requests for `key`, if any are left."""
+    global _reserved_pid
+    with _reserved_lock:
+        if _reserved_pid != os.getpid():
+            # A forked child must not spend its parent's reservations
+            _reserved.clear()
+            _reserved_pid = os.getpid()
+        remaining, expires = _reserved.pop(key, (0, 0))
+        if not remaining or time.monotonic() >= expires:
+            return False
+        if remaining > 1:
+            _reserved[key] = (remaining - 1, expires)
+        return True
+
+
+def _reserve(key, count):
+    with _reserved_lock:
+        now = time.monotonic()
+        if len(_reserved) > 10000:
+            for stale in [k for k, (_, expires) in _reserved.items() if expires <= now]:
+                del _reserved[stale]
+        _reserved[key] = (count, now + getattr(settings, "LOG_THROTTLE_PREALLOCATE_TTL", 1.0))
+
+
+class RedisUserRateThrottle(BaseThrottle):
+    """
+    Per-user rate limit enforced atomically in Redis (the log buffer's) with
+    GCRA: one key and one script call per request, whatever the rate. The
+    scope is the view's `throttle_scope` (log_create, log_list, log_export,
+    log_export_job, log_admin) and its limit comes from
+    DEFAULT_THROTTLE_RATES; scopes without a rate are not limited. Views
+    without a throttle_scope share the "user" scope and rate.
+
+    With LOG_THROTTLE_PREALLOCATE > 1 a Redis call reserves up to that many
+    requests for this process, so a hot client's next requests skip Redis.
+    Reservations unused after LOG_THROTTLE_PREALLOCATE_TTL seconds are
+    forfeited: the limit can only get stricter, never looser.
+    """
+    scope = "user"
+
+    def __init__(self):
+        self._wait = None
+
+    def get_scope(self, view):
+        return getattr(view, "throttle_scope", self.scope)
+
+    def allow_request(self, request, view):
         if not request.user or not request.user.is_authenticated:
-            return None
-        return f'throttle_{self.scope}_{request.user.pk}'
+            return True
+        scope = self.get_scope(view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+        key = f"audittrail:throttle:{scope}:{request.user.pk}"
+        if _take_reserved(key):
+            return True
+
+        num_requests, duration = parse_rate(rate)
+        wanted = max(1, min(getattr(settings, "LOG_THROTTLE_PREALLOCATE", 1), num_requests))
+        try:
+            granted, self._wait = _gcra(
+                get_buffer_redis(), key, math.ceil(duration * 1000 / num_requests), duration * 1000, wanted,
+            )
+        except RedisError as e:
+            # Fail open: audit logging must not stop because the limiter is down
+            logger.warning("Rate limiting skipped, Redis unavailable: %s", e)
+            return True
+        if not granted:
+            self.throttle_failure()
+        if granted > 1:
+            _reserve(key, granted - 1)
+        return True
+
+    def wait(self):
+        return self._wait
 
     def throttle_failure(self):
         wait = self.wait()
         raise Throttled(detail={
             "error": "Rate limit exceeded",
-            "retry_after_seconds": int(wait) if wait else None
-        })
\ No newline at end of file
+            "retry_after_seconds": math.ceil(wait) if wait else None
+        })
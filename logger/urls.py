@@ -1,11 +1,25 @@
 # logger/urls.py (corrected)
-print("Loading logger/urls.py")
 from django.urls import path
-from .views import LogCreateView, LogListView, LogExportView, ArchiveLogsView
+from .lazy import lazy_async_view
+from .views import LogCreateView, LogBatchCreateView, LogListView, LogExportView, ArchiveLogsView, LogIntegrityView, LogProofView, LogStatsView, LivenessView, ReadinessView, ExportJobCreateView, ExportJobDetailView, ExportJobDownloadView
 
 urlpatterns = [
     path("logs/", LogCreateView.as_view(), name="log-create"),
+    path("logs/batch/", LogBatchCreateView.as_view(), name="log-batch-create"),
     path("logs/list/", LogListView.as_view(), name="log-list"),  
     path("logs/export/", LogExportView.as_view(), name="log-export"), 
+    path("logs/export/jobs/", ExportJobCreateView.as_view(), name="log-export-jobs"),
+    path("logs/export/jobs/<str:job_id>/", ExportJobDetailView.as_view(), name="log-export-job"),
+    path("logs/export/jobs/<str:job_id>/download/", ExportJobDownloadView.as_view(), name="log-export-job-download"),
     path("logs/archive/", ArchiveLogsView.as_view(), name="log-archive"),
+    path("logs/stats/", LogStatsView.as_view(), name="log-stats"),
+    # Async variants for ASGI deployments (uvicorn); same behaviour as above, imported on first use
+    path("async/logs/", lazy_async_view("logger.async_views.AsyncLogCreateView"), name="async-log-create"),
+    path("async/logs/list/", lazy_async_view("logger.async_views.AsyncLogListView"), name="async-log-list"),
+    path("async/logs/export/", lazy_async_view("logger.async_views.AsyncLogExportView"), name="async-log-export"),
+    path("async/logs/stream/", lazy_async_view("logger.async_views.AsyncLogStreamView"), name="async-log-stream"),
+    path("logs/integrity/", LogIntegrityView.as_view(), name="log-integrity"),
+    path("logs/<str:log_id>/proof/", LogProofView.as_view(), name="log-proof"),
+    path("health/live/", LivenessView.as_view(), name="health-live"),
+    path("health/ready/", ReadinessView.as_view(), name="health-ready"),
 ]
\ No newline at end of file
@@ -1,54 +1,237 @@
-from .mongo import logs_collection
+from .mongo import get_log_collection_for, timeseries_options
+from .canonical import signing_message
+from .merkle import record_batch, recorded_log_ids
+from .query_cache import invalidate_for
+from .rollups import record_rollups
+from pymongo.errors import BulkWriteError
 from datetime import datetime, timezone
 import uuid
-import json
 import hmac
 import hashlib
 from django.conf import settings
+from django.core.cache import cache
+from collections import OrderedDict
+from functools import lru_cache
+import threading
+import time
 import os
 
-def create_log_sync(action, user_id=None, details=None, timestamp=None):
+DUPLICATE_KEY_ERROR = 11000
+
+# Read once: signing and verification run for every log written or read
+DEBUG_SIGNING = os.getenv("DEBUG", "False").lower() == "true"
+
+@lru_cache(maxsize=4)
+def _keyed_hmac(signing_key):
+    # Copying a keyed HMAC skips re-deriving the padded key for every message
+    return hmac.new(signing_key.encode(), digestmod=hashlib.sha256)
+
+def sign_message(message):
     """
-    Create and insert a signed log entry synchronously into MongoDB.
+    HMAC-SHA256 hex digest of a canonical message under LOG_SIGNING_KEY.
     """
+    mac = _keyed_hmac(settings.LOG_SIGNING_KEY).copy()
+    mac.update(message)
+    return mac.hexdigest()
+
+def validate_log_fields(action, user_id=None, details=None):
+    """
+    Raise ValueError unless action is a non-empty string, user_id a string
+    (or None) and details an object (or None), the types signing and the
+    log indexes expect.
+    """
+    if not action or not isinstance(action, str):
+        raise ValueError("Action is required")
+    if user_id is not None and not isinstance(user_id, str):
+        raise ValueError("User ID must be a string")
+    if details is not None and not isinstance(details, dict):
+        raise ValueError("Details must be an object")
+
+def build_log_entry(action, user_id=None, details=None, timestamp=None, log_id=None):
+    """
+    Build a signed log entry in memory without writing it to MongoDB.
+    Raises ValueError for fields of the wrong type (see validate_log_fields).
+    """
+    validate_log_fields(action, user_id, details)
     # Use provided timestamp or default to current time
     timestamp = timestamp if timestamp else datetime.now(timezone.utc).replace(microsecond=0)
     log_entry = {
-        "_id": str(uuid.uuid4()),
+        "_id": log_id or str(uuid.uuid4()),
         "timestamp": timestamp,
         "action": action,
         "user_id": user_id,
         "details": details or {},
     }
 
-    # Format timestamp consistently for signing
-    signing_entry = log_entry.copy()
-    signing_entry["timestamp"] = timestamp.strftime("%Y-%m-%d %H:%M:%S+00:00")
-    signing_key = settings.LOG_SIGNING_KEY.encode()
-    message = json.dumps(signing_entry, sort_keys=True).encode()
-    signature = hmac.new(signing_key, message, hashlib.sha256).hexdigest()
+    message = signing_message(log_entry)
+    signature = sign_message(message)
     log_entry["signature"] = signature
-    if os.getenv("DEBUG", "False").lower() == "true":
+    if DEBUG_SIGNING:
         print(f"Created with LOG_SIGNING_KEY: {settings.LOG_SIGNING_KEY}, Message: {message.decode()}, Signature: {signature}")
+    return log_entry
 
-    logs_collection.insert_one(log_entry)
+def create_log_sync(action, user_id=None, details=None, timestamp=None):
+    """
+    Create and insert a signed log entry synchronously into MongoDB.
+    """
+    log_entry = build_log_entry(action, user_id=user_id, details=details, timestamp=timestamp)
+    get_log_collection_for(log_entry["timestamp"]).insert_one(log_entry)
+    record_batch([log_entry])
+    record_rollups([log_entry])
+    invalidate_for([log_entry])
     return log_entry
 
+def _stored_ids(collection, log_entries):
+    # One lookup per batch, bounded by the batch's time range so a
+    # time-series collection only opens the buckets that can hold them
+    timestamps = [log_entry["timestamp"] for log_entry in log_entries]
+    query = {
+        "_id": {"$in": [log_entry["_id"] for log_entry in log_entries]},
+        "timestamp": {"$gte": min(timestamps), "$lte": max(timestamps)},
+    }
+    return {log["_id"] for log in collection.find(query, {"_id": 1})}
+
+def insert_logs_bulk(log_entries):
+    """
+    Insert signed log entries with one unordered insert_many per target
+    collection (a single one unless partitioning is enabled).
+    Returns (inserted_count, errors) where errors holds one dict per failed
+    document. Logs that are already stored count as inserted and are not
+    written again, so retrying a batch is safe: they are rejected as
+    duplicate keys, or for time-series collections (which do not enforce a
+    unique _id) looked up by _id and left out before inserting.
+    The stored entries not yet recorded are then recorded as one Merkle
+    batch, newly stored ones are added to the activity rollups, and cached
+    list results they could appear in are invalidated.
+    """
+    groups = {}
+    for index, log_entry in enumerate(log_entries):
+        collection = get_log_collection_for(log_entry["timestamp"])
+        groups.setdefault(collection.name, (collection, []))[1].append(index)
+
+    inserted = 0
+    errors = []
+    duplicates = set()
+    timeseries = timeseries_options() is not None
+    for collection, indexes in groups.values():
+        if timeseries:
+            stored_ids = _stored_ids(collection, [log_entries[i] for i in indexes])
+            for i in indexes:
+                if log_entries[i]["_id"] in stored_ids:
+                    inserted += 1
+                    duplicates.add(i)
+            indexes = [i for i in indexes if i not in duplicates]
+            if not indexes:
+                continue
+        documents = [log_entries[i] for i in indexes]
+        try:
+            result = collection.insert_many(documents, ordered=False)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as exc:
+            inserted += exc.details.get("nInserted", 0)
+            for error in exc.details.get("writeErrors", []):
+                if error.get("code") == DUPLICATE_KEY_ERROR:
+                    inserted += 1
+                    duplicates.add(indexes[error["index"]])
+                    continue
+                index = indexes[error["index"]]
+                errors.append({
+                    "index": index,
+                    "_id": log_entries[index]["_id"],
+                    "code": error.get("code"),
+                    "errmsg": error.get("errmsg"),
+                })
+
+    failed = {error["index"] for error in errors}
+    stored = [log_entry for index, log_entry in enumerate(log_entries) if index not in failed]
+    # Duplicates were recorded when first stored, unless that write failed
+    # before recording them; recording them twice would make proofs ambiguous
+    recorded = recorded_log_ids([log_entries[index]["_id"] for index in duplicates]) if duplicates else set()
+    record_batch([
+        log_entry for index, log_entry in enumerate(log_entries)
+        if index not in failed and (index not in duplicates or str(log_entry["_id"]) not in recorded)
+    ])
+    # Duplicates were counted when first stored; retried batches must not count them again
+    record_rollups([log_entry for index, log_entry in enumerate(log_entries) if index not in failed and index not in duplicates])
+    invalidate_for(stored)
+    return inserted, errors
+
 def verify_log_signature(log_entry):
     """
     Verify the HMAC signature of a log entry.
     """
-    if os.getenv("DEBUG", "False").lower() == "true":
+    if DEBUG_SIGNING:
         print(f"Verifying with LOG_SIGNING_KEY: {settings.LOG_SIGNING_KEY}")
     original_signature = log_entry.get("signature")
     if not original_signature:
         return False
 
-    temp_entry = {k: v for k, v in log_entry.items() if k != "signature"}
-    temp_entry["timestamp"] = temp_entry["timestamp"].replace(microsecond=0).strftime("%Y-%m-%d %H:%M:%S+00:00")
-    serialized = json.dumps(temp_entry, sort_keys=True).encode()
-    signing_key = settings.LOG_SIGNING_KEY.encode()
-    expected_signature = hmac.new(signing_key, serialized, hashlib.sha256).hexdigest()
-    if os.getenv("DEBUG", "False").lower() == "true":
+    serialized = signing_message(log_entry)
+    expected_signature = sign_message(serialized)
+    if DEBUG_SIGNING:
         print(f"Verifying Message: {serialized.decode()}, Expected Signature: {expected_signature}, Actual Signature: {original_signature}")
-    return hmac.compare_digest(original_signature, expected_signature)
\ No newline at end of file
+    return hmac.compare_digest(original_signature, expected_signature)
+
+# Signatures that already verified, keyed by signing-key fingerprint, _id and
+# signature. Audit logs are immutable, so a stored log that verified once only
+# needs re-checking after the TTL (bounding how long tampering with a row
+# could go unnoticed) or when LOG_SIGNING_KEY rotates, which changes the key.
+_verified_cache = OrderedDict()
+_verified_cache_lock = threading.Lock()
+
+@lru_cache(maxsize=4)
+def _key_fingerprint(signing_key):
+    return hashlib.sha256(signing_key.encode()).hexdigest()[:16]
+
+def _verification_cache_key(log_entry):
+    return f"verified:{_key_fingerprint(settings.LOG_SIGNING_KEY)}:{log_entry.get('_id')}:{log_entry.get('signature')}"
+
+def verify_log_signatures(log_entries):
+    """
+    Verify the signatures of logs read from MongoDB, returning one bool per log.
+    Results are cached in-process (LRU) and, if LOG_VERIFY_CACHE_SHARED is set,
+    in the Django cache so repeat reads skip the HMAC. Only use this for
+    documents loaded from the database, never for client-supplied entries.
+    """
+    ttl = getattr(settings, "LOG_VERIFY_CACHE_TTL", 300)
+    if not ttl:
+        return [verify_log_signature(log_entry) for log_entry in log_entries]
+
+    now = time.monotonic()
+    keys = [_verification_cache_key(log_entry) if log_entry.get("signature") else None for log_entry in log_entries]
+    results = [False] * len(log_entries)
+    missing = []
+    with _verified_cache_lock:
+        for i, key in enumerate(keys):
+            expires = _verified_cache.get(key) if key else None
+            if expires is not None and expires > now:
+                _verified_cache.move_to_end(key)
+                results[i] = True
+            elif key:
+                missing.append(i)
+
+    shared = getattr(settings, "LOG_VERIFY_CACHE_SHARED", False)
+    if shared and missing:
+        hits = cache.get_many([keys[i] for i in missing])
+        for i in missing:
+            results[i] = keys[i] in hits
+        missing = [i for i in missing if not results[i]]
+
+    newly_verified = []
+    for i in missing:
+        results[i] = verify_log_signature(log_entries[i])
+        if results[i]:
+            newly_verified.append(keys[i])
+    if shared and newly_verified:
+        cache.set_many({key: True for key in newly_verified}, timeout=ttl)
+
+    verified_keys = [key for key, valid in zip(keys, results) if valid]
+    if verified_keys:
+        max_size = getattr(settings, "LOG_VERIFY_CACHE_SIZE", 100000)
+        with _verified_cache_lock:
+            for key in verified_keys:
+                if key not in _verified_cache:
+                    _verified_cache[key] = now + ttl
+            while len(_verified_cache) > max_size:
+                _verified_cache.popitem(last=False)
+    return results
@@ -1,36 +1,44 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .mongo import logs_collection
+from .mongo import count_logs, find_logs, ping as ping_mongo
+from .buffer import get_buffer_redis
 from bson.json_util import dumps
-from .metrics import log_created_counter, log_listed_counter
-from .tasks import create_log_task, create_log_task  # Import create_log_task for audit logging
-from .utils import verify_log_signature
+from .metrics import log_created_counter, log_listed_counter, log_tampered_counter
+from .tasks import create_log_task, create_logs_batch_task  # Import create_log_task for audit logging
+from .utils import validate_log_fields, verify_log_signatures
+from .exporters import COMPRESSIONS, EXPORT_FORMATS, ExportStream, export_headers, export_options
+from .merkle import get_inclusion_proof, verify_range
+from .rollups import log_stats, stats_options
+from .query import build_log_query
+from .query_cache import get_or_set
+from .export_jobs import create_export_job, get_jobs_collection, iter_file_range, job_path, parse_range
 import json
+import logging
 import os
-import io  # Added import for io.StringIO
-import csv
-from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from .throttles import RedisUserRateThrottle  
-from rest_framework.pagination import PageNumberPagination
+from .parsers import NDJSONParser, InvalidLine, TooManyEntries
+from rest_framework.parsers import JSONParser
+from rest_framework.negotiation import DefaultContentNegotiation
+from django.conf import settings
+from .pagination import LogPagination, LogCursorPagination, decode_cursor, seek_query
 from django.utils.dateparse import parse_datetime
-from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
-from django.http import StreamingHttpResponse
+from .openapi import extend_schema, OpenApiParameter
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
 from prometheus_client import Counter
-from logger.tasks import archive_logs_task
-from .serializers import DateTimeEncoder  # Add this import
+from logger.tasks import archive_logs_task, export_logs_job_task
+
+logger = logging.getLogger(__name__)
 
 # Define a new metric for log exports
 log_exported_counter = Counter("log_exported_total", "Total number of logs exported")
 
-class Echo:
-    """An object that implements just the write method for streaming."""
-    def write(self, value):
-        return value
-
 class LogCreateView(APIView):
     permission_classes = [IsAuthenticated]
-    throttle_classes = [RedisUserRateThrottle]  
+    throttle_classes = [RedisUserRateThrottle]
+    throttle_scope = "log_create"
 
     @extend_schema(
         summary="Create a new log entry",
@@ -62,34 +70,107 @@ class LogCreateView(APIView):
         action = data.get("action")
         details = data.get("details", {})
 
-        if not action:
-            return Response({"error": "Action is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            validate_log_fields(action, str(user.id), details)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         create_log_task.delay(action=action, user_id=str(user.id), details=details)
         return Response({"message": "Log created"}, status=status.HTTP_201_CREATED)
 
-class LogPagination(PageNumberPagination):
-    page_size = 20
-    page_size_query_param = "page_size"
-    max_page_size = 100
+class LogBatchCreateView(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [RedisUserRateThrottle]
+    throttle_scope = "log_create"
+    parser_classes = [JSONParser, NDJSONParser]
+
+    @property
+    def max_entries(self):
+        """Read by NDJSONParser to stop parsing oversized bodies early."""
+        return getattr(settings, "LOG_BATCH_MAX_ENTRIES", 1000)
+
+    @extend_schema(
+        summary="Create many log entries at once",
+        description="Accepts a JSON array or an NDJSON body (`application/x-ndjson`) of log entries, validates them in one pass and queues the valid ones with a single Celery task. Returns an accept/reject result per entry. Requires JWT authentication.",
+        request={
+            "application/json": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "action": {"type": "string", "description": "The action being logged (e.g., 'login')"},
+                        "details": {"type": "object", "description": "Additional details about the action"},
+                    },
+                    "required": ["action"],
+                },
+                "example": [
+                    {"action": "login", "details": {"ip_address": "192.168.1.1"}},
+                    {"action": "logout"}
+                ]
+            }
+        },
+        responses={
+            201: {"description": "At least one entry was queued", "example": {"accepted": 1, "rejected": 1, "results": [{"index": 0, "status": "accepted"}, {"index": 1, "status": "rejected", "error": "Action is required"}]}},
+            400: {"description": "Invalid request or every entry rejected", "example": {"error": "Expected a list of log entries"}},
+            413: {"description": "More than LOG_BATCH_MAX_ENTRIES entries", "example": {"detail": "A batch may contain at most 1000 entries"}},
+        },
+    )
+    def post(self, request, *args, **kwargs):
+        user = request.user
+        data = request.data
+
+        if not isinstance(data, list):
+            return Response({"error": "Expected a list of log entries"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(data) > self.max_entries:
+            raise TooManyEntries(self.max_entries)
+
+        entries = []
+        results = []
+        for index, item in enumerate(data):
+            if isinstance(item, InvalidLine):
+                error = item.error
+            elif not isinstance(item, dict):
+                error = "Entry must be a JSON object"
+            else:
+                try:
+                    validate_log_fields(item.get("action"), str(user.id), item.get("details"))
+                    error = None
+                except ValueError as e:
+                    error = str(e)
+
+            if error:
+                results.append({"index": index, "status": "rejected", "error": error})
+                continue
+            entries.append({"action": item["action"], "user_id": str(user.id), "details": item.get("details", {})})
+            results.append({"index": index, "status": "accepted"})
+
+        if entries:
+            create_logs_batch_task.delay(entries)
+            log_created_counter.inc(len(entries))
+
+        body = {"accepted": len(entries), "rejected": len(results) - len(entries), "results": results}
+        return Response(body, status=status.HTTP_201_CREATED if entries else status.HTTP_400_BAD_REQUEST)
 
 class LogListView(APIView):
     throttle_classes = [RedisUserRateThrottle]
+    throttle_scope = "log_list"
     permission_classes = [IsAuthenticated]
 
     @extend_schema(
         summary="List audit logs with filters",
-        description="Retrieve a paginated list of audit logs with optional filters. Requires JWT authentication.",
+        description="Retrieve a paginated list of audit logs with optional filters. Only the requested page is read from MongoDB; logs on that page whose signature fails verification are listed by ID under `tampered`. Requires JWT authentication.",
         parameters=[
             OpenApiParameter(name="user_id", type=str, description="Filter by user ID"),
             OpenApiParameter(name="action", type=str, description="Filter by exact action name"),
-            OpenApiParameter(name="action__contains", type=str, description="Filter by partial action name (regex)"),
+            OpenApiParameter(name="action__startswith", type=str, description="Filter by action name prefix (uses the action index)"),
+            OpenApiParameter(name="action__contains", type=str, description="Filter by partial action name (case-insensitive regex, matched against the distinct action names)"),
             OpenApiParameter(name="action__in", type=str, description="Filter by a comma-separated list of actions"),
             OpenApiParameter(name="action__nin", type=str, description="Exclude a comma-separated list of actions"),
             OpenApiParameter(name="start_time", type=str, description="Filter logs after this timestamp (ISO format)"),
             OpenApiParameter(name="end_time", type=str, description="Filter logs before this timestamp (ISO format)"),
             OpenApiParameter(name="page", type=int, description="Page number for pagination"),
             OpenApiParameter(name="page_size", type=int, description="Number of logs per page (max 100) "),
+            OpenApiParameter(name="cursor", type=str, description="Opaque cursor from `next_cursor`; pass an empty value to start keyset pagination"),
         ],
         responses={
             200: {
@@ -98,6 +179,11 @@ class LogListView(APIView):
                     "count": {"type": "integer"},
                     "next": {"type": "string", "nullable": True},
                     "previous": {"type": "string", "nullable": True},
+                    "tampered": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "IDs of logs on this page whose signature did not verify",
+                    },
                     "results": {
                         "type": "array",
                         "items": {
@@ -117,6 +203,7 @@ class LogListView(APIView):
                     "count": 1,
                     "next": None,
                     "previous": None,
+                    "tampered": [],
                     "results": [
                         {
                             "_id": "12345",
@@ -135,69 +222,73 @@ class LogListView(APIView):
         
         log_listed_counter.inc()
 
-        user_id = request.query_params.get("user_id")
-        action = request.query_params.get("action")
-        action_contains = request.query_params.get("action__contains")
-        action_in = request.query_params.get("action__in")
-        action_nin = request.query_params.get("action__nin")
-        start_time = request.query_params.get("start_time")
-        end_time = request.query_params.get("end_time")
-
-        query = {}
-
-        if user_id:
-            query["user_id"] = user_id
-        if action:
-            query["action"] = action
-        if action_contains:
-            query["action"] = {"$regex": action_contains, "$options": "i"}
-        if action_in:
-            actions = action_in.split(",")
-            query["action"] = {"$in": actions}
-        if action_nin:
-            actions = action_nin.split(",")
-            query["action"] = {"$nin": actions}
-        if start_time:
-            start_dt = parse_datetime(start_time)
-            if start_dt:
-                query["timestamp"] = query.get("timestamp", {})
-                query["timestamp"]["$gte"] = start_dt
-        if end_time:
-            end_dt = parse_datetime(end_time)
-            if end_dt:
-                query["timestamp"] = query.get("timestamp", {})
-                query["timestamp"]["$lte"] = end_dt
-
-        if os.getenv("DEBUG", "False").lower() == "true":
-            print(f"Query: {query}")
-        logs_cursor = logs_collection.find(query).sort("timestamp", -1)
-        logs_list = list(logs_cursor)
-        if os.getenv("DEBUG", "False").lower() == "true":
-            print(f"Retrieved Logs: {logs_list}")
-        filtered_logs = [log for log in logs_list if verify_log_signature(log)]
-        if os.getenv("DEBUG", "False").lower() == "true":
-            print(f"Filtered Logs: {filtered_logs}")
-
-        paginator = LogPagination()
-        page = paginator.paginate_queryset(filtered_logs, request)
-        serialized_page = json.loads(dumps(page))
-
-        return paginator.get_paginated_response(serialized_page)
+        try:
+            query = build_log_query(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        logger.debug("Query: %s", query)
+
+        def list_page():
+            # Keyset pagination when a cursor is requested, page numbers otherwise
+            if "cursor" in request.query_params:
+                paginator = LogCursorPagination()
+                page = paginator.paginate_query(query, request)
+            else:
+                paginator = LogPagination()
+                count = get_or_set("count", request.query_params, lambda: count_logs(query))
+                page = paginator.paginate_query(query, request, count=count)
+            logger.debug("Retrieved %d logs", len(page))
+
+            verified_logs = []
+            tampered = []
+            for log, valid in zip(page, verify_log_signatures(page)):
+                if valid:
+                    verified_logs.append(log)
+                else:
+                    tampered.append(str(log["_id"]))
+            if tampered:
+                log_tampered_counter.inc(len(tampered))
+            serialized_page = json.loads(dumps(verified_logs))
+            return paginator.get_paginated_data(serialized_page, tampered=tampered)
+
+        # Pagination links are absolute, so the host is part of the key
+        data = get_or_set(
+            "list", request.query_params, list_page,
+            extra_params=("page", "page_size", "cursor"), vary=(request.get_host(),),
+        )
+        return Response(data)
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """
+    Exports pick their own output from the `format` query parameter, which
+    DRF would otherwise treat as a renderer override. Responses that are
+    not streams (errors) are rendered as JSON.
+    """
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
 class LogExportView(APIView):
     throttle_classes = [RedisUserRateThrottle]
+    throttle_scope = "log_export"
     permission_classes = [IsAuthenticated]
+    content_negotiation_class = ExportContentNegotiation
 
     @extend_schema(
         summary="Export audit logs with filters",
-        description="Export audit logs in JSON format with optional filters. Requires JWT authentication.",
+        description="Export audit logs as JSON, NDJSON or CSV with optional filters and gzip/zstd compression. Requires JWT authentication.",
         parameters=[
             OpenApiParameter(name="user_id", type=str, description="Filter by user ID"),
             OpenApiParameter(name="action", type=str, description="Filter by exact action name"),
-            OpenApiParameter(name="action__contains", type=str, description="Filter by partial action name (regex)"),
+            OpenApiParameter(name="action__startswith", type=str, description="Filter by action name prefix (uses the action index)"),
+            OpenApiParameter(name="action__contains", type=str, description="Filter by partial action name (case-insensitive regex, matched against the distinct action names)"),
             OpenApiParameter(name="action__in", type=str, description="Filter by a comma-separated list of actions"),
             OpenApiParameter(name="action__nin", type=str, description="Exclude a comma-separated list of actions"),
             OpenApiParameter(name="start_time", type=str, description="Filter logs after this timestamp (ISO format)"),
             OpenApiParameter(name="end_time", type=str, description="Filter logs before this timestamp (ISO format)"),
+            OpenApiParameter(name="cursor", type=str, description="Resume the export after this cursor (from the list endpoint's `next_cursor`)"),
+            OpenApiParameter(name="format", type=str, enum=list(EXPORT_FORMATS), description="Output format (default: json)"),
+            OpenApiParameter(name="compression", type=str, enum=list(COMPRESSIONS), description="Compress the stream; the filename gains .gz or .zst"),
         ],
         responses={
             200: {
@@ -222,84 +313,187 @@ class LogExportView(APIView):
         }
     )
     def get(self, request, *args, **kwargs):
-        print(f"LogExportView called with params: {request.query_params}")
-        print(f"Request path: {request.path}")
         try:
-            user_id = request.query_params.get("user_id")
-            action = request.query_params.get("action")
-            action_contains = request.query_params.get("action__contains")
-            action_in = request.query_params.get("action__in")
-            action_nin = request.query_params.get("action__nin")
-            start_time = request.query_params.get("start_time")
-            end_time = request.query_params.get("end_time")
-
-            query = {}
-            if user_id:
-                query["user_id"] = user_id
-            if action:
-                query["action"] = action
-            if action_contains:
-                query["action"] = {"$regex": action_contains, "$options": "i"}
-            if action_in:
-                actions = action_in.split(",")
-                query["action"] = {"$in": actions}
-            if action_nin:
-                actions = action_nin.split(",")
-                query["action"] = {"$nin": actions}
-            if start_time:
-                start_dt = parse_datetime(start_time)
-                if start_dt:
-                    query["timestamp"] = query.get("timestamp", {})
-                    query["timestamp"]["$gte"] = start_dt
-                else:
-                    print("Invalid start_time format")
-                    return Response({"error": "Invalid start_time format. Use ISO format."}, status=status.HTTP_400_BAD_REQUEST)
-            if end_time:
-                end_dt = parse_datetime(end_time)
-                if end_dt:
-                    query["timestamp"] = query.get("timestamp", {})
-                    query["timestamp"]["$lte"] = end_dt
-                else:
-                    print("Invalid end_time format")
-                    return Response({"error": "Invalid end_time format. Use ISO format."}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                query = build_log_query(request.query_params)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            cursor = request.query_params.get("cursor")
+            if cursor:
+                try:
+                    query = seek_query(query, decode_cursor(cursor))
+                except ValueError:
+                    return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
 
-            if os.getenv("DEBUG", "False").lower() == "true":
-                print(f"Export Query: {query}")
+            logger.debug("Export query: %s", query)
 
-            logs_cursor = logs_collection.find(query).sort("timestamp", -1)
+            try:
+                export_format, compression = export_options(request.query_params)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            def stream_json():
+            export = ExportStream(find_logs(query), export_format, compression, on_batch=log_exported_counter.inc)
+
+            def stream_export():
                 try:
-                    first = True
-                    count = 0
-                    yield "["
-                    for log in logs_cursor:
-                        if verify_log_signature(log):
-                            if not first:
-                                yield ","
-                            yield json.dumps(log, cls=DateTimeEncoder)
-                            first = False
-                            count += 1
-                            log_exported_counter.inc()
-                    yield "]"
+                    yield from export
                     create_log_task.delay(
                         action="export_logs",
                         user_id=str(request.user.id) if request.user.is_authenticated else None,
-                        details={"format": "json", "count": count, "query": query}
+                        details={"format": export_format.extension, "compression": compression, "count": export.count, "query": query}
                     )
-                except Exception as e:
-                    print(f"Streaming JSON Error: {str(e)}")
+                except Exception:
+                    logger.exception("Streaming export failed")
                     raise
 
-            response = StreamingHttpResponse(stream_json(), content_type="application/json")
-            response["Content-Disposition"] = 'attachment; filename="logs_export.json"'
+            content_type, filename = export_headers(export_format, compression)
+            response = StreamingHttpResponse(stream_export(), content_type=content_type)
+            response["Content-Disposition"] = f'attachment; filename="{filename}"'
             return response
 
-        except Exception as e:
-            print(f"Export Error: {str(e)}")
+        except Exception:
+            logger.exception("Export failed")
             return Response({"error": "Server error during export"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _export_job_data(job, request):
+    total = job["total"]
+    data = {
+        "id": job["_id"],
+        "status": job["status"],
+        "format": job["format"],
+        "compression": job["compression"],
+        "filters": job["filters"],
+        "exported": job["exported"],
+        "total": total,
+        "progress": round(job["exported"] / total, 4) if total else None,
+        "size": job["size"],
+        "error": job["error"],
+        "created_at": job["created_at"].isoformat(),
+        "finished_at": job["finished_at"].isoformat() if job["finished_at"] else None,
+        "expires_at": job["expires_at"].isoformat() if job.get("expires_at") else None,
+        "download_url": None,
+    }
+    if job["status"] == "done":
+        data["download_url"] = request.build_absolute_uri(reverse("log-export-job-download", args=[job["_id"]]))
+    return data
+
+def _get_export_job(request, job_id):
+    """The job with `job_id` if it exists and the user may see it, else None."""
+    job = get_jobs_collection().find_one({"_id": job_id})
+    if job is None or (job["user_id"] != str(request.user.id) and not request.user.is_staff):
+        return None
+    return job
+
+class ExportJobCreateView(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [RedisUserRateThrottle]
+    throttle_scope = "log_export"
+
+    @extend_schema(
+        summary="Start an export job",
+        description="Queues a background export of the logs matching the given filters to a server-side file. Accepts the export endpoint's filters plus `format` and `compression` (text formats default to gzip). Poll the returned job and download the file once it is done.",
+        request={
+            "application/json": {
+                "type": "object",
+                "properties": {
+                    "user_id": {"type": "string"},
+                    "action": {"type": "string"},
+                    "start_time": {"type": "string"},
+                    "end_time": {"type": "string"},
+                    "format": {"type": "string", "enum": list(EXPORT_FORMATS)},
+                    "compression": {"type": "string", "enum": list(COMPRESSIONS)},
+                },
+                "example": {"action": "login", "format": "ndjson", "compression": "gzip"},
+            }
+        },
+        responses={
+            202: {"description": "Job queued", "example": {"id": "7b1c...", "status": "queued"}},
+            400: {"description": "Invalid filters or format"},
+        },
+    )
+    def post(self, request, *args, **kwargs):
+        try:
+            job = create_export_job(request.data, str(request.user.id))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        export_logs_job_task.delay(job["_id"])
+        response = Response(_export_job_data(job, request), status=status.HTTP_202_ACCEPTED)
+        response["Location"] = request.build_absolute_uri(reverse("log-export-job", args=[job["_id"]]))
+        return response
+
+class ExportJobDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [RedisUserRateThrottle]
+    throttle_scope = "log_export_job"
+
+    @extend_schema(
+        summary="Get an export job",
+        description="Status and progress of an export job; `download_url` is set once the file is ready. Finished jobs and their files are deleted at `expires_at`.",
+        responses={200: {"description": "Job status"}, 404: {"description": "Unknown job"}},
+    )
+    def get(self, request, job_id, *args, **kwargs):
+        job = _get_export_job(request, job_id)
+        if job is None:
+            return Response({"error": "Export job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(_export_job_data(job, request))
+
+class ExportJobDownloadView(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [RedisUserRateThrottle]
+    throttle_scope = "log_export_job"
+
+    @extend_schema(
+        summary="Download an export job's file",
+        description="Serves the finished export. Supports single `Range: bytes=` requests so interrupted downloads can resume without re-running the query.",
+        responses={
+            200: {"description": "Whole file"},
+            206: {"description": "Requested byte range"},
+            404: {"description": "Unknown job"},
+            409: {"description": "Job not finished"},
+            410: {"description": "File was removed"},
+            416: {"description": "Range not satisfiable"},
+        },
+    )
+    def get(self, request, job_id, *args, **kwargs):
+        job = _get_export_job(request, job_id)
+        if job is None:
+            return Response({"error": "Export job not found"}, status=status.HTTP_404_NOT_FOUND)
+        if job["status"] != "done":
+            return Response({"error": f"Export job is {job['status']}"}, status=status.HTTP_409_CONFLICT)
+
+        path = job_path(job)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return Response({"error": "Export file no longer available"}, status=status.HTTP_410_GONE)
+        content_type, filename = export_headers(*export_options(job))
+        try:
+            byte_range = parse_range(request.headers.get("Range"), size)
+        except ValueError:
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+        # If-Range: only resume when the client still has this exact file
+        etag = f'"{job["_id"]}-{size}"'
+        if byte_range and request.headers.get("If-Range") not in (None, etag):
+            byte_range = None
+
+        start, end = byte_range or (0, size - 1)
+        response = StreamingHttpResponse(iter_file_range(path, start, end), content_type=content_type)
+        if byte_range:
+            response.status_code = status.HTTP_206_PARTIAL_CONTENT
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+        response["Accept-Ranges"] = "bytes"
+        response["ETag"] = etag
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
 class ArchiveLogsView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
+    throttle_classes = [RedisUserRateThrottle]
+    throttle_scope = "log_admin"
 
     def post(self, request):
         days = request.data.get('days', 30)  # Default to 30 days if not specified
@@ -312,4 +506,148 @@ class ArchiveLogsView(APIView):
 
         # Trigger the Celery task asynchronously
         archive_logs_task.delay(days=days)
-        return Response({"message": f"Archival task triggered for logs older than {days} days."}, status=202)
\ No newline at end of file
+        return Response({"message": f"Archival task triggered for logs older than {days} days."}, status=202)
+
+class LogIntegrityView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    throttle_classes = [RedisUserRateThrottle]
+    throttle_scope = "log_admin"
+
+    @extend_schema(
+        summary="Verify the integrity of a time range",
+        description="Checks that the Merkle batch roots covering the range match their leaves and form an unbroken hash chain, without reading logs. With deep=true, every recorded log must also still exist and is re-hashed, to detect deleted or modified logs. Requires admin privileges.",
+        parameters=[
+            OpenApiParameter(name="start_time", type=str, description="Start of the range (ISO format)"),
+            OpenApiParameter(name="end_time", type=str, description="End of the range (ISO format)"),
+            OpenApiParameter(name="deep", type=bool, description="Also check that recorded logs exist and re-hash them"),
+        ],
+        responses={
+            200: {
+                "description": "Verification report",
+                "example": {"valid": True, "batches": 12, "logs": 4200, "head": "9f2c...", "problems": []},
+            },
+            400: {"description": "Invalid request parameters"},
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        bounds = {}
+        for param in ("start_time", "end_time"):
+            value = request.query_params.get(param)
+            if value:
+                bounds[param] = parse_datetime(value)
+                if bounds[param] is None:
+                    return Response({"error": f"Invalid {param} format. Use ISO format."}, status=status.HTTP_400_BAD_REQUEST)
+        deep = request.query_params.get("deep", "false").lower() == "true"
+
+        report = verify_range(bounds.get("start_time"), bounds.get("end_time"), deep=deep)
+        if not report["valid"]:
+            log_tampered_counter.inc(sum(len(problem.get("log_ids", [])) for problem in report["problems"]))
+        return Response(report)
+
+class LogProofView(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [RedisUserRateThrottle]
+    throttle_scope = "log_list"
+
+    @extend_schema(
+        summary="Get an inclusion proof for a log",
+        description="Returns the log's Merkle leaf, the sibling path to its batch root and the batch's chain value. Hash the leaf with each sibling in order (0x01 || left || right) to reproduce the root.",
+        responses={
+            200: {
+                "description": "Inclusion proof",
+                "example": {
+                    "log_id": "12345",
+                    "batch": 42,
+                    "leaf": "ab12...",
+                    "proof": [{"side": "right", "hash": "cd34..."}],
+                    "root": "ef56...",
+                    "chain": "9f2c...",
+                },
+            },
+            404: {"description": "Log not recorded in any batch"},
+        },
+    )
+    def get(self, request, log_id, *args, **kwargs):
+        proof = get_inclusion_proof(log_id)
+        if proof is None:
+            return Response({"error": "Log not found in any integrity batch"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(proof)
+
+class LogStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [RedisUserRateThrottle]
+    throttle_scope = "log_list"
+
+    @extend_schema(
+        summary="Activity histogram and top actions/users",
+        description="Answers from pre-aggregated per-minute, per-hour and per-day counters rather than scanning the logs. Returns a zero-filled histogram of log counts for every log, one action or one user, plus the top N actions or users when group_by is set. Requires JWT authentication.",
+        parameters=[
+            OpenApiParameter(name="granularity", type=str, enum=["minute", "hour", "day"], description="Bucket width (default: hour)"),
+            OpenApiParameter(name="start_time", type=str, description="Start of the range (ISO format, default: one day before end_time)"),
+            OpenApiParameter(name="end_time", type=str, description="End of the range (ISO format, default: now)"),
+            OpenApiParameter(name="action", type=str, description="Chart only this action"),
+            OpenApiParameter(name="user_id", type=str, description="Chart only this user"),
+            OpenApiParameter(name="group_by", type=str, enum=["action", "user_id"], description="Also return the most frequent actions or users"),
+            OpenApiParameter(name="top", type=int, description="How many values group_by returns (1-100, default 10)"),
+        ],
+        responses={
+            200: {
+                "description": "Statistics",
+                "example": {
+                    "granularity": "hour",
+                    "start": "2026-10-17T12:00:00Z",
+                    "end": "2026-10-18T12:00:00Z",
+                    "histogram": [{"bucket": "2026-10-17T12:00:00Z", "count": 42}],
+                    "top": [{"value": "login", "count": 30}],
+                },
+            },
+            400: {"description": "Invalid request parameters"},
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        try:
+            options = stats_options(request.query_params)
+            stats = log_stats(options)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(stats)
+
+class LivenessView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = []
+
+    @extend_schema(
+        summary="Liveness probe",
+        description="Returns 200 while the process can serve requests. Does not touch MongoDB or Redis.",
+        responses={200: {"description": "Alive", "example": {"status": "ok"}}},
+    )
+    def get(self, request, *args, **kwargs):
+        return Response({"status": "ok"})
+
+class ReadinessView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = []
+
+    @extend_schema(
+        summary="Readiness probe",
+        description="Pings MongoDB and the Redis buffer. Returns 503 with the failing dependency when either is unreachable, so the instance is taken out of rotation without being restarted.",
+        responses={
+            200: {"description": "Ready", "example": {"status": "ok", "mongo": "ok", "redis": "ok"}},
+            503: {"description": "A dependency is unreachable", "example": {"status": "unavailable", "mongo": "ServerSelectionTimeoutError", "redis": "ok"}},
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        checks = {}
+        for name, check in (("mongo", ping_mongo), ("redis", lambda: get_buffer_redis().ping())):
+            try:
+                check()
+                checks[name] = "ok"
+            except Exception as e:
+                checks[name] = type(e).__name__
+        ready = all(result == "ok" for result in checks.values())
+        return Response(
+            {"status": "ok" if ready else "unavailable", **checks},
+            status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        )